@@ -0,0 +1,124 @@
+"""Batch Module:  Plays fixed-strategy rounds on thousands of independent shoes at once with NumPy"""
+# Each shoe is a row of card values (Ace=1, 10s and facecards=10) and a
+# cursor, so a deal is one fancy-indexing operation across every shoe.
+# Rules follow play.Game:  the dealer only checks for blackjack with an Ace
+# showing, draws to 17 (Dealer.is_hitting), blackjack pays 2:1 and breaks a
+# tie of 21, and a push returns the bet (Player.win/push).
+
+import numpy as np
+
+from cards import Card
+
+
+def shoe_values(ndecks):
+    """Returns the card values of an ordered shoe of ndecks decks."""
+    return np.array([card.value for card in Card.DECK] * ndecks, dtype=np.int8)
+
+
+class BatchGame(object):
+    """One player seat on each of nshoes independent shoes, played together."""
+    def __init__(self, nshoes, ndecks, bet=1, stand_on=17, nchips=100, seed=None):
+        """Initializes BatchGame with shuffled shoes."""
+        ## Random generator for shuffles.
+        self.rng = np.random.default_rng(seed)
+        ## Number of shoes played at once.
+        self.nshoes = nshoes
+        ## Flat bet on every round.
+        self.bet = bet
+        ## Player hits until reaching this total (as strategy.DealerStrategy).
+        self.stand_on = stand_on
+        ## Card values of each shoe (one row per shoe).
+        self.shoes = np.tile(shoe_values(ndecks), (nshoes, 1))
+        ## Index of the next card in each shoe.
+        self.pos = np.zeros(nshoes, dtype=np.intp)
+        ## Chips in each player bank.
+        self.nchips = np.full(nshoes, nchips, dtype=np.int64)
+        self._rows = np.arange(nshoes)
+        self.shuffle(np.ones(nshoes, dtype=bool))
+
+    def shuffle(self, mask):
+        """Shuffles the shoes selected by mask and resets their cursors."""
+        self.shoes[mask] = self.rng.permuted(self.shoes[mask], axis=1)
+        self.pos[mask] = 0
+
+    def deal(self, mask=None):
+        """Deals one card from every shoe (or the shoes in mask).  Returns the values (0 where not dealt)."""
+        v = self.shoes[self._rows, self.pos]
+        if mask is None:
+            self.pos += 1
+            return v.astype(np.int16)
+        self.pos += mask
+        return np.where(mask, v, 0).astype(np.int16)
+
+    @staticmethod
+    def total(hard, aces):
+        """Hand totals, counting an Ace as 11 when it doesn't bust (Hand.total)."""
+        return hard + 10*((aces > 0) & (hard <= 11))
+
+    def play_round(self):
+        """Plays one round on every shoe and settles the bets.  Returns the net result per shoe."""
+        # shuffling before deal if < 35 remaining after initial deal (as in Game.play_round)
+        need = self.shoes.shape[1] - self.pos < 2*2 + 35
+        if need.any():
+            self.shuffle(need)
+
+        # deal the cards:  player, dealer hole card, player, dealer upcard
+        p1 = self.deal(); d1 = self.deal(); p2 = self.deal(); d2 = self.deal()
+        p_hard = p1 + p2
+        p_aces = (p1 == 1).astype(np.int16) + (p2 == 1)
+        d_hard = d1 + d2
+        d_aces = (d1 == 1).astype(np.int16) + (d2 == 1)
+        p_bj = (p_aces > 0) & (p_hard == 11)
+        d_bj = (d_aces > 0) & (d_hard == 11)
+
+        # checking for dealer blackjack when ace is showing
+        settled = (d2 == 1) & d_bj
+
+        # deal additional cards to players
+        hitting = ~settled & (self.total(p_hard, p_aces) < self.stand_on)
+        while hitting.any():
+            v = self.deal(hitting)
+            p_hard += v
+            p_aces += (v == 1)
+            hitting &= self.total(p_hard, p_aces) < self.stand_on
+        p_total = self.total(p_hard, p_aces)
+        busted = p_total > 21
+
+        # deal additional cards to dealer if the player is still playing
+        hitting = ~settled & ~busted & (self.total(d_hard, d_aces) < 17)
+        while hitting.any():
+            v = self.deal(hitting)
+            d_hard += v
+            d_aces += (v == 1)
+            hitting &= self.total(d_hard, d_aces) < 17
+        d_total = self.total(d_hard, d_aces)
+
+        # payout per unit bet (bet already taken):  3 for blackjack, 2 win, 1 push, 0 loss
+        live = ~settled & ~busted
+        win = live & ((d_total > 21) | (p_total > d_total) | ((p_total == d_total) & p_bj))
+        push = live & ~win & (p_total == d_total)
+        payout = np.where(win, np.where(p_bj, 3, 2), 0)
+        payout[push] = 1
+        payout[settled & p_bj] = 1     # even money against dealer blackjack
+
+        net = self.bet*(payout - 1)
+        self.nchips += net
+        return net
+
+    def simulate(self, nrounds):
+        """Plays nrounds rounds.  Returns bankroll trajectories, shape (nshoes, nrounds+1)."""
+        banks = np.empty((self.nshoes, nrounds + 1), dtype=np.int64)
+        banks[:, 0] = self.nchips
+        for i_round in range(nrounds):
+            self.play_round()
+            banks[:, i_round + 1] = self.nchips
+        return banks
+
+
+def simulate(nshoes, ndecks, nrounds, bet=1, stand_on=17, nchips=100, seed=None):
+    """
+    Plays nrounds fixed-strategy rounds on nshoes independent shoes and returns
+    the bankroll trajectories (banks are not limited, so they can go negative).
+    """
+    return BatchGame(nshoes, ndecks, bet=bet, stand_on=stand_on, nchips=nchips,
+                     seed=seed).simulate(nrounds)
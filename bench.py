@@ -0,0 +1,285 @@
+"""Bench Module:  Reproducible benchmarks of the hot paths (dealing, hand totals, full rounds)"""
+# Every benchmark uses fixed seeds, so runs are comparable.  Results can be
+# saved as a baseline and later runs compared against it:
+#
+#   python bench.py --save baseline.json
+#   python bench.py --compare baseline.json
+#
+# Allocation figures need tracemalloc (Python 3.9+) and are skipped
+# otherwise:  the KiB allocated per op is the high-water mark of memory
+# allocated during each op (above what was live when it started), averaged
+# over the ops, so memory a round allocates and frees again still counts.
+# A run is a regression if it is slower, or allocates more, than the
+# baseline by more than the tolerances.
+
+import argparse
+import json
+import random
+import sys
+
+from cards import Card, CSMShoe, Deck, Hand, InfiniteShoe, Shoe
+from play import Game
+from profiling import clock
+from shuffler import BatchShuffler, numpy
+from strategy import SimpleStrategy, Strategy
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class SplitDoubleStrategy(Strategy):
+    """Splits and doubles whenever allowed, then stands (worst case bookkeeping)."""
+    def split(self, player, dealer):
+        """Always splits."""
+        return True
+
+    def double_down(self, player, dealer):
+        """Always doubles."""
+        return True
+
+
+def _stacked_shoe(ndecks, rank):
+    """Returns a Shoe of ndecks*52 cards of a single rank (every hand is a pair)."""
+    shoe = Shoe(0, rng=random.Random(0))
+    for i_card in range(52*ndecks):
+        shoe.add(Card(rank, Card.SUITS[i_card % 4]))
+    shoe.shuffle()
+    return shoe
+
+
+def _hand(ranks):
+    """Returns a Hand holding cards of the given ranks."""
+    hand = Hand()
+    for rank in ranks:
+        hand.add(Card(rank, "s"))
+    return hand
+
+
+def bench_populate_shuffle(ndecks):
+    """Deck.populate() and shuffle() of a ndecks shoe, as the old reshuffle did."""
+    rng = random.Random(1)
+    def run(n):
+        for i in range(n):
+            deck = Deck()
+            deck.rng = rng
+            for i_deck in range(ndecks): deck.populate()
+            deck.shuffle()
+    return run
+
+
+def bench_shoe_shuffle(ndecks, batch=False):
+    """Shoe.shuffle() in place (with a BatchShuffler if batch)."""
+    shoe = Shoe(ndecks, rng=BatchShuffler(1) if batch else random.Random(1))
+    def run(n):
+        for i in range(n):
+            shoe.shuffle()
+    return run
+
+
+def bench_deal(cls, ndecks):
+    """Deals a ndecks shoe one card at a time (ops are cards, refills included)."""
+    rng = random.Random(2)
+    if issubclass(cls, Shoe):
+        deck = cls(ndecks, rng=rng)
+        refill = deck.shuffle
+    else:
+        deck = cls()
+        deck.rng = rng
+        def refill():
+            deck.clear()
+            for i_deck in range(ndecks): deck.populate()
+            deck.shuffle()
+    ncards = 52*ndecks
+    def run(n):
+        hand = Hand()
+        for i in range(n):
+            if i % ncards == 0:
+                refill()
+                hand.clear()
+            deck.deal([hand])
+    return run
+
+
+def bench_total(ranks):
+    """Hand.total of a fixed hand."""
+    hand = _hand(ranks)
+    def run(n):
+        for i in range(n):
+            hand.total
+    return run
+
+
+def bench_splittable(ranks):
+    """Hand.is_splittable() of a fixed two card hand."""
+    hand = _hand(ranks)
+    def run(n):
+        for i in range(n):
+            hand.is_splittable()
+    return run
+
+
+def bench_rounds(nseats, ndecks, strategy, rank=None, shoe="exact"):
+    """Complete headless rounds (ops are rounds).  With rank, every hand is a pair of rank."""
+    game = Game(["seat-%d" % (i + 1) for i in range(nseats)], ndecks,
+                strategy=strategy, verbose=False, rng=random.Random(3), shoe=shoe)
+    if rank is not None:
+        game.deck = _stacked_shoe(ndecks, rank)
+    for player in game.players:
+        player.nchips = 10**12
+    def run(n):
+        game.simulate(n)
+    return run
+
+
+## Benchmarks:  (name, setup, ops per timed run, True to measure allocations per op).
+BENCHMARKS = (
+    [("populate_shuffle_%dd" % nd, lambda nd=nd: bench_populate_shuffle(nd), 200, False)
+     for nd in (1, 2, 4)] +
+    [("shoe_shuffle_%dd" % nd, lambda nd=nd: bench_shoe_shuffle(nd), 200, False)
+     for nd in (1, 2, 4)] +
+    ([("shoe_shuffle_batch_%dd" % nd, lambda nd=nd: bench_shoe_shuffle(nd, batch=True), 200, False)
+      for nd in (1, 2, 4)] if numpy is not None else []) +
+    [("deck_deal_%dd" % nd, lambda nd=nd: bench_deal(Deck, nd), 5000, False)
+     for nd in (1, 2, 4)] +
+    [("shoe_deal_%dd" % nd, lambda nd=nd: bench_deal(Shoe, nd), 5000, False)
+     for nd in (1, 2, 4)] +
+    [("csm_deal_4d", lambda: bench_deal(CSMShoe, 4), 5000, False),
+     ("infinite_deal", lambda: bench_deal(InfiniteShoe, 4), 5000, False),
+     ("total_hard", lambda: bench_total(["10", "6"]), 100000, False),
+     ("total_soft", lambda: bench_total(["A", "2", "4"]), 100000, False),
+     ("splittable_pair", lambda: bench_splittable(["K", "10"]), 100000, False),
+     ("splittable_no_pair", lambda: bench_splittable(["9", "6"]), 100000, False),
+     ("rounds_1seat", lambda: bench_rounds(1, 4, SimpleStrategy()), 2000, True),
+     ("rounds_5seat", lambda: bench_rounds(5, 4, SimpleStrategy()), 1000, True),
+     ("rounds_5seat_csm", lambda: bench_rounds(5, 4, SimpleStrategy(), shoe="csm"), 1000, True),
+     ("rounds_5seat_infinite", lambda: bench_rounds(5, 4, SimpleStrategy(), shoe="infinite"), 1000, True),
+     ("rounds_5seat_split_double",
+      lambda: bench_rounds(5, 4, SplitDoubleStrategy(), rank="5"), 1000, True)]
+)
+
+
+def measure(setup, nops, repeat=3):
+    """Returns the best ops/sec of repeat timed runs."""
+    run = setup()
+    run(max(1, nops // 10))      # warm up
+    best = None
+    for i in range(repeat):
+        start = clock()
+        run(nops)
+        elapsed = clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return nops / max(best, 1e-9)
+
+
+def allocations(setup, nops):
+    """
+    Returns the KiB allocated per op of nops ops run one at a time (the
+    memory allocated by each op, up to its high-water mark), or None
+    without tracemalloc.
+    """
+    if tracemalloc is None or not hasattr(tracemalloc, "reset_peak"):
+        return None
+    run = setup()
+    run(max(1, nops // 10))
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for i in range(nops):
+            tracemalloc.reset_peak()
+            current, peak = tracemalloc.get_traced_memory()
+            run(1)
+            after, peak = tracemalloc.get_traced_memory()
+            allocated += peak - current
+    finally:
+        tracemalloc.stop()
+    return allocated / 1024.0 / nops
+
+
+def run_all(names=None, scale=1.0, repeat=3):
+    """Runs the benchmarks (all, or those named) and returns {name: result dict}."""
+    results = {}
+    for name, setup, nops, measure_alloc in BENCHMARKS:
+        if names and name not in names:
+            continue
+        n = max(1, int(nops * scale))
+        result = {"ops_per_sec": measure(setup, n, repeat)}
+        if measure_alloc:
+            alloc = allocations(setup, n)
+            if alloc is not None:
+                result["kib_per_op"] = alloc
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, tolerance, alloc_tolerance=0.10):
+    """
+    Returns the names of benchmarks slower than baseline by more than
+    tolerance (a fraction), or allocating more KiB per op than baseline by
+    more than alloc_tolerance (named "<name> (allocations)").
+    """
+    regressions = []
+    for name in sorted(results):
+        if name in baseline:
+            result, base = results[name], baseline[name]
+            ratio = result["ops_per_sec"] / base["ops_per_sec"]
+            if ratio < 1.0 - tolerance:
+                regressions.append(name)
+            if "kib_per_op" in result and "kib_per_op" in base:
+                if result["kib_per_op"] > base["kib_per_op"] * (1.0 + alloc_tolerance):
+                    regressions.append(name + " (allocations)")
+    return regressions
+
+
+def report(results, baseline=None):
+    """Prints a table of the results (with the ratio to baseline if given)."""
+    print("%-28s %14s %10s %10s %10s" % ("benchmark", "ops/sec", "KiB/op", "vs base", "KiB vs base"))
+    for name, setup, nops, measure_alloc in BENCHMARKS:
+        if name not in results:
+            continue
+        result = results[name]
+        kib = "%.2f" % result["kib_per_op"] if "kib_per_op" in result else "-"
+        ratio = kib_ratio = "-"
+        if baseline and name in baseline:
+            base = baseline[name]
+            ratio = "%.2fx" % (result["ops_per_sec"] / base["ops_per_sec"])
+            if "kib_per_op" in result and base.get("kib_per_op"):
+                kib_ratio = "%.2fx" % (result["kib_per_op"] / base["kib_per_op"])
+        print("%-28s %14.0f %10s %10s %10s" % (name, result["ops_per_sec"], kib, ratio, kib_ratio))
+
+
+def main(argv=None):
+    """Runs the benchmark suite from the command line.  Returns 1 on a regression."""
+    parser = argparse.ArgumentParser(description="Blackjack hot path benchmarks.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the ops per run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown allowed before a regression is reported (default 0.10)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.10,
+                        help="growth of KiB allocated per op allowed before a regression is reported (default 0.10)")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.names, args.scale, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+        if regressions:
+            print("\nRegressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Bot Module:  asyncio bot clients for load tests of the table server (Python 3.7+)"""
+# Each Bot joins a table of server.py and answers every decision with the
+# short basic strategy of SimpleStrategy, read off the decision message.
+# run_bots() fills many tables at once on one event loop:
+#
+#   python server.py --port 8765 --seats 3 --rounds 200
+#   python bot.py --port 8765 --tables 300 --seats 3
+
+import argparse
+import asyncio
+import json
+import sys
+
+from profiling import clock
+
+
+def rank_value(card):
+    """Returns the value of a card string such as "10s" or "Ah" (Ace is 1)."""
+    rank = card[:-1]
+    if rank == "A":
+        return 1
+    if rank in ("J", "Q", "K"):
+        return 10
+    return int(rank)
+
+
+class Bot(object):
+    """A client playing one seat with the rules of SimpleStrategy."""
+    def __init__(self, name, table, think=0.0):
+        """Initializes Bot.  think is the delay (seconds) before each reply."""
+        ## Player name.
+        self.name = name
+        ## Table name.
+        self.table = table
+        ## Seconds to wait before answering.
+        self.think = think
+        ## Number of decisions answered.
+        self.decisions = 0
+        ## Seconds from receiving a decision to sending the reply, summed.
+        self.reply_seconds = 0.0
+        ## Bank at the end of the table (None until it ends).
+        self.nchips = None
+
+    def decide(self, message):
+        """Returns the reply to a decision message."""
+        decision = message["decision"]
+        if decision == "bet":
+            return 1
+        if decision == "insurance":
+            return 0
+        if decision == "surrender":
+            return False
+        total = message["total"]
+        up = rank_value(message["dealer_up"])
+        if decision == "split":
+            return message["cards"][0][:-1] in ("A", "8")
+        if decision == "double_down":
+            if total in (10, 11):
+                return True
+            return total == 9 and 3 <= up <= 6
+        if total < 12:
+            return True
+        if total >= 17:
+            return False
+        return up == 1 or up >= 7
+
+    async def play(self, host=None, port=None, path=None):
+        """Connects, joins the table and answers decisions until the table ends.  Returns the final bank."""
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write((json.dumps({"op": "join", "table": self.table, "name": self.name}) + "\n").encode("utf-8"))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line.decode("utf-8"))
+                kind = message["type"]
+                if kind == "decide":
+                    start = clock()
+                    if self.think:
+                        await asyncio.sleep(self.think)
+                    reply = {"op": "decision", "id": message["id"], "value": self.decide(message)}
+                    writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    self.decisions += 1
+                    self.reply_seconds += clock() - start
+                elif kind == "end":
+                    self.nchips = message["nchips"]
+                    break
+                elif kind == "error":
+                    raise RuntimeError(message["error"])
+        finally:
+            writer.close()
+        return self.nchips
+
+
+async def run_bots(ntables, nseats, host=None, port=None, path=None, think=0.0):
+    """Plays ntables full tables of bots at once.  Returns (bots, seconds)."""
+    bots = [Bot("bot-%d" % (i_seat + 1), "table-%d" % (i_table + 1), think)
+            for i_table in range(ntables) for i_seat in range(nseats)]
+    start = clock()
+    await asyncio.gather(*[bot.play(host, port, path) for bot in bots])
+    return bots, clock() - start
+
+
+def main(argv=None):
+    """Runs a load test from the command line and prints a summary."""
+    parser = argparse.ArgumentParser(description="Bot clients for the blackjack table server.")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="TCP port")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket path")
+    parser.add_argument("--tables", type=int, default=10, help="tables to fill (default 10)")
+    parser.add_argument("--seats", type=int, default=3, help="seats per table, as on the server (default 3)")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds before each reply")
+    args = parser.parse_args(argv)
+    if args.port is None and args.unix is None:
+        parser.error("give --port or --unix")
+
+    bots, seconds = asyncio.run(run_bots(args.tables, args.seats, args.host, args.port,
+                                         args.unix, args.think))
+    decisions = sum(bot.decisions for bot in bots)
+    print(json.dumps({"bots": len(bots), "decisions": decisions, "seconds": seconds,
+                      "decisions_per_sec": decisions / seconds if seconds else 0.0}, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
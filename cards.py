@@ -4,10 +4,16 @@
 
 # Additional Functions added by J. Nilmeier
 
+import random
 
 
 class Card(object):
-    """ A playing card. """
+    """ 
+    A playing card.  Cards are immutable flyweights:  Card(rank, suit) always
+    returns the same one of the 52 interned cards (Card.DECK), so shoes
+    never allocate cards.  Face up/down is kept by the Hand holding the card.
+    """
+    __slots__ = ("rank", "suit", "value", "code")
     ## List of Cards with String Values.
     RANKS = ["A", "2", "3", "4", "5", "6", "7",
              "8", "9", "10", "J", "Q", "K"]
@@ -16,52 +22,71 @@ class Card(object):
 
     ## Hard coded Value for Ace.
     ACE_VALUE=1
-    def __init__(self, rank, suit, face_up = True):
-        """Initializes Card."""
+    ## Number value of each rank (Ace counted as ACE_VALUE).
+    RANK_VALUES = dict((rank, min(i + 1, 10)) for i, rank in enumerate(RANKS))
+    ## Interned cards by (rank, suit).
+    _interned = {}
+
+    def __new__(cls, rank, suit):
+        """Returns the interned Card."""
+        try:
+            return cls._interned[(rank, suit)]
+        except KeyError:
+            pass
+        card = object.__new__(cls)
         ## Card value.
-        self.rank = rank 
+        object.__setattr__(card, "rank", rank)
         ## Suit value.
-        self.suit = suit
-        ## Face up value (for flipping).
-        self.is_face_up = face_up
+        object.__setattr__(card, "suit", suit)
+        ## Number value of card (Ace is ACE_VALUE).
+        object.__setattr__(card, "value", cls.RANK_VALUES[rank])
+        ## Integer encoding (0-51) of card:  13*suit index + rank index.
+        object.__setattr__(card, "code", 
+                           13*cls.SUITS.index(suit) + cls.RANKS.index(rank))
+        cls._interned[(rank, suit)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        """Cards are shared, so they can't be changed."""
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        """Pickles as the interned card."""
+        return (Card, (self.rank, self.suit))
 
     def __str__(self):
         """Returns an output string.""" 
-        if self.is_face_up:
-            rep = self.rank + self.suit
-        else:
-            rep = "XX"
-        return rep
+        return self.rank + self.suit
 
-    def flip(self):
-        """Flips card over (for dealer)."""
-        self.is_face_up = not self.is_face_up
-
-    @property
-    def value(self):
-        """Computes number value of card."""
-        if self.is_face_up:
-            v = Card.RANKS.index(self.rank) + 1
-            if v > 10:
-                v = 10
-        else:
-            v = None
-        return v
+## The 52 interned cards, in order of Card.code.
+Card.DECK = tuple([Card(rank, suit) for suit in Card.SUITS for rank in Card.RANKS])
 
 
 class Hand(object):
-    """ A hand of playing cards. """
+    """ 
+    A hand of playing cards.  add(), give() and clear() keep a running hard
+    total, ace count and the face down cards, so total is read in constant time.
+    """
     def __init__(self):
         """Initializes Hand with empty card array."""
         ## list for Card() object## list for Card() objects.
         self.cards = []
+        ## Total counting every Ace as 1 (face down cards included).
+        self.hard_total = 0
+        ## Number of Aces in hand.
+        self.naces = 0
+        ## Positions of face down cards in hand.
+        self.down = set()
          
     def __str__(self):
         """Returns an output string.""" 
         if self.cards:
            rep = ""
-           for card in self.cards:
-               rep += str(card) + "  "
+           for i_card, card in enumerate(self.cards):
+               if i_card in self.down:
+                   rep += "XX  "
+               else:
+                   rep += str(card) + "  "
         else:
             rep = "<empty>"
         
@@ -72,37 +97,51 @@ class Hand(object):
     def clear(self):
         """Clears cards in hand."""
         self.cards = []
+        self.hard_total = 0
+        self.naces = 0
+        self.down = set()
 
     def add(self, card):
-        """Adds a card to hand."""
+        """Adds a (face up) card to hand."""
         self.cards.append(card)
+        v = card.value
+        self.hard_total += v
+        if v == Card.ACE_VALUE:
+            self.naces += 1
 
     def give(self, card, other_hand):
-        """Gives a card from self to another hand."""
-        self.cards.remove(card)
+        """Gives a card from self to another hand (face up in the other hand)."""
+        i_card = self.cards.index(card)
+        del self.cards[i_card]
+        v = card.value
+        self.hard_total -= v
+        if v == Card.ACE_VALUE:
+            self.naces -= 1
+        if self.down:
+            self.down = set(i - (i > i_card) for i in self.down if i != i_card)
         other_hand.add(card)
 
+    def flip_card(self, i_card):
+        """Flips a card in the hand over (face up or face down)."""
+        if i_card in self.down:
+            self.down.remove(i_card)
+        else:
+            self.down.add(i_card)
+
+    @property
+    def is_soft(self):
+        """True if an Ace in hand is counted as 11."""
+        return self.naces > 0 and self.hard_total <= 11
+
     @property
     def total(self):     
-        """Computes total value in hand."""
-        # if a card in the hand has value of None, then total is None
-        for card in self.cards:
-            if not card.value:
-                return None
-
-        # add up card values, treat each Ace as 1
-        t = 0
-        for card in self.cards:
-              t += card.value
-
-        # determine if hand contains an Ace
-        contains_ace = False
-        for card in self.cards:
-            if card.value == Card.ACE_VALUE:
-                contains_ace = True
+        """Total value in hand (None if a card is face down)."""
+        if self.down:
+            return None
 
         # if hand contains Ace and total is low enough, treat Ace as 11
-        if contains_ace and t <= 11:
+        t = self.hard_total
+        if self.naces and t <= 11:
             # add only 10 since we've already added 1 for the Ace
             t += 10
 
@@ -110,52 +149,39 @@ class Hand(object):
 
     def is_busted(self):
         """Returns true if hand is over 21."""
-        return self.total > 21
+        return not self.down and self.hard_total > 21
 
     def is_blackjack(self):
         """Checks for blackjack."""
-        blackjack=False
-        if (self.total==21) and len(self.cards)==2: 
-            blackjack=True
-        return blackjack
+        return (not self.down and len(self.cards)==2 
+                and self.naces==1 and self.hard_total==11)
     
     def is_splittable(self):
         """
         Checks to see if hand can be split (10s and facecards, along with matching number cards).
         """
-        splittable=False
-        is_1_face=False
-        is_2_face=False
-        v = self.cards[0].RANKS.index(self.cards[0].rank) + 1
-        if v >= 10: 
-            is_1_face=True  # must include 10s as faces
-        v = self.cards[1].RANKS.index(self.cards[1].rank) + 1
-        
-        if v >= 10: 
-            is_2_face=True
-        
-        if (len(self.cards)==2 and is_1_face and is_2_face):
-            splittable=True
-
-        #checking other ranks
-        if(self.cards[0].rank==self.cards[1].rank): 
-            splittable=True
-
-        return splittable
+        if len(self.cards) != 2:
+            return False
+        card_1, card_2 = self.cards
+        # 10s and facecards all have value 10
+        return (card_1.rank==card_2.rank or 
+                self.hard_total==20 and card_1.value==10)
     
 
 class Deck(Hand):
    """ A deck of playing cards. """
+   ## Random generator used to shuffle (anything with a shuffle() method, 
+   ## such as random.Random(seed)).  Defaults to the global random module.
+   rng = random
+
    def populate(self):
        """Populates with 1 full, ordered deck (can be called multiple times)."""
-       for suit in Card.SUITS:
-           for rank in Card.RANKS:
-               self.add(Card(rank, suit))
+       for card in Card.DECK:
+           self.add(card)
 
    def shuffle(self):
        """Shuffles deck (of any size)."""
-       import random
-       random.shuffle(self.cards)
+       self.rng.shuffle(self.cards)
 
    def deal(self, hands, per_hand = 1):
        """Deals 1 or more cards to a list of hands (players).""" 
@@ -168,6 +194,296 @@ class Deck(Hand):
                    print("Can't continue deal. Out of cards!")
 
 
+class Shoe(Deck):
+    """
+    A shoe of one or more decks.  The shuffled cards stay in a fixed buffer
+    and a cursor marks the next card, so dealing, cards remaining and
+    penetration are O(1), and a reshuffle happens in place.  The shoe also 
+    keeps the number of cards left of each value and the Hi-Lo count of the 
+    cards dealt, updated on every deal.
+
+    A Shoe keeps the Deck interface (populate(), add(), shuffle(), deal(),
+    clear() and rng) but is not a Hand:  cards is a read-only tuple of the
+    cards left, and the Hand members that only make sense for a hand
+    (total, is_soft, is_busted(), is_blackjack(), is_splittable(), give()
+    and flip_card()) raise TypeError.
+    """
+    ## Hi-Lo tag of each card value (index is value-1):  2-6 +1, 7-9 0, 10s and Aces -1.
+    HI_LO = (-1, 1, 1, 1, 1, 1, 0, 0, 0, -1)
+
+    def __init__(self, ndecks=1, rng=None, penetration=None):
+        """
+        Initializes Shoe with ndecks full decks, shuffled by rng (global random 
+        by default).  If penetration (a fraction, e.g. 0.75) is given, 
+        needs_shuffle() is True once that much of the shoe has been dealt.
+        """
+        if rng is not None:
+            self.rng = rng
+        ## Fraction of the shoe dealt before a reshuffle (None for no limit).
+        self.max_penetration = penetration
+        ## list of all Card() objects in the shoe (dealt and undealt).
+        self.buffer = []
+        ## Index of the next card to deal.
+        self.pos = 0
+        ## Number of cards of each value (index is value-1) in the full shoe.
+        self.full_counts = [0] * 10
+        ## Number of cards of each value (index is value-1) not dealt yet.
+        self.counts = [0] * 10
+        ## Hi-Lo running count of the cards dealt since the last shuffle.
+        self.running_count = 0
+        ## Number of shuffles so far.
+        self.shuffles = 0
+        for i_deck in range(ndecks): self.populate()
+        self.shuffle()
+
+    @property
+    def cards(self):
+        """Tuple of the cards not dealt yet (a copy:  use remaining for the count, add() to add cards)."""
+        return tuple(self.buffer[self.pos:])
+
+    def __str__(self):
+        """Returns an output string."""
+        return "%s of %d cards, %d left" % (type(self).__name__, sum(self.full_counts), self.remaining)
+
+    def _not_a_hand(self, name):
+        """Raises TypeError for a Hand member a shoe doesn't have."""
+        raise TypeError("%s is not a Hand:  it has no %s" % (type(self).__name__, name))
+
+    @property
+    def total(self):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("total")
+
+    @property
+    def is_soft(self):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("is_soft")
+
+    def is_busted(self):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("is_busted()")
+
+    def is_blackjack(self):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("is_blackjack()")
+
+    def is_splittable(self):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("is_splittable()")
+
+    def give(self, card, other_hand):
+        """Not supported (raises TypeError):  deal() moves cards out of a shoe."""
+        self._not_a_hand("give()")
+
+    def flip_card(self, i_card):
+        """Not supported (raises TypeError)."""
+        self._not_a_hand("flip_card()")
+
+    @property
+    def remaining(self):
+        """Number of cards not dealt yet."""
+        return len(self.buffer) - self.pos
+
+    @property
+    def penetration(self):
+        """Fraction of the shoe dealt since the last shuffle."""
+        if not self.buffer:
+            return 0.0
+        return float(self.pos) / len(self.buffer)
+
+    @property
+    def true_count(self):
+        """Hi-Lo running count per deck left in the shoe."""
+        remaining = len(self.buffer) - self.pos
+        if not remaining:
+            return 0.0
+        return self.running_count * 52.0 / remaining
+
+    def needs_shuffle(self, reserve):
+        """True if fewer than reserve cards are left or the penetration limit is reached."""
+        if len(self.buffer) - self.pos < reserve:
+            return True
+        return (self.max_penetration is not None and 
+                self.pos >= self.max_penetration * len(self.buffer))
+
+    def clear(self):
+        """Empties the shoe."""
+        self.buffer = []
+        self.pos = 0
+        self.full_counts = [0] * 10
+        self.counts = [0] * 10
+        self.running_count = 0
+
+    def add(self, card):
+        """Adds a card to the bottom of the shoe."""
+        self.buffer.append(card)
+        self.full_counts[card.value - 1] += 1
+        self.counts[card.value - 1] += 1
+
+    def shuffle(self):
+        """Returns every card to the shoe and shuffles it in place."""
+        self.rng.shuffle(self.buffer)
+        self.shuffles += 1
+        self.pos = 0
+        self.counts = list(self.full_counts)
+        self.running_count = 0
+
+    def get_state(self):
+        """Returns the order, cursor, shuffle count and Hi-Lo count of the shoe (for set_state())."""
+        return (tuple([card.code for card in self.buffer]), self.pos, 
+                self.shuffles, self.running_count)
+
+    def set_state(self, state):
+        """Restores the shoe to a state returned by get_state()."""
+        codes, pos, shuffles, running_count = state
+        self.clear()
+        for code in codes:
+            self.add(Card.DECK[code])
+        for card in self.buffer[:pos]:
+            self.counts[card.value - 1] -= 1
+        self.pos = pos
+        self.shuffles = shuffles
+        self.running_count = running_count
+
+    def deal(self, hands, per_hand = 1):
+        """Deals 1 or more cards to a list of hands (players), updating the counts."""
+        buffer = self.buffer
+        counts = self.counts
+        hi_lo = Shoe.HI_LO
+        for rounds in range(per_hand):
+            for hand in hands:
+                if self.pos < len(buffer):
+                    card = buffer[self.pos]
+                    hand.add(card)
+                    self.pos += 1
+                    counts[card.value - 1] -= 1
+                    self.running_count += hi_lo[card.value - 1]
+                else:
+                    print("Can't continue deal. Out of cards!")
+
+
+class CSMShoe(Shoe):
+    """
+    A continuous shuffling machine:  each card dealt is drawn at random from 
+    the cards in the machine, and the cards of a round go back in before 
+    the next one.  The shuffling is spread over the deals (one random draw 
+    per card) and the machine never runs down.  rng needs a random() method.
+    """
+    def needs_shuffle(self, reserve):
+        """True once cards have been dealt (they go back into the machine)."""
+        return self.pos > 0
+
+    def shuffle(self):
+        """Returns every card to the machine (they are drawn at random, so no shuffle is needed)."""
+        self.shuffles += 1
+        self.pos = 0
+        self.counts = list(self.full_counts)
+        self.running_count = 0
+
+    def deal(self, hands, per_hand = 1):
+        """Deals 1 or more cards, each drawn at random from the machine, to a list of hands."""
+        buffer = self.buffer
+        counts = self.counts
+        hi_lo = Shoe.HI_LO
+        random = self.rng.random
+        n = len(buffer)
+        for rounds in range(per_hand):
+            for hand in hands:
+                pos = self.pos
+                if pos < n:
+                    i_card = pos + int(random() * (n - pos))
+                    card = buffer[i_card]
+                    buffer[i_card] = buffer[pos]
+                    buffer[pos] = card
+                    hand.add(card)
+                    self.pos = pos + 1
+                    counts[card.value - 1] -= 1
+                    self.running_count += hi_lo[card.value - 1]
+                else:
+                    print("Can't continue deal. Out of cards!")
+
+
+class InfiniteShoe(Shoe):
+    """
+    An infinite deck, for fast approximate play:  every card dealt is drawn
+    independently and uniformly from the 52 cards (so each rank has a fixed
+    probability), from a batch of BATCH_SIZE cards drawn ahead.  Nothing is
+    used up:  counts stay those of the full shoe, needs_shuffle() is never 
+    True, and the Hi-Lo count stays 0.  rng needs a random() method.
+    """
+    ## Number of cards drawn at a time.
+    BATCH_SIZE = 4096
+
+    def __init__(self, ndecks=1, rng=None, penetration=None):
+        """Initializes InfiniteShoe with the rank proportions of ndecks decks (penetration is ignored)."""
+        if rng is not None:
+            self.rng = rng
+        ## Always None (the shoe is never reshuffled).
+        self.max_penetration = None
+        ## Batch of cards drawn ahead.
+        self.buffer = []
+        ## Index of the next card of the batch.
+        self.pos = 0
+        ## Number of cards of each value (index is value-1) in ndecks decks.
+        self.full_counts = [4 * ndecks] * 9 + [16 * ndecks]
+        ## Same as full_counts (an infinite deck doesn't change).
+        self.counts = list(self.full_counts)
+        ## Always 0.
+        self.running_count = 0
+        ## Number of shuffles so far (1).
+        self.shuffles = 1
+
+    @property
+    def remaining(self):
+        """Number of cards in ndecks decks (an infinite deck never runs down)."""
+        return sum(self.full_counts)
+
+    @property
+    def penetration(self):
+        """Always 0."""
+        return 0.0
+
+    @property
+    def true_count(self):
+        """Always 0 (cards dealt don't change what is left)."""
+        return 0.0
+
+    def needs_shuffle(self, reserve):
+        """Never True."""
+        return False
+
+    def shuffle(self):
+        """Nothing to shuffle (counts the call)."""
+        self.shuffles += 1
+
+    def draw(self):
+        """Draws a new batch of cards."""
+        deck = Card.DECK
+        random = self.rng.random
+        self.buffer = [deck[int(random() * 52)] for i_card in range(self.BATCH_SIZE)]
+        self.pos = 0
+
+    def set_state(self, state):
+        """Restores the batch, cursor and shuffle count of a state returned by get_state()."""
+        codes, pos, shuffles, running_count = state
+        self.buffer = [Card.DECK[code] for code in codes]
+        self.pos = pos
+        self.shuffles = shuffles
+
+    def deal(self, hands, per_hand = 1):
+        """Deals 1 or more cards, each drawn independently, to a list of hands."""
+        for rounds in range(per_hand):
+            for hand in hands:
+                if self.pos == len(self.buffer):
+                    self.draw()
+                hand.add(self.buffer[self.pos])
+                self.pos += 1
+
+
+## Shoe classes by mode name (see Game).
+SHOES = {"exact": Shoe, "csm": CSMShoe, "infinite": InfiniteShoe}
+
+
 if __name__ == "__main__":
     """Main module not used."""
     print("This is a module with classes for playing cards.")
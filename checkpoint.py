@@ -0,0 +1,120 @@
+"""Checkpoint Module:  Saves a Game between rounds and resumes it, bit-identical to an uninterrupted run"""
+# A checkpoint holds everything the next round depends on:  the round
+# count, the players still seated (in order) with their banks, the rules,
+# the shoe (card order as bytes, cursor, counts) and the state of its
+# random generator, and the strategy.  Event sinks and the Profiler are not
+# saved.  Files are written to a temporary name and renamed, so a crash
+# while saving leaves the last checkpoint intact.
+#
+#   checkpointer = Checkpointer(game, "run.ckpt", every=5.0)
+#   checkpointer.run(10**9)                  # saves every 5 seconds
+#
+#   game = load("run.ckpt")                  # after a crash
+#   Checkpointer(game, "run.ckpt").run(10**9)
+
+import os
+import pickle
+import random
+
+from cards import SHOES
+from play import Game
+from profiling import clock
+from rules import Rules
+
+## Version of the checkpoint layout.
+VERSION = 1
+
+
+def state(game):
+    """Returns the state of game between rounds, as a dictionary of plain (picklable) values."""
+    deck = game.deck
+    codes, pos, shuffles, running_count = deck.get_state()
+    if deck.rng is random:
+        rng = ("global", random.getstate())
+    else:
+        rng = ("object", deck.rng)
+    mode = [name for name, cls in SHOES.items() if type(deck) is cls][0]
+    return {"version": VERSION,
+            "rounds": game.rounds,
+            "ndecks": game.ndecks,
+            "players": [(player.name, player.nchips) for player in game.players],
+            "rules": game.rules.as_dict(),
+            "strategy": game.strategy,
+            "shoe": (mode, deck.max_penetration, bytes(bytearray(codes)), pos, shuffles, running_count),
+            "rng": rng}
+
+
+def restore(saved, strategy=None, verbose=False):
+    """Returns a Game in the saved state (with strategy, if given, instead of the saved one)."""
+    if saved["version"] != VERSION:
+        raise ValueError("checkpoint version %d not supported" % saved["version"])
+    mode, penetration, codes, pos, shuffles, running_count = saved["shoe"]
+    kind, rng = saved["rng"]
+    if kind == "global":
+        rng_state = rng
+        rng = None
+    else:
+        rng_state = rng.getstate()
+    names = [name for name, nchips in saved["players"]]
+    game = Game(names, saved["ndecks"], strategy=strategy or saved["strategy"], verbose=verbose,
+                rng=rng, penetration=penetration, rules=Rules(**saved["rules"]), shoe=mode)
+    # the new shoe's first shuffle drew from rng:  put both back
+    game.deck.rng.setstate(rng_state)
+    game.deck.set_state((tuple(bytearray(codes)), pos, shuffles, running_count))
+    for player, (name, nchips) in zip(game.players, saved["players"]):
+        player.nchips = nchips
+    game.rounds = saved["rounds"]
+    return game
+
+
+def save(game, path):
+    """Writes a checkpoint of game (between rounds) to path, replacing it atomically."""
+    data = pickle.dumps(state(game), 2)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    getattr(os, "replace", os.rename)(tmp_path, path)
+
+
+def load(path, strategy=None, verbose=False):
+    """Returns the Game saved at path (with strategy, if given, instead of the saved one)."""
+    with open(path, "rb") as f:
+        return restore(pickle.load(f), strategy, verbose)
+
+
+class Checkpointer(object):
+    """Plays a Game, saving a checkpoint every few seconds (and at the end)."""
+    def __init__(self, game, path, every=5.0):
+        """Initializes Checkpointer"""
+        ## Game() played.
+        self.game = game
+        ## Checkpoint file.
+        self.path = path
+        ## Seconds between checkpoints.
+        self.every = every
+        ## Number of checkpoints written.
+        self.saves = 0
+
+    def save(self):
+        """Writes a checkpoint now."""
+        save(self.game, self.path)
+        self.saves += 1
+
+    def run(self, nrounds):
+        """
+        Plays until the game has played nrounds rounds in all (counting
+        rounds played before a resume) or every player is out.  Returns the
+        number of rounds played by this call.
+        """
+        game = self.game
+        start = game.rounds
+        last_save = clock()
+        while game.rounds < nrounds and game.players:
+            game.play_round()
+            if clock() - last_save >= self.every:
+                self.save()
+                last_save = clock()
+        self.save()
+        return game.rounds - start
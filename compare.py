@@ -0,0 +1,199 @@
+"""Compare Module:  Paired comparison of strategies on common shoes (common random numbers)"""
+# Every strategy plays its own Game, but all the Games of a chunk shuffle
+# with generators seeded alike.  A Shoe only draws from its generator when
+# it shuffles, so the k-th shoe holds the same cards in the same order for
+# every strategy, while each Game deals from it at its own pace (a strategy
+# that hits or splits more plays fewer rounds of the shoe).  Results are
+# paired by shoe:  the difference of two strategies' net chips on the same
+# shoe has far less variance than either net, so fewer shoes separate them.
+#
+#   result = compare([("9-11", ParametricStrategy()),
+#                     ("wide", ParametricStrategy(double_vs=WIDE_DOUBLES))],
+#                    nshoes=20000, rules=Rules(double_totals=None))
+#   print(result.report())
+#
+# Only the exact shoe keeps the shoes common:  a CSMShoe draws a random
+# number per card dealt, so its generators drift apart as card usage does.
+
+import argparse
+import random
+import sys
+
+from play import Game
+from rules import Rules
+from runner import chunk_seed
+from stats import RunningStats
+from strategy import ParametricStrategy
+
+
+def shoe_results(game, nshoes):
+    """
+    Plays game shoe by shoe, yielding (net chips of all seats, rounds) for
+    each of its next nshoes shoes.  The first round of the following shoe
+    is played to find the end of the last one (and is not counted).
+    """
+    deck = game.deck
+    shoe = deck.shuffles
+    start = sum(player.nchips for player in game.players)
+    rounds = 0
+    while nshoes and game.players:
+        bank = sum(player.nchips for player in game.players)
+        game.play_round()
+        if deck.shuffles != shoe:
+            # this round began a new shoe
+            yield bank - start, rounds
+            nshoes -= 1
+            shoe, start, rounds = deck.shuffles, bank, 0
+        rounds += 1
+
+
+class CompareResult(object):
+    """Per shoe results of strategies, and their paired differences to the first (the reference)."""
+    def __init__(self, names):
+        """Initializes CompareResult with no shoes played."""
+        ## Strategy names, the reference first.
+        self.names = list(names)
+        ## RunningStats() of the net chips per shoe of each strategy.
+        self.nets = [RunningStats() for name in names]
+        ## Rounds played by each strategy.
+        self.rounds = [0] * len(names)
+        ## RunningStats() of the per shoe net difference of each strategy to the reference (first is empty).
+        self.diffs = [RunningStats() for name in names]
+
+    @property
+    def shoes(self):
+        """Number of shoes played by every strategy."""
+        return self.nets[0].n
+
+    def add_shoe(self, results):
+        """Adds one shoe's (net, rounds) of every strategy."""
+        reference = results[0][0]
+        for i_strategy, (net, rounds) in enumerate(results):
+            self.nets[i_strategy].add(net)
+            self.rounds[i_strategy] += rounds
+            if i_strategy:
+                self.diffs[i_strategy].add(net - reference)
+
+    def merge(self, other):
+        """Adds the shoes of another result (of the same strategies)."""
+        for i_strategy in range(len(self.names)):
+            self.nets[i_strategy].merge(other.nets[i_strategy])
+            self.rounds[i_strategy] += other.rounds[i_strategy]
+            self.diffs[i_strategy].merge(other.diffs[i_strategy])
+        return self
+
+    def difference(self, i_strategy, z=1.96):
+        """
+        Returns (mean, low, high) of strategy i_strategy's net chips per shoe
+        minus the reference's:  the paired mean and its confidence interval
+        of z standard errors.
+        """
+        diff = self.diffs[i_strategy]
+        half = z * diff.stderr
+        return diff.mean, diff.mean - half, diff.mean + half
+
+    def variance_reduction(self, i_strategy):
+        """
+        Returns the variance of the unpaired difference (independent shoes)
+        over that of the paired difference:  how many times fewer shoes
+        pairing needs for the same interval.
+        """
+        paired = self.diffs[i_strategy].variance
+        unpaired = self.nets[i_strategy].variance + self.nets[0].variance
+        return unpaired / paired if paired else float("inf")
+
+    def report(self, z=1.96):
+        """Returns a text table of the strategies and their paired differences to the reference."""
+        lines = ["%d shoes, differences to %s with %g standard error intervals" % (self.shoes, self.names[0], z),
+                 "%12s %12s %12s %26s %10s  %s" % ("ev/round", "net/shoe", "diff/shoe", "interval",
+                                                   "var. red.", "strategy")]
+        for i_strategy, name in enumerate(self.names):
+            net = self.nets[i_strategy]
+            ev = float(net.total) / self.rounds[i_strategy] if self.rounds[i_strategy] else 0.0
+            if i_strategy:
+                mean, low, high = self.difference(i_strategy, z)
+                lines.append("%12.5f %12.4f %12.4f %26s %10.1f  %s"
+                             % (ev, net.mean, mean, "[%.4f, %.4f]" % (low, high),
+                                self.variance_reduction(i_strategy), name))
+            else:
+                lines.append("%12.5f %12.4f %12s %26s %10s  %s" % (ev, net.mean, "-", "-", "-", name))
+        return "\n".join(lines)
+
+
+def compare_chunk(task):
+    """
+    Plays one chunk (seed, i_chunk, nshoes, nseats, ndecks, candidates,
+    nchips, rules) of every candidate on the chunk's common shoes and
+    returns its CompareResult.
+    """
+    seed, i_chunk, nshoes, nseats, ndecks, candidates, nchips, rules = task
+    names = ["seat-%d" % (i_seat + 1) for i_seat in range(nseats)]
+    streams = []
+    for name, strategy in candidates:
+        game = Game(names, ndecks, strategy=strategy, verbose=False,
+                    rng=random.Random(chunk_seed(seed, i_chunk)), rules=rules)
+        for player in game.players:
+            player.nchips = nchips
+        streams.append(shoe_results(game, nshoes))
+    result = CompareResult([name for name, strategy in candidates])
+    for results in zip(*streams):
+        result.add_shoe(results)
+    return result
+
+
+def compare(candidates, nshoes, seed=0, workers=1, nseats=1, ndecks=4, rules=None,
+            nchips=10**9, chunk_shoes=1000):
+    """
+    Plays nshoes common shoes with each of candidates ((name, strategy)
+    pairs, the reference first), in chunks of chunk_shoes on a pool of
+    workers, and returns the merged CompareResult.  The same seed (and
+    chunk_shoes) gives the same result for any number of workers.
+    """
+    tasks = []
+    i_chunk = 0
+    while i_chunk * chunk_shoes < nshoes:
+        n = min(chunk_shoes, nshoes - i_chunk * chunk_shoes)
+        tasks.append((seed, i_chunk, n, nseats, ndecks, candidates, nchips, rules))
+        i_chunk += 1
+
+    total = CompareResult([name for name, strategy in candidates])
+    pool = None
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+    try:
+        # results are merged in chunk order, so the merge is deterministic
+        for result in (pool.imap(compare_chunk, tasks) if pool else map(compare_chunk, tasks)):
+            total.merge(result)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return total
+
+
+def main(argv=None):
+    """Compares doubling on 9-11 with wider double down windows on common shoes."""
+    from optimize import WIDE_DOUBLES
+
+    parser = argparse.ArgumentParser(description="Paired strategy comparison on common shoes.")
+    parser.add_argument("--shoes", type=int, default=10000, help="shoes per strategy (default 10000)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--seats", type=int, default=1, help="seats per game (default 1)")
+    parser.add_argument("--decks", type=int, default=4, help="decks per shoe (default 4)")
+    parser.add_argument("--seed", type=int, default=0, help="run seed (default 0)")
+    parser.add_argument("--z", type=float, default=1.96, help="standard errors per interval half width (default 1.96)")
+    args = parser.parse_args(argv)
+
+    candidates = [("double 9-11", ParametricStrategy()),
+                  ("wide doubles", ParametricStrategy(double_vs=WIDE_DOUBLES)),
+                  ("double 10-11 only", ParametricStrategy(double_vs={10: tuple(range(2, 10)),
+                                                                      11: tuple(range(1, 11))}))]
+    result = compare(candidates, args.shoes, seed=args.seed, workers=args.workers, nseats=args.seats,
+                     ndecks=args.decks, rules=Rules(double_totals=None))
+    print(result.report(args.z))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Events Module:  Event bus carrying structured game events to subscribed sinks"""
+# A Game emits an event (a dictionary with a "kind" and the fields of the
+# event) at every step of play.  Emitters check bus.sinks first, so with
+# nobody subscribed no event (and no string) is built at all.  ConsoleSink
+# prints the text of interactive play.
+
+
+class EventBus(object):
+    """Sends events to the subscribed sinks (callables taking an event dictionary)."""
+    def __init__(self):
+        """Initializes EventBus with no sinks."""
+        ## List of subscribed sinks.
+        self.sinks = []
+
+    def subscribe(self, sink):
+        """Adds a sink, and returns it."""
+        self.sinks.append(sink)
+        return sink
+
+    def unsubscribe(self, sink):
+        """Removes a sink."""
+        self.sinks.remove(sink)
+
+    def emit(self, kind, **fields):
+        """Sends an event of kind to every sink."""
+        fields["kind"] = kind
+        for sink in self.sinks:
+            sink(fields)
+
+
+class ListSink(object):
+    """Keeps every event in a list (or only the kinds given)."""
+    def __init__(self, kinds=None):
+        """Initializes ListSink."""
+        ## Kinds of events kept (None for all).
+        self.kinds = kinds
+        ## List of events received.
+        self.events = []
+
+    def __call__(self, event):
+        """Keeps the event."""
+        if self.kinds is None or event["kind"] in self.kinds:
+            self.events.append(event)
+
+
+class ConsoleSink(object):
+    """Prints events as the text of interactive play."""
+    def __call__(self, event):
+        """Prints the event (events without text, such as "deal", print nothing)."""
+        show = getattr(self, "show_" + event["kind"], None)
+        if show is not None:
+            show(event)
+
+    def show_shuffle(self, event):
+        """Prints a shuffle event."""
+        print(str(event["remaining"]) +" cards left...shuffling")
+
+    def show_out_of_chips(self, event):
+        """Prints an out_of_chips event."""
+        print(event["player"].name +" is out of chips.")
+
+    def show_dealer_hand(self, event):
+        """Prints a dealer_hand event."""
+        print("\nDealer hand: \n" +str(event["dealer"]) )
+
+    def show_splits_begin(self, event):
+        """Prints a splits_begin event."""
+        print("\n"+ "--------- Splitting Hands ---------")
+
+    def show_splittable(self, event):
+        """Prints a splittable event, with the splits the seat has left (counting this one)."""
+        player = event["player"]
+        seat = player.player
+        left = seat.rules.max_splits - (len(seat.hands) - 1)
+        print(player.name+" has "+str(player) +":  this can be split (%d split%s left)" % (left, "s"[left==1:]))
+        if not event["affordable"]:
+            print("but you don't have enough money to cover the split...sorry!")
+
+    def show_splits_end(self, event):
+        """Prints a splits_end event."""
+        if event["nsplits"]==0: print("No splits will be made this round.")
+        print("-----------------------------------")
+
+    def show_hands(self, event):
+        """Prints a hands event."""
+        print("")
+        print("----------- After Deal ------------")
+        for player in event["hands"]:
+            print(player.name + ") bet:  "+ str(player.bet)+ "  bank:  "+ str(player.nchips))
+            print("        Cards:  "+ str(player))
+        print("")
+        print("  Dealer hand:  "+ str(event["dealer"]))
+        print("-----------------------------------")
+        print("")
+
+    def show_doubles_begin(self, event):
+        """Prints a doubles_begin event."""
+        print("")
+        print("------- Double Down Offers --------")
+
+    def show_double_refused(self, event):
+        """Prints a double_refused event."""
+        bank = event["bank"]
+        print(bank.name+" bank ("+str(bank.nchips)+") not enough to cover bet..sorry!")
+
+    def show_doubles_end(self, event):
+        """Prints a doubles_end event."""
+        if (event["ndoubles"]==0): print("No double downs will be made this round")
+        print("-----------------------------------")
+        print("")
+
+    def show_stand(self, event):
+        """Prints a stand event."""
+        player = event["player"]
+        print(player.name+ " has "+ str(player) +", and stands\n")
+
+    def show_bust(self, event):
+        """Prints a bust event."""
+        print(event["player"].name+" busts.")
+
+    def show_dealer_reveal(self, event):
+        """Prints a dealer_reveal event."""
+        print(event["dealer"])
+
+    def show_dealer_bust(self, event):
+        """Prints a dealer_bust event."""
+        dealer = event["dealer"]
+        print(dealer.name + " busts with "+ str(dealer))
+
+    def show_showdown(self, event):
+        """Prints a showdown event."""
+        print("\n --Summary of Play against Dealer Hand --\n Dealer hand (Final):\n        " + str(event["dealer"]))
+        if event["dealer"].is_busted():
+            print("Dealer busts.\n")
+        else:
+            print("")
+
+    def show_settle(self, event):
+        """Prints a settle event."""
+        player = event["player"]
+        outcome = event["outcome"]
+        if outcome == "lose":
+            print(player.name+ " has "+ str(player) +", and loses.   bank: %d\n"%(event["nchips"]))
+        elif outcome == "push":
+            print(player.name+ " has "+ str(player) +", and pushes.  bank: %d\n"%(event["nchips"]))
+        elif outcome == "surrender":
+            print(player.name+ " has "+ str(player) +", and surrenders.  bank: %d\n"%(event["nchips"]))
+        elif event["blackjack"]:
+            print(player.name+ " has "+ str(player) +"..blackjack!, and wins.    bank: %d\n"%(event["nchips"]))
+        else:
+            print(player.name + " has "+ str(player) +", and wins.    bank: %d\n"%(event["nchips"]))
+
+    def show_insurance_offer(self, event):
+        """Prints an insurance_offer event."""
+        print("Dealer hand:")
+        print(event["dealer"])
+        print("\nInsurance is available if Dealer Ace is showing.")
+
+    def show_dealer_peek(self, event):
+        """Prints a dealer_peek event."""
+        print("Dealer hand:")
+        print(event["dealer"])
+
+    def show_dealer_blackjack(self, event):
+        """Prints a dealer_blackjack event."""
+        print("Dealer blackjack!\n")
+
+    def show_insurance_payout(self, event):
+        """Prints an insurance_payout event."""
+        player = event["player"]
+        print(player.name + " has " + str(player.nchips)+" chips after insurance payout")
+        print(player.name + " hand: " + str(player) +"\n")
+
+    def show_even_money(self, event):
+        """Prints an even_money event."""
+        print("even money insurance payout")
+
+    def show_no_dealer_blackjack(self, event):
+        """Prints a no_dealer_blackjack event."""
+        print("No dealer blackjack...insurance bets collected.")
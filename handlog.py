@@ -0,0 +1,323 @@
+"""Handlog Module:  Compact binary hand history of Games, and a memory-mapped reader"""
+# A log is a fixed-size header followed by append-only fixed-width records,
+# one per hand played (split hands are separate records).  A HandLogSink
+# subscribed to a Game's events packs the hands of each round into a
+# buffered HandLogWriter;  HandLog maps the file and, with NumPy, exposes
+# every field as a zero-copy column:
+#
+#   writer = HandLogWriter("session.hlog", seed=1, ndecks=4)
+#   game.events.subscribe(HandLogSink(writer))
+#   game.simulate(100000)
+#   writer.close()
+#
+#   log = HandLog("session.hlog")
+#   log["payout"].sum() - log["bet"].sum()
+#
+# All fields are little-endian.  Card codes are Card.code (0-51), and the
+# unused card slots of a hand hold NO_CARD.
+
+import mmap
+import os
+import struct
+
+from cards import Card
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## First bytes of every log.
+MAGIC = b"BJHLOG\x00\x00"
+## Version of the record layout.
+VERSION = 1
+## Card slots per hand (longer hands keep their first MAX_CARDS cards;  ncards is exact).
+MAX_CARDS = 12
+## Card code of an unused slot.
+NO_CARD = 255
+
+## Header:  magic, version, record size, seed, number of decks, shoe mode, random generator.
+HEADER = struct.Struct("<8sIIqIBB2x")
+## Shoe modes (cards.SHOES) by header code (logs written before the code was kept read as "exact").
+SHOE_MODES = ("exact", "csm", "infinite")
+## Random generators by header code:  random.Random(seed), shuffler.BatchShuffler(seed).
+RNG_KINDS = ("random", "batch")
+
+## Record fields:  (name, struct format, NumPy type) in file order.
+FIELDS = (("round", "Q", "<u8"),               # round number (Game.rounds)
+          ("shuffles", "I", "<u4"),            # shuffles of the shoe before the round
+          ("shoe_pos", "H", "<u2"),            # shoe cursor at the start of the round
+          ("seat", "B", "u1"),                 # seat index at the start of the round
+          ("hand", "B", "u1"),                 # hand index of the seat (splits)
+          ("flags", "B", "u1"),                # decision and result flags (below)
+          ("outcome", "B", "u1"),              # LOSE, PUSH, WIN or SURRENDER
+          ("ncards", "B", "u1"),               # cards in the hand
+          ("dealer_ncards", "B", "u1"),        # cards in the dealer's hand
+          ("cards", "%dB" % MAX_CARDS, ("u1", (MAX_CARDS,))),
+          ("dealer_cards", "%dB" % MAX_CARDS, ("u1", (MAX_CARDS,))),
+          ("bet", "i", "<i4"),                 # final bet of the hand (doubled included)
+          ("ins_bet", "i", "<i4"),             # insurance bet of the seat (first hand only)
+          ("payout", "i", "<i4"),              # chips paid back to the bank for the hand
+          ("bank", "q", "<i8"))                # seat bank after the round
+
+## Record layout.
+RECORD = struct.Struct("<" + "".join(fmt for name, fmt, dtype in FIELDS))
+
+## Outcome codes.
+LOSE, PUSH, WIN, SURRENDER = 0, 1, 2, 3
+OUTCOMES = {"lose": LOSE, "push": PUSH, "win": WIN, "surrender": SURRENDER}
+
+## Flags:  hand created by a split.
+SPLIT = 1
+## Flags:  hand doubled down.
+DOUBLE = 2
+## Flags:  hand is a blackjack.
+BLACKJACK = 4
+## Flags:  hand busted.
+BUST = 8
+## Flags:  seat took insurance (first hand only).
+INSURED = 16
+## Flags:  dealer had blackjack (insurance paid 2*ins_bet).
+DEALER_BLACKJACK = 32
+
+
+def dtype():
+    """Returns the NumPy dtype of a record (NumPy required)."""
+    return numpy.dtype([(name,) + (typ if isinstance(typ, tuple) else (typ,))
+                        for name, fmt, typ in FIELDS])
+
+
+def card_codes(hand):
+    """Returns the MAX_CARDS card codes of hand, padded with NO_CARD."""
+    codes = [card.code for card in hand.cards[:MAX_CARDS]]
+    return codes + [NO_CARD] * (MAX_CARDS - len(codes))
+
+
+def cards_of(codes):
+    """Returns the Cards of a sequence of card codes (NO_CARD slots are skipped)."""
+    return [Card.DECK[code] for code in codes if code != NO_CARD]
+
+
+def read_header(f):
+    """
+    Reads the header of an open log and returns (seed, ndecks, shoe mode,
+    random generator kind).  Raises ValueError if f isn't a log.
+    """
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("truncated hand log header")
+    magic, version, record_size, seed, ndecks, shoe, rng = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("not a hand log")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError("hand log version %d (record size %d) not supported" % (version, record_size))
+    if shoe >= len(SHOE_MODES) or rng >= len(RNG_KINDS):
+        raise ValueError("hand log shoe mode %d or random generator %d unknown" % (shoe, rng))
+    return seed, ndecks, SHOE_MODES[shoe], RNG_KINDS[rng]
+
+
+class HandLogWriter(object):
+    """Appends records to a log, packed into a buffer of buffer_records records per write."""
+    def __init__(self, path, seed=0, ndecks=0, buffer_records=4096, append=True,
+                 shoe="exact", rng="random"):
+        """
+        Initializes HandLogWriter.  A new log gets a header with seed,
+        ndecks, the shoe mode and the random generator kind (RNG_KINDS);
+        an existing log is appended to (its header is checked), or 
+        replaced if append is False.
+        """
+        ## Seed of the logged session.
+        self.seed = seed
+        ## Number of decks in the shoe.
+        self.ndecks = ndecks
+        ## Shoe mode of the session (SHOE_MODES).
+        self.shoe = shoe
+        ## Random generator kind of the session (RNG_KINDS).
+        self.rng = rng
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                self.seed, self.ndecks, self.shoe, self.rng = read_header(f)
+            ## Open log file.
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, seed, ndecks,
+                                        SHOE_MODES.index(shoe), RNG_KINDS.index(rng)))
+            self.file.flush()
+        ## Number of records written (buffered included).
+        self.nrecords = 0
+        self._buffer = bytearray(RECORD.size * buffer_records)
+        self._nbuffered = 0
+        self._capacity = buffer_records
+
+    def write(self, *fields):
+        """Appends one record (the values of FIELDS, card fields as MAX_CARDS codes each)."""
+        RECORD.pack_into(self._buffer, self._nbuffered * RECORD.size, *fields)
+        self._nbuffered += 1
+        self.nrecords += 1
+        if self._nbuffered == self._capacity:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+        if self._nbuffered:
+            self.file.write(bytes(self._buffer[:self._nbuffered * RECORD.size]))
+            self._nbuffered = 0
+        self.file.flush()
+
+    def close(self):
+        """Flushes and closes the log."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        """Returns the writer."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the log."""
+        self.close()
+
+
+class HandLogSink(object):
+    """
+    Event sink writing a record for every hand of a Game's rounds to a
+    HandLogWriter.  The hands of a round are written at its "round_end"
+    event, in seat and hand order.
+    """
+    def __init__(self, writer):
+        """Initializes HandLogSink."""
+        ## HandLogWriter() the records are written to.
+        self.writer = writer
+        self._round = None
+        self._shoe_state = (0, 0)
+        self._seats = {}
+        self._insurance = {}
+        self._outcomes = {}
+        self._dealer_blackjack = False
+
+    def __call__(self, event):
+        """Keeps the state of the round, and writes its hands at the end."""
+        kind = event["kind"]
+        if kind == "round":
+            shoe = event["shoe"]
+            self._round = event["round"]
+            self._shoe_state = (shoe.shuffles, shoe.pos)
+            self._seats = dict((id(player), i_seat) for i_seat, player in enumerate(event["players"]))
+            self._insurance = {}
+            self._outcomes = {}
+            self._dealer_blackjack = False
+        elif kind == "settle":
+            self._outcomes[id(event["player"])] = OUTCOMES[event["outcome"]]
+        elif kind == "insurance":
+            self._insurance[id(event["player"])] = event["ins_bet"]
+        elif kind == "dealer_blackjack":
+            self._dealer_blackjack = True
+        elif kind == "round_end":
+            self.write_round(event["players"], event["dealer"])
+
+    def write_round(self, players, dealer):
+        """Writes a record for each hand of players."""
+        write = self.writer.write
+        shuffles, shoe_pos = self._shoe_state
+        dealer_codes = card_codes(dealer)
+        dealer_flag = DEALER_BLACKJACK if self._dealer_blackjack else 0
+        for player in players:
+            seat = self._seats[id(player)]
+            ins_bet = self._insurance.get(id(player), 0)
+            for i_hand, hand in enumerate(player.hands):
+                outcome = self._outcomes[id(hand)]
+                flags = dealer_flag
+                if hand.split: flags |= SPLIT
+                if hand.doubledown: flags |= DOUBLE
+                if hand.is_blackjack(): flags |= BLACKJACK
+                if hand.is_busted(): flags |= BUST
+                if outcome == WIN:
+                    if hand.is_blackjack():
+                        payout = player.rules.blackjack_return(hand.bet)
+                    else:
+                        payout = 2*hand.bet
+                elif outcome == PUSH:
+                    payout = hand.bet
+                elif outcome == SURRENDER:
+                    payout = hand.bet//2
+                else:
+                    payout = 0
+                if i_hand == 0 and ins_bet:
+                    flags |= INSURED
+                fields = [self._round, shuffles, shoe_pos, seat, i_hand, flags, outcome,
+                          len(hand.cards), len(dealer.cards)]
+                fields.extend(card_codes(hand))
+                fields.extend(dealer_codes)
+                fields.extend([hand.bet, ins_bet if i_hand == 0 else 0, payout, player.nchips])
+                write(*fields)
+
+
+class HandLog(object):
+    """
+    A log opened for reading through a read-only memory map.  With NumPy,
+    log[name] is the column of a field as a zero-copy array (and
+    log.records the structured array of all fields);  iter_records() works
+    without NumPy.  A partly written last record is ignored.
+    """
+    def __init__(self, path):
+        """Initializes HandLog, mapping the file at path."""
+        self._file = open(path, "rb")
+        seed, ndecks, shoe, rng = read_header(self._file)
+        ## Seed of the logged session.
+        self.seed = seed
+        ## Number of decks in the shoe.
+        self.ndecks = ndecks
+        ## Shoe mode of the session (SHOE_MODES).
+        self.shoe = shoe
+        ## Random generator kind of the session (RNG_KINDS).
+        self.rng = rng
+        size = os.path.getsize(path)
+        ## Number of complete records.
+        self.nrecords = (size - HEADER.size) // RECORD.size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        ## Structured array of the records, backed by the map (None without NumPy).
+        self.records = None
+        if numpy is not None:
+            self.records = numpy.frombuffer(self._mmap, dtype=dtype(),
+                                            count=self.nrecords, offset=HEADER.size)
+
+    def __len__(self):
+        """Number of complete records."""
+        return self.nrecords
+
+    def __getitem__(self, name):
+        """Column of field name (a view of the map, NumPy required)."""
+        if self.records is None:
+            raise RuntimeError("HandLog columns need numpy")
+        return self.records[name]
+
+    def raw_record(self, i_record):
+        """Returns record i_record as the flat tuple of values packed by HandLogWriter.write()."""
+        return RECORD.unpack_from(self._mmap, HEADER.size + i_record * RECORD.size)
+
+    def iter_records(self):
+        """Yields each record as a dictionary of its fields (cards as lists of Cards)."""
+        names = [name for name, fmt, typ in FIELDS if name not in ("cards", "dealer_cards")]
+        for i_record in range(self.nrecords):
+            values = self.raw_record(i_record)
+            record = dict(zip(names[:9], values[:9]))
+            record["cards"] = cards_of(values[9:9 + MAX_CARDS])
+            record["dealer_cards"] = cards_of(values[9 + MAX_CARDS:9 + 2*MAX_CARDS])
+            record.update(zip(names[9:], values[9 + 2*MAX_CARDS:]))
+            yield record
+
+    def close(self):
+        """Unmaps and closes the log (columns taken from it must not be used afterwards)."""
+        self.records = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        """Returns the log."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the log."""
+        self.close()
@@ -0,0 +1,175 @@
+"""Optimize Module:  Parallel search over strategy variants, dropping clearly worse ones early"""
+# Candidates are played in stages of chunks (runner.run_chunk) on a process
+# pool.  Every candidate plays the same chunk seeds, so chunk i deals the
+# same shoes to all of them (common random numbers) and the comparison is
+# paired:  after each stage a candidate is dropped once its per-chunk EV
+# difference to the current leader is more than z standard errors below
+# zero.  Survivors keep playing until one is left or max_chunks is reached.
+#
+#   candidates = grid(double_vs=[None, WIDE_DOUBLES], split_ranks=[("A", "8"), ("A", "8", "9")])
+#   result = optimize(candidates, rules=Rules(double_totals=None), workers=8)
+#   print(result.report())
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import sys
+
+from rules import Rules
+from runner import run_chunk
+from strategy import ParametricStrategy
+
+## A wider double down window (8 against 5-6, 9 against 2-6, 10 and 11 against 2-9).
+WIDE_DOUBLES = {8: (5, 6), 9: (2, 3, 4, 5, 6), 10: (2, 3, 4, 5, 6, 7, 8, 9), 11: (2, 3, 4, 5, 6, 7, 8, 9, 10)}
+
+
+def grid(**options):
+    """Returns (name, ParametricStrategy) candidates for every combination of the option lists."""
+    names = sorted(options)
+    candidates = []
+    for values in itertools.product(*[options[name] for name in names]):
+        kwargs = dict(zip(names, values))
+        label = ", ".join("%s=%r" % (name, kwargs[name]) for name in names)
+        candidates.append((label, ParametricStrategy(**kwargs)))
+    return candidates
+
+
+class Candidate(object):
+    """The chunk results of one strategy variant."""
+    def __init__(self, name, strategy):
+        """Initializes Candidate with no chunks played."""
+        ## Name.
+        self.name = name
+        ## Strategy() played.
+        self.strategy = strategy
+        ## EV (net chips per seat and round) of each chunk played, in chunk order.
+        self.evs = []
+        ## Rounds played.
+        self.rounds = 0
+        ## Stage the candidate was dropped at (None while it survives).
+        self.dropped = None
+
+    @property
+    def mean(self):
+        """Mean EV over the chunks played."""
+        return sum(self.evs) / len(self.evs) if self.evs else 0.0
+
+    @property
+    def stderr(self):
+        """Standard error of the mean EV."""
+        return _stderr(self.evs)
+
+    def paired(self, other):
+        """Returns (mean, standard error) of the per-chunk EV difference self - other (common chunks)."""
+        diffs = [a - b for a, b in zip(self.evs, other.evs)]
+        if not diffs:
+            return 0.0, 0.0
+        return sum(diffs) / len(diffs), _stderr(diffs)
+
+
+def _stderr(xs):
+    """Standard error of the mean of xs (0 for fewer than two)."""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean = sum(xs) / n
+    return math.sqrt(sum((x - mean) ** 2 for x in xs) / (n - 1) / n)
+
+
+class OptimizeResult(object):
+    """Candidates of an optimizer run, the best first."""
+    def __init__(self, candidates, stages):
+        """Initializes OptimizeResult"""
+        ## Candidate() objects, survivors by mean EV, then the dropped by stage (latest first).
+        self.candidates = sorted(candidates, key=lambda c: (c.dropped is not None,
+                                                           -(c.dropped or 0), -c.mean))
+        ## Number of stages run.
+        self.stages = stages
+
+    @property
+    def best(self):
+        """Best Candidate."""
+        return self.candidates[0]
+
+    @property
+    def rounds(self):
+        """Rounds played by all candidates."""
+        return sum(c.rounds for c in self.candidates)
+
+    def report(self):
+        """Returns a text table of the candidates."""
+        lines = ["%10s %10s %8s %10s  %s" % ("ev", "stderr", "chunks", "dropped", "candidate")]
+        for c in self.candidates:
+            dropped = "-" if c.dropped is None else "stage %d" % c.dropped
+            lines.append("%10.5f %10.5f %8d %10s  %s" % (c.mean, c.stderr, len(c.evs), dropped, c.name))
+        return "\n".join(lines)
+
+
+def optimize(candidates, seed=0, workers=1, nseats=1, ndecks=4, rules=None, nchips=10**9,
+             chunk_rounds=10000, chunks_per_stage=8, min_chunks=8, max_chunks=200, z=3.0):
+    """
+    Plays candidates ((name, strategy) pairs) in stages of chunks_per_stage
+    chunks each on a pool of workers, dropping a candidate once it is
+    worse than the leader by more than z paired standard errors (after
+    min_chunks chunks).  Stops when one candidate is left or after
+    max_chunks chunks.  Returns an OptimizeResult.
+    """
+    survivors = [Candidate(name, strategy) for name, strategy in candidates]
+    everyone = list(survivors)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    stage = 0
+    try:
+        i_chunk = 0
+        while len(survivors) > 1 and i_chunk < max_chunks:
+            stage += 1
+            chunks = range(i_chunk, min(i_chunk + chunks_per_stage, max_chunks))
+            tasks = [(seed, i, chunk_rounds, nseats, ndecks, c.strategy, nchips, rules, False)
+                     for c in survivors for i in chunks]
+            results = pool.imap(run_chunk, tasks) if pool else map(run_chunk, tasks)
+            for i_task, result in enumerate(results):
+                c = survivors[i_task // len(chunks)]
+                c.rounds += result.rounds
+                c.evs.append(float(sum(result.net)) / (result.rounds * nseats) if result.rounds else 0.0)
+            i_chunk = chunks[-1] + 1
+
+            if i_chunk >= min_chunks:
+                leader = max(survivors, key=lambda c: c.mean)
+                for c in survivors:
+                    if c is not leader:
+                        diff, stderr = leader.paired(c)
+                        if diff - z * stderr > 0:
+                            c.dropped = stage
+                survivors = [c for c in survivors if c.dropped is None]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return OptimizeResult(everyone, stage)
+
+
+def main(argv=None):
+    """Searches double down windows, split policies and insurance for SimpleStrategy-like play."""
+    parser = argparse.ArgumentParser(description="Strategy optimizer with early stopping.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--seats", type=int, default=1, help="seats per game (default 1)")
+    parser.add_argument("--decks", type=int, default=4, help="decks per shoe (default 4)")
+    parser.add_argument("--seed", type=int, default=0, help="run seed (default 0)")
+    parser.add_argument("--chunk-rounds", type=int, default=10000, help="rounds per chunk (default 10000)")
+    parser.add_argument("--max-chunks", type=int, default=200, help="most chunks per candidate (default 200)")
+    parser.add_argument("--z", type=float, default=3.0, help="standard errors to drop a candidate (default 3)")
+    args = parser.parse_args(argv)
+
+    candidates = grid(double_vs=[None, WIDE_DOUBLES],
+                      split_ranks=[("A", "8"), ("A", "8", "9"), ("A", "8", "2", "3", "6", "7")],
+                      insurance_count=[None, 3])
+    result = optimize(candidates, seed=args.seed, workers=args.workers, nseats=args.seats,
+                      ndecks=args.decks, rules=Rules(double_totals=None),
+                      chunk_rounds=args.chunk_rounds, max_chunks=args.max_chunks, z=args.z)
+    print(result.report())
+    print("\n%d stages, %d rounds" % (result.stages, result.rounds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,84 +7,172 @@
 # and blackjack payouts added by J. Nilmeier
 
 from cards import *
-
-class Player(Hand):
-    """ A (blackjack) player for a game. """
+from strategy import Strategy
+from rules import Rules
+from profiling import Profiler
+from events import EventBus, ConsoleSink
+
+class Player(object):
+    """ 
+    A (blackjack) player for a game:  a seat with one bank and one hand, or 
+    several hands after splits, all betting from the same bank.
+    """
     def __init__(self,name,nchips):
         """Initializes Player"""
         ## Name.
         self.name=name                 
         ## Chips in player bank.
         self.nchips=nchips             
-        ## Amount of bet.
-        self.bet=0                     
         ## Amount of insurance bet.
         self.ins_bet=0                 
-        ## True if hand is split from original. 
+        ## Strategy() making this player's decisions (set by Game).
+        self.strategy=None
+        ## EventBus() for the events of play (set by Game).
+        self.events=EventBus()
+        ## Rules() of the game (set by Game).
+        self.rules=Rules()
+        ## List of PlayerHand() objects played this round (more than one after splits).
+        self.hands=[PlayerHand(self, name)]
+
+    @property
+    def bet(self):
+        """Bet on the first hand."""
+        return self.hands[0].bet
+
+    def clear(self):
+        """Clears the hands, bets and flags of the last round (back to one hand)."""
+        del self.hands[1:]
+        self.hands[0].clear()
+        self.ins_bet=0
+
+    def placeBet(self,bet):
+        """Takes bet amount from bank for the first hand."""
+        self.hands[0].placeBet(bet)
+    
+    def placeInsuranceBet(self,ins_bet):
+        """Takes insurance bet from bank."""
+        self.nchips-=ins_bet
+        self.ins_bet=ins_bet
+
+    def payInsuranceBet(self):
+        """Pays insurance back to bank and reinitializes insurance bet.""" 
+        self.nchips+=2*self.ins_bet 
+        self.ins_bet=0
+
+    def split(self, hand):
+        """
+        Splits hand:  the first card moves to a new hand (placed after it) 
+        with the same bet, taken from bank.  Both hands are marked as split 
+        hands (resplits included).  Returns the new hand.
+        """
+        new_hand = PlayerHand(self, self.name + "-%d" % (len(self.hands)+1))
+        hand.setSplitHand()
+        new_hand.setSplitHand()
+        self.nchips-=hand.bet
+        new_hand.bet=hand.bet
+        hand.give(hand.cards[0], new_hand)
+        self.hands.insert(self.hands.index(hand)+1, new_hand)
+        return new_hand
+
+
+class PlayerHand(Hand):
+    """ A hand of a Player, with its own bet.  Settlement pays into the Player's bank. """
+    def __init__(self,player,name):
+        """Initializes PlayerHand"""
+        ## Player() (seat) owning this hand.
+        self.player=player
+        ## Name (the player's, numbered for split hands).
+        self.name=name
+        ## Amount of bet.
+        self.bet=0                     
+        ## True if hand came from a split (either hand of the pair). 
         self.split=False               
         ## True if player is doubling down.
         self.doubledown=False      
+        ## True if hand was surrendered.
+        self.surrendered=False
         ## List of cards.
-        self.cards=[]
+        Hand.__init__(self)
 
-    def is_hitting(self): 
+    @property
+    def nchips(self):
+        """Chips in the player's bank."""
+        return self.player.nchips
+
+    def clear(self):
+        """Clears cards in hand, and the bet and flags of the last round."""
+        Hand.clear(self)
+        self.bet=0
+        self.split=False
+        self.doubledown=False
+        self.surrendered=False
+
+    def is_hitting(self, dealer): 
         """
-        Prompts for a hit unless a rule is applied:
+        Asks the strategy for a hit unless a rule is applied:
           -score=21
           -after a double down deal
         """ 
         if (self.total==21 or self.doubledown):  
-            response="n"
+            hit=False
         else:
-            response = ask_yes_no( self.name + " has "+str(self)+ ", do you want a hit? (Y/N): ")
-        if (response=="n"): 
-            print self.name+ " has "+ str(self) +", and stands\n"
-        return response == "y"
+            hit=self.player.strategy.hit(self, dealer)
+        if (not hit and self.player.events.sinks): 
+            self.player.events.emit("stand", player=self)
+        return hit
 
     def bust(self):
-        """Outputs bust then calls lose().""" 
-        print(self.name+" busts.")
+        """Sends a bust event then calls lose().""" 
+        if self.player.events.sinks:
+            self.player.events.emit("bust", player=self)
         self.lose()
 
     def lose(self):
-        """Loses and prints (no bank update required)."""
-        #jn print(self.name+ " loses.  bank:dd %d\n"%self.nchips)
-        print self.name+ " has "+ str(self) +", and loses.   bank: %d\n"%(self.nchips)
+        """Loses and sends a settle event (no bank update required)."""
+        events = self.player.events
+        if events.sinks:
+            events.emit("settle", player=self, outcome="lose", blackjack=False, 
+                        bet=self.bet, nchips=self.player.nchips)
  
     def win(self):
-        """Wins, prints, and updates bank.  Includes blackjack payout if needed (2:1)"""
-        if self.is_blackjack():
-           self.nchips+=3*self.bet
-           print self.name+ " has "+ str(self) +"..blackjack!, and wins.    bank: %d\n"%(self.nchips)
+        """Wins, updates bank, and sends a settle event.  Includes blackjack payout if needed (per the rules)"""
+        blackjack = self.is_blackjack()
+        if blackjack:
+           self.player.nchips+=self.player.rules.blackjack_return(self.bet)
         else:
-            self.nchips+=2*self.bet
-            print self.name + " has "+ str(self) +", and wins.    bank: %d\n"%(self.nchips)
+            self.player.nchips+=2*self.bet
+        events = self.player.events
+        if events.sinks:
+            events.emit("settle", player=self, outcome="win", blackjack=blackjack, 
+                        bet=self.bet, nchips=self.player.nchips)
 
     def push(self):
-        """Pushes, prints, and updates bank.""" 
-        self.nchips+=self.bet
-        print self.name+ " has "+ str(self) +", and pushes.  bank: %d\n"%(self.nchips)
+        """Pushes, updates bank, and sends a settle event.""" 
+        self.player.nchips+=self.bet
+        events = self.player.events
+        if events.sinks:
+            events.emit("settle", player=self, outcome="push", blackjack=False, 
+                        bet=self.bet, nchips=self.player.nchips)
          
+    def surrender(self):
+        """Surrenders, gets half the bet back (rounded down), and sends a settle event."""
+        self.surrendered=True
+        self.player.nchips+=self.bet//2
+        events = self.player.events
+        if events.sinks:
+            events.emit("settle", player=self, outcome="surrender", blackjack=False, 
+                        bet=self.bet, nchips=self.player.nchips)
+
     def placeBet(self,bet):
         """
         Takes bet amount from bank and adds to (total) bet amount.  
         Total bet is incremented to allow for double down.
         """
-        self.nchips-=bet
+        self.player.nchips-=bet
         self.bet+=bet
-    
-    def placeInsuranceBet(self,ins_bet):
-        """Takes insurance bet from bank."""
-        self.nchips-=ins_bet
-        self.ins_bet=ins_bet
-
-    def payInsuranceBet(self):
-        """Pays insurance back to bank and reinitializes insurance bet.""" 
-        self.nchips+=2*self.ins_bet 
-        self.ins_bet=0
 
     def setSplitHand(self):
-        """Identifies whetjer player was created from a split hand (deleted every round)"""
+        """Identifies hand as coming from a split (cleared every round)"""
         self.split=True 
 
     def setDoubledownHand(self):
@@ -98,305 +186,426 @@ class Dealer(Hand):
         ## Name.
         self.name=name
         ## List of cards.
-        self.cards=[]
+        Hand.__init__(self)
+        ## EventBus() for the events of play (set by Game).
+        self.events=EventBus()
+        ## Rules() of the game (set by Game).
+        self.rules=Rules()
 
     def is_hitting(self):
-        """Dealer follows unprompted rules for hitting and staying listed here."""
-        return self.total < 17
+        """Dealer follows unprompted rules for hitting and staying (stands on 17, or hits soft 17, per the rules)."""
+        return self.rules.dealer_hits(self)
 
     def bust(self):
-        """Dealer busts and outputs string."""
-        print self.name + " busts with "+ str(self)
+        """Dealer busts and sends a dealer_bust event."""
+        if self.events.sinks:
+            self.events.emit("dealer_bust", dealer=self)
 
     def flip_first_card(self):
         """Dealer flips his first card to be ether visible or invisible"""
-        first_card = self.cards[0]
-        first_card.flip()
+        self.flip_card(0)
 
 
 class Game(object):
     """A blackjack Game."""
-    def __init__( self, names,ndecks ):
-        """Initializes Game."""
+    def __init__( self, names,ndecks, strategy=None, verbose=True, rng=None, 
+                  penetration=None, max_splits=1, rules=None, shoe="exact" ):
+        """
+        Initializes Game.  Decisions are made by strategy (a console prompt 
+        by default).  Play is sent as events to the sinks subscribed to 
+        self.events;  verbose=True subscribes a ConsoleSink, and with 
+        verbose=False rounds are played headless for simulations.  The shoe 
+        is shuffled by rng (e.g. random.Random(seed), or a NumPy backed 
+        shuffler.BatchShuffler(seed)), or by the global 
+        random module, and reshuffled once the penetration fraction (if 
+        given) has been dealt;  with shoe="csm" the cards come from a 
+        continuous shuffling machine instead, and with shoe="infinite" 
+        from an infinite deck (independent draws, for fast approximate play).  The table rules are rules (a Rules());  
+        without rules, the game's usual rules with up to max_splits splits 
+        per player a round.
+        """
+        if strategy is None:
+            strategy = ConsoleStrategy()
+        if rules is None:
+            rules = Rules(max_splits=max_splits)
+        ## Rules() of the table.
+        self.rules=rules
+        ## Strategy() shared by the Players.
+        self.strategy=strategy
+        ## EventBus() sending the events of play to subscribed sinks.
+        self.events=EventBus()
+        if verbose:
+            self.events.subscribe(ConsoleSink())
         ## List of Players.
         self.players = []
         ## Number of decks in shoe.
         self.ndecks=ndecks 
+        ## Most splits (extra hands) per player in a round.
+        self.max_splits=rules.max_splits
         for name in names:
-            player = Player(name,nchips=100)
+            player = Player(name,nchips=rules.nchips)
+            player.strategy=strategy
+            player.events=self.events
+            player.rules=rules
             self.players.append(player)
         ## Creates Dealer
         self.dealer = Dealer("Dealer")
-        ## Creates a Deck (actually a Shoe that can contain multiple decks)
-        self.deck = Deck()
-        for i_deck in range(self.ndecks): self.deck.populate()
-        self.deck.shuffle()
+        self.dealer.events=self.events
+        self.dealer.rules=rules
+        ## Creates a Shoe (dealt from a cursor, reshuffled in place), a CSMShoe or an InfiniteShoe
+        self.deck = SHOES[shoe](self.ndecks, rng=rng, penetration=penetration)
+        ## Number of rounds played.
+        self.rounds = 0
+        ## Profiler() timing the phases of play (None unless instrument() is called).
+        self.profiler = None
+
+    def instrument(self, dump_every=None, stream=None):
+        """
+        Turns on per-phase timings and counters, and returns the Profiler.
+        With dump_every (seconds), a snapshot is written to stream (stderr by 
+        default) that often.  Without instrument(), play is not slowed down.
+        """
+        self.profiler = Profiler(dump_every=dump_every, stream=stream)
+        self.profiler.attach(self)
+        return self.profiler
+
+    @property
+    def hands(self):
+        """Creates a list of the hands of all players, in order of play."""
+        hands = []
+        for player in self.players:
+            hands.extend(player.hands)
+        return hands
 
     @property
     def still_playing(self):
-        """Creates a list of players that haven't busted."""
+        """Creates a list of player hands that haven't busted (or surrendered)."""
         sp = []
         for player in self.players:
-            if not player.is_busted():
-                sp.append(player)
+            for hand in player.hands:
+                if not hand.is_busted() and not hand.surrendered:
+                    sp.append(hand)
         return sp
 
-    def __additional_cards(self, player):
+    def __additional_cards(self, hand):
         """
-        Prompts for hit until player stays or busts.
+        Asks for hits until the hand stays or busts.
         """
-        while not player.is_busted() and player.is_hitting():
+        while not hand.is_busted() and hand.is_hitting(self.dealer):
             
-            self.deck.deal([player])
-
-            if player.is_busted():
-                player.bust()
+            self.deck.deal([hand])
+            if self.events.sinks:
+                self.events.emit("hit", player=hand, card=hand.cards[-1])
 
-    def play(self):
-        """Main play routine.  finish_hand() called for second half of game play."""
-        again = None
-        while again != "n":
-    
-            # shuffling before deal if < 35 remaining after initial deal
-            if (len(self.deck.cards)< (1+len(self.players) )*2 + 35 ):
-                print str(len(self.deck.cards)) +" cards left...shuffling"
-                self.deck.clear()
-                for i_deck in range(self.ndecks): self.deck.populate()
-                self.deck.shuffle()                
-        
-            # get bets before dealing
-            for player in self.players:
-               bet=ask_number(player.name +", what is your bet? (1-"+str(player.nchips)+"): ", low=1,high=int(player.nchips))
-               player.placeBet(bet)
-            
-            # deal the cards
-            self.deck.deal(self.players + [self.dealer], per_hand = 2)
+            if hand.is_busted():
+                hand.bust()
 
-            self.dealer.flip_first_card()        # hide dealer's first card
+    def __dealer_cards(self):
+        """
+        Deals to the dealer until the dealer stays or busts.
+        """
+        while not self.dealer.is_busted() and self.dealer.is_hitting():
             
-            # checking for dealer blackjack when ace is showing
-            if (self.dealer.cards[1].rank=="A"):
-                self.check_blackjack_and_finish_hand() 
-            else:
-               self.dealer.flip_first_card()    # reveal dealer's first card
-               self.finish_hand()               # finish regular play
-    
-
-            # remove everyone's cards, split hands and bankrupt players
-            remove_list=list(); i_p=0 #creating a list of items to remove
-            for player in self.players:
-                player.clear()                  # clearing player hand
-                if player.nchips==0 and player.split==False:
-                    print player.name +" is out of chips."
-                    remove_list.append(player)
-                if player.split:                # deleting split hands
-                    remove_list.append(player)
-                    self.players[i_p-1].nchips+=player.nchips
-                i_p+=1
+            self.deck.deal([self.dealer])
+            if self.events.sinks:
+                self.events.emit("dealer_hit", dealer=self.dealer, card=self.dealer.cards[-1])
 
-            for player in remove_list:
-                self.players.remove(player)     # removing from list
+            if self.dealer.is_busted():
+                self.dealer.bust()
 
-            # clearing dealer hand
-            self.dealer.clear()
+    def play(self):
+        """Main play routine.  Plays rounds (play_round()) until there are no players or no more games."""
+        again = None
+        while again != "n":
+            self.play_round()
 
             # summary before next round and prompt to continue
-            print "--------- Going into next round ---------"
+            print("--------- Going into next round ---------")
             for player in self.players:
-                print player.name + ")   bank:  "  +str(player.nchips)  
+                print(player.name + ")   bank:  "  +str(player.nchips))
             if (len(self.players)==0): 
-                print "House wins.  No more players"
+                print("House wins.  No more players")
                 again="n"
             else:
                 again = ask_yes_no("\nanother game? (y/n): ")
 
+    def simulate(self, nrounds):
+        """
+        Plays up to nrounds rounds (fewer if every player runs out of chips).
+        Returns the number of rounds played.
+        """
+        n = 0
+        while n < nrounds and self.players:
+            self.play_round()
+            n += 1
+        return n
+
+    def play_round(self):
+        """Plays one round.  finish_hand() called for second half of game play."""
+        events = self.events
+
+        # shuffling before deal if < 35 remaining after initial deal (or at the penetration limit)
+        if self.deck.needs_shuffle( (1+len(self.players) )*2 + 35 ):
+            if events.sinks:
+                events.emit("shuffle", remaining=self.deck.remaining)
+            self.deck.shuffle()                
+        self.rounds += 1
+        if events.sinks:
+            events.emit("round", round=self.rounds, shoe=self.deck, players=self.players)
+    
+        # get bets before dealing
+        self.take_bets()
+        
+        # deal the cards
+        self.deck.deal([player.hands[0] for player in self.players] + [self.dealer], per_hand = 2)
+        if events.sinks:
+            events.emit("deal", players=self.players, dealer=self.dealer)
+
+        self.dealer.flip_first_card()        # hide dealer's first card
+        
+        # checking for dealer blackjack when ace is showing
+        if (self.dealer.cards[1].rank=="A"):
+            self.check_blackjack_and_finish_hand() 
+        else:
+           self.dealer.flip_first_card()    # reveal dealer's first card
+           self.finish_hand()               # finish regular play
+
+
+        if events.sinks:
+            events.emit("round_end", round=self.rounds, players=self.players, dealer=self.dealer)
+
+        # remove everyone's cards, split hands and bankrupt players
+        remove_list=list() #creating a list of items to remove
+        for player in self.players:
+            player.clear()                  # clearing player hands
+            if player.nchips==0:
+                if events.sinks:
+                    events.emit("out_of_chips", player=player)
+                remove_list.append(player)
+
+        for player in remove_list:
+            self.players.remove(player)     # removing from list
+
+        # clearing dealer hand
+        self.dealer.clear()
+
+    def take_bets(self):
+        """Asks each player's strategy for a bet (1 up to the player's bank)."""
+        for player in self.players:
+           bet=player.strategy.bet(player, self.deck)
+           player.placeBet(max(1, min(bet, player.nchips)))
+
     def finish_hand(self):
         """ 
         regular play after first deal has been handled in play() 
         """
+        events = self.events
         self.dealer.flip_first_card()    # hide dealer's first card
 
         # processing splittable hands
-        print("\nDealer hand: \n" +str(self.dealer) )
+        if events.sinks:
+            events.emit("dealer_hand", dealer=self.dealer)
+        self.rules.offer_surrender(self.players, self.dealer)
         self.process_splits()
 
-        # printing out hands after dealer blackjack processing and splitting
-        print ""
-        print "----------- After Deal ------------"
-        for player in self.players:
-            print player.name + ") bet:  "+ str(player.bet)+ "  bank:  "+ str(player.nchips)  
-            print "        Cards:  "+ str(player)
-
-        print ""
-        print     "  Dealer hand:  "+ str(self.dealer)
-        print "-----------------------------------"
-        print""
+        # showing hands after dealer blackjack processing and splitting
+        if events.sinks:
+            events.emit("hands", hands=self.hands, dealer=self.dealer)
 
         # offer double downs'
         self.offer_double_down()
 
         # deal additional cards to players
         for player in self.players:
-            self.__additional_cards(player)
+            for hand in player.hands:
+                if not hand.surrendered:
+                    self.__additional_cards(hand)
 
         self.dealer.flip_first_card()    # reveal dealer's first card
 
         if not self.still_playing:
             # since all players have busted, just show the dealer's hand
-            print("\nDealer hand: \n" +str(self.dealer) )
+            if events.sinks:
+                events.emit("dealer_hand", dealer=self.dealer)
         else:
             # deal additional cards to dealer
-            print(self.dealer)
-            self.__additional_cards(self.dealer)
-
-            print "\n --Summary of Play against Dealer Hand --\n Dealer hand (Final):\n        " + str(self.dealer) 
-            if self.dealer.is_busted():
-                # everyone still playing wins if dealer busts.
-                print("Dealer busts.\n")
-                for player in self.still_playing:
-                    player.win()
-            else:
-                # compare each player still playing to dealer
-                print""
-                for player in self.still_playing:
-                    if player.total > self.dealer.total:
-                        player.win()
-                 
-                    elif player.total < self.dealer.total:
+            if events.sinks:
+                events.emit("dealer_reveal", dealer=self.dealer)
+            self.__dealer_cards()
+            self.settle()
+
+    def settle(self):
+        """Pays out (or collects) the bets of the players still playing against the dealer's final hand."""
+        if self.events.sinks:
+            self.events.emit("showdown", dealer=self.dealer)
+        if self.dealer.is_busted():
+            # everyone still playing wins if dealer busts.
+            for hand in self.still_playing:
+                hand.win()
+        else:
+            # compare each hand still playing to dealer
+            for hand in self.still_playing:
+                if hand.total > self.dealer.total:
+                    hand.win()
+             
+                elif hand.total < self.dealer.total:
+             
+                    hand.lose()
                  
-                        player.lose()
-                     
-                    else:  #tie in score (blackjack breaks a tie of 21)
-                        if player.is_blackjack():
-                            player.win()
-                        else:    
-                           player.push()
+                else:  #tie in score (blackjack breaks a tie of 21)
+                    if hand.is_blackjack():
+                        hand.win()
+                    else:    
+                       hand.push()
 
 
     def process_splits(self):
         """ 
-        checks for hands that can be split, creates a duplicate player, takes a bet, 
-        and deals an extra card to each hand. 
+        checks for hands that can be split, moves a card to a new hand of the 
+        same player, takes a bet, and deals an extra card to each hand.  Hands 
+        may be split again, up to max_splits per player. 
         """
-        # prompting for split player, and making sure player can afford it.
-        add_list=list(); i_p=0
-        print "\n"+ "--------- Splitting Hands ---------"
-        for player in self.players:
-            if (player.is_splittable()): 
-                print player.name+" has "+str(player) +":  this can be split (only once for now)"
-                if (player.nchips>=player.bet): #you have to have money in the bank to split.
-                   split = ask_yes_no("   "+player.name+":  do you want to split? (y/n): ")
-                else:
-                   split = "n"
-                   print "but you don't have enough money to cover the split...sorry!"
-                if split=="y":
-                    add_list.append(i_p)
-            i_p+=1
-        if len(add_list)==0: print "No splits will be made this round."
-
-        print       "-----------------------------------"
-
-
-        #  create a split player
-        reg_shift=0
-        for addline in add_list:
-            i_p=addline+reg_shift #reg shift is required for multiple player splits
-            # get the data from the player that is splitting
-            player_to_split = self.players[i_p]
-            new_name = player_to_split.name + "-2"
-            top_card = player_to_split.cards[0]
-            
-            # transferr the bet to split player
-            bet_to_transfer=player_to_split.bet  
-            self.players[i_p].nchips-= bet_to_transfer
-            
-            # create a new hand:
-            new_split_player = Player(new_name,nchips=0)
-            new_split_player.setSplitHand() #sets Hand with a boolean flag
-            self.players.insert(i_p+1, new_split_player)
-            self.players[i_p+1].cards=[] #same init issue as Games()
-            self.players[i_p+1].bet=bet_to_transfer
-            
-            # give the new split hand the top card
-            self.players[i_p].give(top_card,self.players[i_p+1])
+        # asking the strategy of each splittable hand, and making sure player can afford it.
+        events = self.events
+        max_hands = 1 + self.max_splits
+        nsplits = 0
+        if events.sinks:
+            events.emit("splits_begin")
+        candidates = [(player, hand) for player in self.players for hand in player.hands]
+        while candidates:
+            split_list = list()
+            for player, hand in candidates:
+                if hand.is_splittable() and len(player.hands) < max_hands and not hand.surrendered: 
+                    affordable = player.nchips>=hand.bet #you have to have money in the bank to split.
+                    if events.sinks:
+                        events.emit("splittable", player=hand, affordable=affordable)
+                    if affordable and player.strategy.split(hand, self.dealer):
+                        split_list.append((player, hand))
+
+            #  split the hands (the new hands are offered a resplit)
+            candidates = list()
+            for player, hand in split_list:
+                if player.nchips<hand.bet or len(player.hands)>=max_hands:
+                    continue
+                new_hand = player.split(hand)
       
-            # deal one card to each of the new hands:
-            self.deck.deal(self.players[i_p:i_p+2],per_hand=1) 
-            reg_shift +=1
+                # deal one card to each of the new hands:
+                self.deck.deal([hand, new_hand],per_hand=1) 
+                if events.sinks:
+                    events.emit("split", player=hand, split_player=new_hand)
+                nsplits += 1
+                candidates.extend([(player, hand), (player, new_hand)])
+
+        if events.sinks:
+            events.emit("splits_end", nsplits=nsplits)
             
     def check_blackjack_and_finish_hand(self):
         """
         Screens for dealer blackjack, offers insurance, and returns 
         to normal play if no blackjack. 
         """
-    
-        print "Dealer hand:"
-        print(self.dealer)
-        print "\nInsurance is available if Dealer Ace is showing."
-        for player in self.players:
-            max_ins=min(player.nchips,player.bet)
-            ins_bet = ask_number(player.name +" has "+str(player) + ", insurance (0-"+str(max_ins)+")? ",low=0,high=max_ins )
-            player.placeInsuranceBet(ins_bet)
+        events = self.events
+        self.offer_insurance()
 
         # check for blackjack:
         self.dealer.flip_first_card()    # reveal dealer's first card
         
-        print "Dealer hand:"
-        print(self.dealer)
+        if events.sinks:
+            events.emit("dealer_peek", dealer=self.dealer)
          
         if self.dealer.is_blackjack():
-           print "Dealer blackjack!\n"
+           if events.sinks:
+               events.emit("dealer_blackjack", dealer=self.dealer)
            for player in self.players:
                player.payInsuranceBet()
-               print player.name + " has " + str(player.nchips)+" chips after insurance payout"  
-               print player.name + " hand: " + str(player) +"\n"
+               hand = player.hands[0]
+               if events.sinks:
+                   events.emit("insurance_payout", player=hand)
   
-               if player.is_blackjack():
-                   print("even money insurance payout")
-                   player.push()
+               if hand.is_blackjack():
+                   if events.sinks:
+                       events.emit("even_money", player=hand)
+                   hand.push()
                else:
-                   player.lose()
+                   hand.lose()
         else:
-            print "No dealer blackjack...insurance bets collected."
+            if events.sinks:
+                events.emit("no_dealer_blackjack", dealer=self.dealer)
             # return to finishing regular play
             self.finish_hand()
     
+    def offer_insurance(self):
+        """Asks each player's strategy for an insurance bet (up to the bet, if the bank allows)."""
+        events = self.events
+        if events.sinks:
+            events.emit("insurance_offer", dealer=self.dealer)
+        for player in self.players:
+            max_ins=min(player.nchips,player.bet)
+            ins_bet = player.strategy.insurance(player.hands[0], self.dealer, max_ins)
+            player.placeInsuranceBet(max(0, min(ins_bet, max_ins)))
+            if player.ins_bet and events.sinks:
+                events.emit("insurance", player=player, ins_bet=player.ins_bet)
+
     def offer_double_down(self):
        """
-       To keep game play moving, we offer double downs to hands with 9,10,or 11 as score.  
-       Also, player must be able to afford it.
+       To keep game play moving, we offer double downs to hands with 9,10,or 11 as score 
+       (or as the rules say).  Also, player must be able to afford it.
        """
+       events = self.events
+       double_offered = self.rules.double_offered
 
-       print ""
-       print "------- Double Down Offers --------"
-       i_p=0;dd_count=0
+       if events.sinks:
+           events.emit("doubles_begin")
+       dd_count=0
        for player in self.players:
-           if player.total>=9 and player.total<=11:
-               doubledown = ask_yes_no("   "+player.name+" has "+str(player) +":  do you want to double down? (y/n): ")
-               #extra bookkeepping for a split hand:
-               if (doubledown=="y" and player.split):
-                  player_orig=self.players[i_p-1]
-                  if player_orig.nchips>=player.bet: #borrowing from original player
-                      player.nchips+=player.bet
-                      player_orig.nchips-=player.bet
-                  else:  
-                      print  player_orig.name+" bank ("+str(player_orig.nchips)+") not enough to cover bet..sorry!"
-                      doubledown="n"
-               #error handling for all hands (including fixed split hands)       
-               if (doubledown=="y") and (player.nchips<player.bet):
-                      print  player.name+" bank ("+str(player.nchips)+") not enough to cover bet..sorry!"
-                      doubledown="n"
-
-               #processing the double down if everything is in order
-               if doubledown=="y":
-                   dd_count+=1
-                   player.placeBet(player.bet) #adding a bet to existing bet
-                   player.setDoubledownHand()
-                   self.deck.deal([player])
-           i_p+=1   
-       if (dd_count==0): print "No double downs will be made this round"
-       print "-----------------------------------"
-       print""                       
+           for hand in player.hands:
+               if not hand.surrendered and double_offered(hand):
+                   doubledown = player.strategy.double_down(hand, self.dealer)
+                   #error handling for all hands (split hands bet from the same bank)       
+                   if (doubledown) and (player.nchips<hand.bet):
+                          if events.sinks:
+                              events.emit("double_refused", player=hand, bank=player)
+                          doubledown=False
+
+                   #processing the double down if everything is in order
+                   if doubledown:
+                       dd_count+=1
+                       hand.placeBet(hand.bet) #adding a bet to existing bet
+                       hand.setDoubledownHand()
+                       self.deck.deal([hand])
+                       if events.sinks:
+                           events.emit("double", player=hand, card=hand.cards[-1])
+                       if hand.is_busted():
+                           hand.bust()
+       if events.sinks:
+           events.emit("doubles_end", ndoubles=dd_count)
+
+
+class ConsoleStrategy(Strategy):
+    """Strategy that prompts the players at the console (interactive play)."""
+    def bet(self, player, shoe):
+        """Prompts for a bet."""
+        return ask_number(player.name +", what is your bet? (1-"+str(player.nchips)+"): ", low=1,high=int(player.nchips))
+
+    def insurance(self, player, dealer, max_ins):
+        """Prompts for an insurance bet."""
+        return ask_number(player.name +" has "+str(player) + ", insurance (0-"+str(max_ins)+")? ",low=0,high=max_ins )
+
+    def split(self, player, dealer):
+        """Prompts for a split."""
+        return ask_yes_no("   "+player.name+":  do you want to split? (y/n): ") == "y"
+
+    def double_down(self, player, dealer):
+        """Prompts for a double down."""
+        return ask_yes_no("   "+player.name+" has "+str(player) +":  do you want to double down? (y/n): ") == "y"
+
+    def surrender(self, player, dealer):
+        """Prompts for a surrender."""
+        return ask_yes_no("   "+player.name+" has "+str(player) +":  do you want to surrender? (y/n): ") == "y"
+
+    def hit(self, player, dealer):
+        """Prompts for a hit."""
+        return ask_yes_no( player.name + " has "+str(player)+ ", do you want a hit? (Y/N): ") == "y"
 
 def ask_yes_no(question):
     """Ask a yes or no question."""
@@ -0,0 +1,151 @@
+"""Probability Module:  Exact distribution of the dealer's final hand for a given shoe composition"""
+# A shoe composition is a tuple of 10 counts, the number of cards left of
+# each value:  (Aces, 2s, 3s, ..., 9s, 10s and facecards).  The dealer draws
+# without replacement and follows the dealer rule of rules.Rules (stands on
+# all 17s, or hits soft 17 with hit_soft_17), with Aces counted as in
+# Hand.total.
+
+from collections import OrderedDict
+
+from cards import Card
+
+## Index of each final dealer outcome in a distribution:  17-21, bust, blackjack.
+OUTCOMES = (17, 18, 19, 20, 21, "bust", "blackjack")
+## Index of bust in a distribution.
+BUST = 5
+## Index of blackjack (two card 21) in a distribution.
+BLACKJACK = 6
+
+
+def shoe_counts(ndecks):
+    """Returns the composition of a full shoe of ndecks decks."""
+    return tuple([4*ndecks] * 9 + [16*ndecks])
+
+
+def cards_counts(cards):
+    """Returns the composition of a list of cards."""
+    counts = [0] * 10
+    for card in cards:
+        counts[card.value - 1] += 1
+    return tuple(counts)
+
+
+def remove(counts, value):
+    """Returns the composition with one card of value (1-10) taken out."""
+    counts = list(counts)
+    counts[value - 1] -= 1
+    return tuple(counts)
+
+
+class LRUCache(object):
+    """A dictionary holding at most maxsize items, evicting the least recently used."""
+    def __init__(self, maxsize=4096):
+        """Initializes LRUCache."""
+        ## Maximum number of items.
+        self.maxsize = maxsize
+        ## Number of lookups found in the cache.
+        self.hits = 0
+        ## Number of lookups not found in the cache.
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        """Number of items in the cache."""
+        return len(self._items)
+
+    def get(self, key):
+        """Returns the item for key (and marks it as recently used), or None."""
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Stores an item, evicting the least recently used one if full."""
+        self._items.pop(key, None)
+        self._items[key] = value
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        """Empties the cache."""
+        self._items.clear()
+
+
+def _final(total):
+    """Returns the distribution of a dealer standing (or busted) at total."""
+    dist = [0.0] * len(OUTCOMES)
+    if total > 21:
+        dist[BUST] = 1.0
+    else:
+        dist[total - 17] = 1.0
+    return dist
+
+
+def _draw(hard, aces, counts, memo, hit_soft_17=False):
+    """Distribution of the dealer's final hand, drawing from counts until standing."""
+    soft = aces and hard <= 11
+    total = hard + 10 if soft else hard
+    if total > 17 or (total == 17 and not (soft and hit_soft_17)):
+        return _final(total)
+    key = (hard, aces > 0, counts)
+    dist = memo.get(key)
+    if dist is not None:
+        return dist
+
+    n = sum(counts)
+    if n == 0:
+        raise ValueError("shoe ran out of cards during dealer play")
+    dist = [0.0] * len(OUTCOMES)
+    for i_value, count in enumerate(counts):
+        if count:
+            value = i_value + 1
+            sub = _draw(hard + value, aces + (value == Card.ACE_VALUE),
+                        remove(counts, value), memo, hit_soft_17)
+            p = float(count) / n
+            for i_outcome in range(len(OUTCOMES)):
+                dist[i_outcome] += p * sub[i_outcome]
+    memo[key] = dist
+    return dist
+
+
+## Cache of dealer distributions by (upcard, composition).
+cache = LRUCache()
+
+
+def dealer_distribution(upcard, counts, hit_soft_17=False):
+    """
+    Returns the probabilities (a tuple indexed as OUTCOMES) of the dealer's
+    final hand given the upcard value (1-10) and the composition of the cards
+    the hole card and hits are drawn from, for a dealer standing on all 17s
+    (or hitting soft 17 if hit_soft_17).  Results are memoized in cache.
+    """
+    key = (upcard, counts, hit_soft_17)
+    dist = cache.get(key)
+    if dist is not None:
+        return dist
+
+    n = sum(counts)
+    memo = {}
+    total = [0.0] * len(OUTCOMES)
+    is_ace = upcard == Card.ACE_VALUE
+    for i_value, count in enumerate(counts):
+        if not count:
+            continue
+        hole = i_value + 1
+        p = float(count) / n
+        if (is_ace and hole == 10) or (hole == Card.ACE_VALUE and upcard == 10):
+            total[BLACKJACK] += p
+            continue
+        sub = _draw(upcard + hole, is_ace + (hole == Card.ACE_VALUE),
+                    remove(counts, hole), memo, hit_soft_17)
+        for i_outcome in range(len(OUTCOMES)):
+            total[i_outcome] += p * sub[i_outcome]
+
+    dist = tuple(total)
+    cache.put(key, dist)
+    return dist
@@ -0,0 +1,137 @@
+"""Profiling Module:  Opt-in per-phase timings and counters for a Game"""
+# Profiler.attach() replaces the phase methods of one Game (and its Shoe)
+# with timed wrappers on the instance, so an uninstrumented Game runs the
+# plain methods with no checks at all.  Timings are wall-clock and include
+# nested phases (e.g. "player_hits" includes the "deal" of each hit).
+
+import json
+import sys
+import time
+
+## Clock used for timings.
+clock = getattr(time, "perf_counter", time.time)
+
+
+class Profiler(object):
+    """Wall-clock time and call counts per phase of play, and event counters."""
+    ## Phases:  (name, Game attribute) in order of play.
+    PHASES = (("round", "play_round"),
+              ("shuffle", None),
+              ("bets", "take_bets"),
+              ("deal", None),
+              ("insurance", "offer_insurance"),
+              ("splits", "process_splits"),
+              ("double_down", "offer_double_down"),
+              ("player_hits", "_Game__additional_cards"),
+              ("dealer", "_Game__dealer_cards"),
+              ("settlement", "settle"))
+    ## Event counters.
+    COUNTERS = ("rounds", "cards_dealt", "reshuffles", "splits", "doubles", "insurance_bets")
+
+    def __init__(self, dump_every=None, stream=None):
+        """Initializes Profiler with zero counts."""
+        ## Seconds between periodic dumps (None for no dumps).
+        self.dump_every = dump_every
+        ## File the periodic dumps are written to.
+        self.stream = stream
+        self.reset()
+
+    def reset(self):
+        """Zeroes all timings and counters."""
+        # zeroed in place, since the wrappers of an attached game hold these dictionaries
+        ## Seconds spent in each phase.
+        self.seconds = getattr(self, "seconds", {})
+        ## Calls of each phase.
+        self.calls = getattr(self, "calls", {})
+        ## Event counts.
+        self.counters = getattr(self, "counters", {})
+        for name, attr in Profiler.PHASES:
+            self.seconds[name] = 0.0
+            self.calls[name] = 0
+        for name in Profiler.COUNTERS:
+            self.counters[name] = 0
+        self._start = clock()
+        self._last_dump = self._start
+
+    def _timed(self, name, method, after=None):
+        """Returns method wrapped to time it under phase name, then call after()."""
+        seconds = self.seconds
+        calls = self.calls
+        def timed(*args, **kwargs):
+            start = clock()
+            result = method(*args, **kwargs)
+            seconds[name] += clock() - start
+            calls[name] += 1
+            if after is not None:
+                after()
+            return result
+        return timed
+
+    def attach(self, game):
+        """Wraps the phase methods of game (and of its shoe) to record timings and counters."""
+        counters = self.counters
+        seconds = self.seconds
+        calls = self.calls
+        deck = game.deck
+        players = game.players
+
+        # counters read off the game after a phase has run
+        def count_round():
+            counters["rounds"] += 1
+            if self.dump_every is not None and clock() - self._last_dump >= self.dump_every:
+                self.dump()
+        def count_splits():
+            counters["splits"] += sum(len(player.hands) - 1 for player in players)
+        def count_doubles():
+            counters["doubles"] += sum(1 for player in players 
+                                       for hand in player.hands if hand.doubledown)
+        def count_insurance():
+            counters["insurance_bets"] += sum(1 for player in players if player.ins_bet > 0)
+        after = {"round": count_round, "splits": count_splits,
+                 "double_down": count_doubles, "insurance": count_insurance}
+
+        for name, attr in Profiler.PHASES:
+            if attr is not None:
+                setattr(game, attr, self._timed(name, getattr(game, attr), after.get(name)))
+
+        def count_shuffle():
+            counters["reshuffles"] += 1
+        deck.shuffle = self._timed("shuffle", deck.shuffle, count_shuffle)
+
+        deal = deck.deal
+        def timed_deal(hands, per_hand = 1):
+            start = clock()
+            # counted off the hands:  an InfiniteShoe's remaining never changes
+            held = sum(len(hand.cards) for hand in hands)
+            deal(hands, per_hand)
+            counters["cards_dealt"] += sum(len(hand.cards) for hand in hands) - held
+            seconds["deal"] += clock() - start
+            calls["deal"] += 1
+        deck.deal = timed_deal
+
+    def snapshot(self):
+        """Returns the current timings and counters as a dictionary."""
+        return {
+            "elapsed": clock() - self._start,
+            "phases": dict((name, {"calls": self.calls[name], "seconds": self.seconds[name]})
+                           for name, attr in Profiler.PHASES),
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, stream=None):
+        """Writes a snapshot as one line of JSON to stream (default:  self.stream or stderr)."""
+        stream = stream or self.stream or sys.stderr
+        stream.write(json.dumps(self.snapshot(), sort_keys=True) + "\n")
+        stream.flush()
+        self._last_dump = clock()
+
+    def report(self):
+        """Returns a text table of the timings and counters."""
+        lines = ["%-12s %10s %12s %12s" % ("phase", "calls", "seconds", "us/call")]
+        for name, attr in Profiler.PHASES:
+            calls = self.calls[name]
+            per_call = 1e6 * self.seconds[name] / calls if calls else 0.0
+            lines.append("%-12s %10d %12.4f %12.2f" % (name, calls, self.seconds[name], per_call))
+        for name in Profiler.COUNTERS:
+            lines.append("%-12s %10d" % (name, self.counters[name]))
+        return "\n".join(lines)
@@ -0,0 +1,345 @@
+"""Replay Module:  Records the decisions of a headless Game, and replays them against its hand log"""
+# A Recorder logs a session as two files:  the hand log of handlog.py (with
+# the seed in its header) and the stream of every decision the strategy
+# made.  The session's Game must shuffle with random.Random(seed) or
+# shuffler.BatchShuffler(seed) (any shoe mode):  the log header keeps the
+# kind of both.  A Replay re-runs the session from the seed, answering every
+# decision from the stream, and checks each hand against the log (cards,
+# bets, insurance, payouts and bank), so a change to the engine can be
+# proved not to change a single settlement:
+#
+#   game = Game(names, 4, strategy=SimpleStrategy(), verbose=False, rng=random.Random(7))
+#   recorder = Recorder(game, "session.hlog", "session.dec", seed=7)
+#   game.simulate(100000)
+#   recorder.close()
+#
+#   replay = Replay("session.hlog", "session.dec", names)
+#   replay.run()            # raises ReplayMismatch on the first difference
+#   replay.seek(50000)      # back to the start of a round, from the nearest checkpoint
+
+import array
+import os
+import random
+import sys
+
+from cards import SHOES
+from handlog import FIELDS, MAX_CARDS, HandLog, HandLogSink, HandLogWriter
+from play import Game
+from shuffler import BATCH_SIZE, BatchShuffler
+from strategy import Strategy
+
+
+class ReplayError(Exception):
+    """A session can't be replayed (e.g. the decision stream ran out)."""
+
+
+class ReplayMismatch(ReplayError):
+    """A replayed hand differs from the logged one."""
+
+
+def record_names():
+    """Returns the name of each value of a flat record, in order (card slots are numbered)."""
+    names = []
+    for name, fmt, typ in FIELDS:
+        if name in ("cards", "dealer_cards"):
+            names.extend("%s[%d]" % (name, i_card) for i_card in range(MAX_CARDS))
+        else:
+            names.append(name)
+    return names
+
+## Name of each value of a flat record.
+RECORD_NAMES = record_names()
+
+
+class DecisionWriter(object):
+    """Appends decisions (integers) to a file, buffer_size at a time."""
+    def __init__(self, path, buffer_size=65536):
+        """Initializes DecisionWriter, creating (or truncating) the file at path."""
+        ## Open decision file.
+        self.file = open(path, "wb")
+        ## Number of decisions written (buffered included).
+        self.ndecisions = 0
+        self._buffer = array.array("i")
+        self._buffer_size = buffer_size
+
+    def append(self, decision):
+        """Appends one decision."""
+        self._buffer.append(decision)
+        self.ndecisions += 1
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered decisions (little-endian 32 bit integers)."""
+        if sys.byteorder == "big":
+            self._buffer.byteswap()
+        self._buffer.tofile(self.file)
+        self._buffer = array.array("i")
+        self.file.flush()
+
+    def close(self):
+        """Flushes and closes the file."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_decisions(path):
+    """Returns the decisions of a file written by DecisionWriter, as an array."""
+    decisions = array.array("i")
+    with open(path, "rb") as f:
+        decisions.fromfile(f, os.path.getsize(path) // decisions.itemsize)
+    if sys.byteorder == "big":
+        decisions.byteswap()
+    return decisions
+
+
+class RecordingStrategy(Strategy):
+    """Makes the decisions of another strategy and appends each one to a DecisionWriter."""
+    def __init__(self, strategy, writer):
+        """Initializes RecordingStrategy"""
+        ## Strategy() making the decisions.
+        self.strategy = strategy
+        ## DecisionWriter() the decisions are appended to.
+        self.writer = writer
+
+    def bet(self, player, shoe):
+        """Records the strategy's bet."""
+        bet = self.strategy.bet(player, shoe)
+        self.writer.append(bet)
+        return bet
+
+    def insurance(self, player, dealer, max_ins):
+        """Records the strategy's insurance bet."""
+        ins_bet = self.strategy.insurance(player, dealer, max_ins)
+        self.writer.append(ins_bet)
+        return ins_bet
+
+    def split(self, player, dealer):
+        """Records the strategy's split decision."""
+        split = self.strategy.split(player, dealer)
+        self.writer.append(int(bool(split)))
+        return split
+
+    def double_down(self, player, dealer):
+        """Records the strategy's double down decision."""
+        doubledown = self.strategy.double_down(player, dealer)
+        self.writer.append(int(bool(doubledown)))
+        return doubledown
+
+    def surrender(self, player, dealer):
+        """Records the strategy's surrender decision."""
+        surrender = self.strategy.surrender(player, dealer)
+        self.writer.append(int(bool(surrender)))
+        return surrender
+
+    def hit(self, player, dealer):
+        """Records the strategy's hit decision."""
+        hit = self.strategy.hit(player, dealer)
+        self.writer.append(int(bool(hit)))
+        return hit
+
+
+class ReplayStrategy(Strategy):
+    """Answers every decision from a recorded decision stream, in order."""
+    def __init__(self, decisions, pos=0):
+        """Initializes ReplayStrategy"""
+        ## Recorded decisions.
+        self.decisions = decisions
+        ## Index of the next decision.
+        self.pos = pos
+
+    def next_decision(self):
+        """Returns the next recorded decision.  Raises ReplayError at the end of the stream."""
+        try:
+            decision = self.decisions[self.pos]
+        except IndexError:
+            raise ReplayError("decision stream ended after %d decisions" % self.pos)
+        self.pos += 1
+        return decision
+
+    def bet(self, player, shoe):
+        """Returns the recorded bet."""
+        return self.next_decision()
+
+    def insurance(self, player, dealer, max_ins):
+        """Returns the recorded insurance bet."""
+        return self.next_decision()
+
+    def split(self, player, dealer):
+        """Returns the recorded split decision."""
+        return self.next_decision() != 0
+
+    def double_down(self, player, dealer):
+        """Returns the recorded double down decision."""
+        return self.next_decision() != 0
+
+    def surrender(self, player, dealer):
+        """Returns the recorded surrender decision."""
+        return self.next_decision() != 0
+
+    def hit(self, player, dealer):
+        """Returns the recorded hit decision."""
+        return self.next_decision() != 0
+
+
+def session_kinds(game):
+    """
+    Returns (shoe mode, random generator kind) of game, as kept in a log
+    header.  Raises ReplayError if a Replay couldn't rebuild its generator
+    from the seed.
+    """
+    deck = game.deck
+    shoe = [name for name, cls in SHOES.items() if type(deck) is cls]
+    if not shoe:
+        raise ReplayError("can't replay a %s shoe" % type(deck).__name__)
+    rng = deck.rng
+    if type(rng) is random.Random:
+        return shoe[0], "random"
+    if (isinstance(rng, BatchShuffler) and rng.batch_size == BATCH_SIZE
+            and type(rng.generator.bit_generator).__name__ == "PCG64"):
+        return shoe[0], "batch"
+    raise ReplayError("can't replay a game shuffled by %s (use random.Random(seed) or BatchShuffler(seed))"
+                      % getattr(rng, "__name__", type(rng).__name__))
+
+
+class Recorder(object):
+    """
+    Records a headless Game:  its hands to a hand log (with seed, the seed
+    of the Game's rng, and the shoe and rng kinds in the header) and its 
+    decisions to a decision file.
+    """
+    def __init__(self, game, log_path, decisions_path, seed):
+        """
+        Initializes Recorder (replacing both files), wrapping the strategy 
+        of every player of game.  Raises ReplayError if game can't be 
+        replayed (see session_kinds()).
+        """
+        shoe, rng = session_kinds(game)
+        ## HandLogWriter() of the hand log.
+        self.log = HandLogWriter(log_path, seed=seed, ndecks=game.ndecks, append=False,
+                                 shoe=shoe, rng=rng)
+        ## DecisionWriter() of the decisions.
+        self.decisions = DecisionWriter(decisions_path)
+        game.strategy = RecordingStrategy(game.strategy, self.decisions)
+        for player in game.players:
+            player.strategy = game.strategy
+        ## HandLogSink() subscribed to the game.
+        self.sink = game.events.subscribe(HandLogSink(self.log))
+
+    def close(self):
+        """Flushes and closes both files."""
+        self.log.close()
+        self.decisions.close()
+
+
+class LogChecker(object):
+    """Takes the place of a HandLogWriter, comparing each record with the next one of a HandLog."""
+    def __init__(self, log):
+        """Initializes LogChecker"""
+        ## HandLog() of the recorded session.
+        self.log = log
+        ## Index of the next record.
+        self.pos = 0
+
+    def write(self, *fields):
+        """Compares the record fields with the logged record.  Raises ReplayMismatch on a difference."""
+        if self.pos >= len(self.log):
+            raise ReplayMismatch("round %d played past the end of the log" % fields[0])
+        logged = self.log.raw_record(self.pos)
+        if logged != fields:
+            for name, expected, got in zip(RECORD_NAMES, logged, fields):
+                if expected != got:
+                    raise ReplayMismatch("record %d (round %d, seat %d, hand %d):  %s is %r, logged %r"
+                                         % (self.pos, fields[0], fields[3], fields[4], name, got, expected))
+        self.pos += 1
+
+
+class Replay(object):
+    """
+    Replays a recorded session headless, checking every hand against the
+    log.  The state at the start of every checkpoint_every-th round is kept,
+    so seek() can go back (or forward) to any round quickly.  names,
+    nchips, penetration, max_splits and rules must be those of the recorded Game.
+    """
+    def __init__(self, log_path, decisions_path, names, nchips=100, penetration=None,
+                 max_splits=1, rules=None, checkpoint_every=1000):
+        """Initializes Replay at the start of the session."""
+        ## HandLog() of the recorded session.
+        self.log = HandLog(log_path)
+        ## ReplayStrategy() answering the decisions.
+        self.strategy = ReplayStrategy(read_decisions(decisions_path))
+        if self.log.rng == "batch":
+            rng = BatchShuffler(seed=self.log.seed)
+        else:
+            rng = random.Random(self.log.seed)
+        ## Game() replaying the session (with the recorded shoe mode and generator).
+        self.game = Game(names, self.log.ndecks, strategy=self.strategy, verbose=False,
+                         rng=rng, penetration=penetration, max_splits=max_splits,
+                         rules=rules, shoe=self.log.shoe)
+        for player in self.game.players:
+            player.nchips = nchips
+        ## LogChecker() comparing the hands with the log.
+        self.checker = LogChecker(self.log)
+        self.game.events.subscribe(HandLogSink(self.checker))
+        self._seats = dict((player.name, player) for player in self.game.players)
+        ## Rounds between checkpoints.
+        self.checkpoint_every = checkpoint_every
+        ## Checkpoints by number of rounds played.
+        self.checkpoints = {}
+        ## Number of rounds in the log.
+        self.nrounds = 0
+        if len(self.log):
+            self.nrounds = self.log.raw_record(len(self.log) - 1)[0]
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Keeps the state of the replay (between rounds) under the number of rounds played."""
+        game = self.game
+        self.checkpoints[game.rounds] = (game.deck.rng.getstate(), game.deck.get_state(),
+                                         [(player.name, player.nchips) for player in game.players],
+                                         self.strategy.pos, self.checker.pos)
+
+    def restore(self, rounds):
+        """Returns the replay to the checkpoint taken after rounds rounds."""
+        rng_state, shoe_state, banks, decision_pos, record_pos = self.checkpoints[rounds]
+        game = self.game
+        game.rounds = rounds
+        game.deck.rng.setstate(rng_state)
+        game.deck.set_state(shoe_state)
+        game.players = []
+        for name, nchips in banks:
+            player = self._seats[name]
+            player.clear()
+            player.nchips = nchips
+            game.players.append(player)
+        game.dealer.clear()
+        self.strategy.pos = decision_pos
+        self.checker.pos = record_pos
+
+    def run(self, nrounds=None):
+        """
+        Replays nrounds rounds (default:  to the end of the log), checking
+        every hand.  Raises ReplayMismatch on the first difference.  Returns
+        the number of rounds played.
+        """
+        game = self.game
+        last = self.nrounds if nrounds is None else min(self.nrounds, game.rounds + nrounds)
+        start = game.rounds
+        while game.rounds < last and game.players:
+            game.play_round()
+            if game.rounds % self.checkpoint_every == 0:
+                self.checkpoint()
+        return game.rounds - start
+
+    def seek(self, round):
+        """Positions the replay at the start of round (1 is the first round)."""
+        rounds = round - 1
+        if not 0 <= rounds <= self.nrounds:
+            raise ValueError("round %d is not in the log" % round)
+        self.restore(max(r for r in self.checkpoints if r <= rounds))
+        self.run(rounds - self.game.rounds)
+
+    def close(self):
+        """Closes the log."""
+        self.log.close()
@@ -0,0 +1,127 @@
+"""Rules Module:  Table rules of a Game, compiled once into the functions the engine calls"""
+# A Rules object holds a rule set and, when it is created, picks the small
+# functions the engine calls for the rule-dependent steps (dealer hits,
+# blackjack payout, double down and surrender offers).  The choice is made
+# once per rule set, so playing a hand runs no rule flag checks.  The
+# defaults are the rules this game has always had.
+#
+#   Game(names, 6, rules=Rules(hit_soft_17=True, blackjack_payout=(3, 2), surrender=True))
+#
+# Payouts are integer chips:  a blackjack returns the bet plus the payout
+# rounded down (3:2 on a bet of 5 returns 5+7), and a surrender returns
+# half the bet rounded down.
+
+
+class Rules(object):
+    """A rule set.  Attributes are read-only once created (make a new Rules to change them)."""
+    def __init__(self, hit_soft_17=False, blackjack_payout=(2, 1), double_totals=(9, 10, 11),
+                 double_after_split=True, max_splits=1, surrender=False, nchips=100):
+        """
+        Initializes Rules.  blackjack_payout is (numerator, denominator),
+        e.g. (3, 2) or (6, 5).  double_totals are the hand totals a double
+        down is offered on, or None to double on any two cards.
+        """
+        ## True if the dealer hits soft 17 (H17), False to stand on all 17s (S17).
+        self.hit_soft_17 = hit_soft_17
+        ## Blackjack payout as (numerator, denominator).
+        self.blackjack_payout = tuple(blackjack_payout)
+        ## Totals a double down is offered on (None for any two cards).
+        self.double_totals = None if double_totals is None else tuple(sorted(double_totals))
+        ## True if split hands may double down.
+        self.double_after_split = double_after_split
+        ## Most splits (extra hands) per player in a round.
+        self.max_splits = max_splits
+        ## True to offer (late) surrender of the first two cards.
+        self.surrender = surrender
+        ## Starting bank of every player.
+        self.nchips = nchips
+
+        ## Function(dealer) returning True if the dealer takes another card.
+        self.dealer_hits = _dealer_hits(hit_soft_17)
+        ## Function(bet) returning the chips paid back for a winning blackjack.
+        self.blackjack_return = _blackjack_return(*self.blackjack_payout)
+        ## Function(hand) returning True if a double down is offered.
+        self.double_offered = _double_offered(self.double_totals, double_after_split)
+        ## Function(players, dealer) offering each player surrender of the first two cards (a no-op without surrender).
+        self.offer_surrender = _offer_surrender(surrender)
+
+    def as_dict(self):
+        """Returns the rule settings as a dictionary (the arguments of Rules())."""
+        return {"hit_soft_17": self.hit_soft_17,
+                "blackjack_payout": list(self.blackjack_payout),
+                "double_totals": None if self.double_totals is None else list(self.double_totals),
+                "double_after_split": self.double_after_split,
+                "max_splits": self.max_splits,
+                "surrender": self.surrender,
+                "nchips": self.nchips}
+
+    def __getstate__(self):
+        """Pickles the rule settings (the compiled functions are made again)."""
+        return self.as_dict()
+
+    def __setstate__(self, settings):
+        """Unpickles, compiling the functions of the rule settings."""
+        self.__init__(**settings)
+
+    def __repr__(self):
+        """Returns the rule settings as a constructor call."""
+        settings = self.as_dict()
+        return "Rules(%s)" % ", ".join("%s=%r" % (name, settings[name]) for name in sorted(settings))
+
+
+def _dealer_hits(hit_soft_17):
+    """Returns the dealer's hitting rule."""
+    if hit_soft_17:
+        def dealer_hits(dealer):
+            t = dealer.total
+            return t < 17 or (t == 17 and dealer.is_soft)
+    else:
+        def dealer_hits(dealer):
+            return dealer.total < 17
+    return dealer_hits
+
+
+def _blackjack_return(numerator, denominator):
+    """Returns the function paying a blackjack at numerator:denominator."""
+    if denominator == 1:
+        multiple = numerator + 1
+        def blackjack_return(bet):
+            return multiple * bet
+    else:
+        def blackjack_return(bet):
+            return bet + bet * numerator // denominator
+    return blackjack_return
+
+
+def _double_offered(double_totals, double_after_split):
+    """Returns the function deciding which (two card) hands are offered a double down."""
+    if double_totals is None:
+        if double_after_split:
+            def double_offered(hand):
+                return True
+        else:
+            def double_offered(hand):
+                return not hand.split
+    else:
+        totals = frozenset(double_totals)
+        if double_after_split:
+            def double_offered(hand):
+                return hand.total in totals
+        else:
+            def double_offered(hand):
+                return not hand.split and hand.total in totals
+    return double_offered
+
+
+def _offer_surrender(surrender):
+    """Returns the function offering (late) surrender to the players, or one doing nothing."""
+    if surrender:
+        def offer_surrender(players, dealer):
+            for player in players:
+                hand = player.hands[0]
+                if player.strategy.surrender(hand, dealer):
+                    hand.surrender()
+    else:
+        def offer_surrender(players, dealer):
+            pass
+    return offer_surrender
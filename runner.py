@@ -0,0 +1,103 @@
+"""Runner Module:  Monte Carlo runs of headless Games split across a process pool"""
+# A run of nrounds is cut into fixed size chunks.  Every chunk is a separate
+# Game with its own random.Random stream, seeded from (seed, chunk index), so
+# the chunks (and the merged result) don't depend on how many workers run them.
+
+import hashlib
+import multiprocessing
+import random
+
+from play import Game
+from stats import SimStats, StatsSink
+from strategy import SimpleStrategy
+
+
+def chunk_seed(seed, i_chunk):
+    """Derives the seed of a chunk's random stream from the run seed."""
+    digest = hashlib.sha256(("%d:%d" % (seed, i_chunk)).encode("ascii")).hexdigest()
+    return int(digest[:32], 16)
+
+
+class RunResult(object):
+    """Totals of a run (or a chunk of one).  Chip totals are integers, so merging is exact."""
+    def __init__(self, nseats):
+        """Initializes RunResult with zero totals."""
+        ## Number of rounds played.
+        self.rounds = 0
+        ## Net chips won (or lost) per seat.
+        self.net = [0] * nseats
+        ## SimStats() of the rounds played (None if not collected).
+        self.stats = None
+
+    def merge(self, other):
+        """Adds the totals (and statistics) of another result."""
+        self.rounds += other.rounds
+        for i_seat, net in enumerate(other.net):
+            self.net[i_seat] += net
+        if other.stats is not None:
+            self.stats = other.stats if self.stats is None else self.stats.merge(other.stats)
+        return self
+
+    @property
+    def ev(self):
+        """Net chips per round for each seat."""
+        if not self.rounds:
+            return [0.0] * len(self.net)
+        return [float(net) / self.rounds for net in self.net]
+
+
+def run_chunk(task):
+    """
+    Plays one chunk (seed, i_chunk, nrounds, nseats, ndecks, strategy, nchips,
+    rules, stats) and returns its RunResult, with a SimStats if stats is True.
+    """
+    seed, i_chunk, nrounds, nseats, ndecks, strategy, nchips, rules, stats = task
+    names = ["seat-%d" % (i_seat + 1) for i_seat in range(nseats)]
+    game = Game(names, ndecks, strategy=strategy, verbose=False,
+                rng=random.Random(chunk_seed(seed, i_chunk)), rules=rules)
+    for player in game.players:
+        player.nchips = nchips
+    result = RunResult(nseats)
+    if stats:
+        result.stats = SimStats()
+        game.events.subscribe(StatsSink(result.stats))
+    result.rounds = game.simulate(nrounds)
+    # players who went broke have left the table
+    banks = dict((player.name, player.nchips) for player in game.players)
+    result.net = [banks.get(name, 0) - nchips for name in names]
+    return result
+
+
+def run(nrounds, seed=0, workers=1, nseats=1, ndecks=4, strategy=None,
+        nchips=10**9, chunk_rounds=10000, rules=None, stats=False):
+    """
+    Plays nrounds rounds in chunks of chunk_rounds on a pool of workers and
+    returns the merged RunResult.  The same seed (and chunk_rounds) gives the
+    same result for any number of workers.  Every Game is played under rules 
+    (a Rules(), default:  the usual rules).  If stats is True, the result
+    carries the merged SimStats of the chunks.
+    """
+    if strategy is None:
+        strategy = SimpleStrategy()
+    tasks = []
+    i_chunk = 0
+    while i_chunk * chunk_rounds < nrounds:
+        n = min(chunk_rounds, nrounds - i_chunk * chunk_rounds)
+        tasks.append((seed, i_chunk, n, nseats, ndecks, strategy, nchips, rules, stats))
+        i_chunk += 1
+
+    total = RunResult(nseats)
+    if workers == 1:
+        for task in tasks:
+            total.merge(run_chunk(task))
+        return total
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        # imap returns the chunks in order, so the merge is deterministic
+        for result in pool.imap(run_chunk, tasks):
+            total.merge(result)
+    finally:
+        pool.close()
+        pool.join()
+    return total
@@ -0,0 +1,478 @@
+"""Server Module:  asyncio server hosting many blackjack tables for remote players (Python 3.7+)"""
+# Every Table runs an ordinary headless Game in a worker thread.  Its
+# RemoteStrategy turns each decision into a coroutine on the server's one
+# event loop, which sends a "decide" message to the seat's connection and
+# awaits the reply, falling back to a default Strategy after a timeout (or
+# when the player has gone).  All sockets, timeouts and latency bookkeeping
+# live on the event loop;  the game threads only wait for their answers.
+# The server holds at most max_tables tables (one thread each), and turns
+# away players joining a new table beyond that.
+#
+# The protocol is one JSON object per line.  Client to server:
+#
+#   {"op": "join", "table": "t1", "name": "bob"}
+#   {"op": "decision", "id": 7, "value": true}
+#
+# Server to client:
+#
+#   {"type": "joined", "table": "t1", "seat": 0, "seats": 3}
+#   {"type": "decide", "id": 7, "decision": "hit", "hand": "bob", "cards": ["10s", "6d"],
+#    "total": 16, "dealer_up": "9c", "nchips": 98, "timeout": 5.0}
+#   {"type": "event", "kind": "settle", "hand": "bob", "outcome": "win", "bet": 2, "nchips": 102}
+#   {"type": "end", "nchips": 102}
+#   {"type": "error", "error": "server is full (1024 tables)"}
+#
+# A table starts when all of its seats have joined and plays nrounds rounds.
+# "bet" and "insurance" decisions are answered with integers (insurance
+# also gets "max"), the others with true/false.  If a table's game fails,
+# every seat gets an "error" message, then its "end".
+#
+#   python server.py --port 8765 --seats 3 --rounds 100
+#   python server.py --unix /tmp/blackjack.sock
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import random
+import sys
+
+from play import Game
+from profiling import clock
+from strategy import SimpleStrategy, Strategy
+
+
+class TableClosed(Exception):
+    """The server closed while a table was being played."""
+
+
+class LatencyStats(object):
+    """Count, mean, maximum and a fixed histogram (for percentiles) of decision latencies."""
+    ## Upper edges (seconds) of the histogram bins;  the last bin is unbounded.
+    EDGES = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+             0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+    def __init__(self):
+        """Initializes LatencyStats with no samples."""
+        ## Number of decisions timed.
+        self.count = 0
+        ## Total seconds.
+        self.total = 0.0
+        ## Longest latency (seconds).
+        self.max = 0.0
+        ## Samples in each bin.
+        self.bins = [0] * (len(LatencyStats.EDGES) + 1)
+        ## Decisions answered by the default strategy after a timeout.
+        self.timeouts = 0
+
+    def add(self, seconds):
+        """Adds one latency."""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        i_bin = 0
+        for edge in LatencyStats.EDGES:
+            if seconds <= edge:
+                break
+            i_bin += 1
+        self.bins[i_bin] += 1
+
+    @property
+    def mean(self):
+        """Mean latency (seconds)."""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile (the max for the last bin)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i_bin, n in enumerate(self.bins):
+            seen += n
+            if seen >= rank and n:
+                return LatencyStats.EDGES[i_bin] if i_bin < len(LatencyStats.EDGES) else self.max
+        return self.max
+
+    def summary(self):
+        """Returns the statistics as a dictionary."""
+        return {"decisions": self.count, "timeouts": self.timeouts, "mean": self.mean,
+                "p50": self.percentile(50), "p99": self.percentile(99), "max": self.max}
+
+
+class Connection(object):
+    """A client connection:  writes messages, and holds the decisions awaiting its replies."""
+    def __init__(self, reader, writer):
+        """Initializes Connection"""
+        ## asyncio StreamReader.
+        self.reader = reader
+        ## asyncio StreamWriter.
+        self.writer = writer
+        ## Futures of the decisions sent, by id.
+        self.pending = {}
+        ## True once the client has disconnected.
+        self.closed = False
+
+    def send(self, message):
+        """Writes one message (event loop thread only)."""
+        if not self.closed:
+            self.writer.write((json.dumps(message) + "\n").encode("utf-8"))
+
+    def close(self):
+        """Marks the connection closed, and releases its pending decisions (to their defaults)."""
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_result(None)
+        self.pending.clear()
+
+
+class RemoteStrategy(Strategy):
+    """Strategy of a Table's Game:  asks the seat's client, from the game thread, for every decision."""
+    def __init__(self, table):
+        """Initializes RemoteStrategy"""
+        ## Table() the decisions are asked through.
+        self.table = table
+
+    def bet(self, player, shoe):
+        """Asks for a bet."""
+        default = self.table.default.bet(player, shoe)
+        return self.table.ask(player.name, "bet", {"nchips": player.nchips}, default)
+
+    def insurance(self, player, dealer, max_ins):
+        """Asks for an insurance bet."""
+        default = self.table.default.insurance(player, dealer, max_ins)
+        payload = hand_payload(player, dealer)
+        payload["max"] = max_ins
+        return self.table.ask(player.player.name, "insurance", payload, default)
+
+    def split(self, player, dealer):
+        """Asks whether to split."""
+        default = self.table.default.split(player, dealer)
+        return self.table.ask(player.player.name, "split", hand_payload(player, dealer), default)
+
+    def double_down(self, player, dealer):
+        """Asks whether to double down."""
+        default = self.table.default.double_down(player, dealer)
+        return self.table.ask(player.player.name, "double_down", hand_payload(player, dealer), default)
+
+    def surrender(self, player, dealer):
+        """Asks whether to surrender."""
+        default = self.table.default.surrender(player, dealer)
+        return self.table.ask(player.player.name, "surrender", hand_payload(player, dealer), default)
+
+    def hit(self, player, dealer):
+        """Asks whether to hit."""
+        default = self.table.default.hit(player, dealer)
+        return self.table.ask(player.player.name, "hit", hand_payload(player, dealer), default)
+
+
+def hand_payload(hand, dealer):
+    """Returns the fields of a decision message describing hand and the dealer's upcard."""
+    return {"hand": hand.name, "cards": [str(card) for card in hand.cards],
+            "total": hand.total, "dealer_up": str(dealer.cards[1]), "nchips": hand.nchips}
+
+
+class Table(object):
+    """A table of nseats seats, playing a headless Game for remote players once every seat has joined."""
+    def __init__(self, server, name, nseats, ndecks, nrounds, timeout, default, seed=None, rules=None):
+        """Initializes Table with empty seats."""
+        ## Server() hosting the table.
+        self.server = server
+        ## Name.
+        self.name = name
+        ## Number of seats.
+        self.nseats = nseats
+        ## Number of decks in the shoe.
+        self.ndecks = ndecks
+        ## Rounds to play.
+        self.nrounds = nrounds
+        ## Seconds to wait for a decision.
+        self.timeout = timeout
+        ## Strategy() answering decisions that time out.
+        self.default = default
+        ## Seed of the shoe (None for a random one).
+        self.seed = seed
+        ## Rules() of the table (None for the usual rules).
+        self.rules = rules
+        ## Connection() of each seat, by player name (in order of joining).
+        self.seats = {}
+        ## Player names in order of joining.
+        self.names = []
+        ## Game() played (None until every seat has joined).
+        self.game = None
+        ## True once the server has closed (play stops at the next decision).
+        self.closed = False
+        self._ids = 0
+        self._asking = None
+
+    @property
+    def full(self):
+        """True once every seat has joined."""
+        return len(self.names) == self.nseats
+
+    def join(self, name, connection):
+        """Seats a player.  Returns the seat index."""
+        if name in self.seats:
+            raise ValueError("name %s is taken at table %s" % (name, self.name))
+        if self.full:
+            raise ValueError("table %s is full" % self.name)
+        self.seats[name] = connection
+        self.names.append(name)
+        return len(self.names) - 1
+
+    def ask(self, name, decision, payload, default):
+        """
+        Asks the client of seat name for a decision (game thread).  Blocks
+        until answered.  Raises TableClosed if the table is closed.
+        """
+        if self.closed:
+            raise TableClosed(self.name)
+        future = asyncio.run_coroutine_threadsafe(
+            self.decide(name, decision, payload, default), self.server.loop)
+        self._asking = future
+        if self.closed:
+            # closed before close() could see the future
+            future.cancel()
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise TableClosed(self.name)
+        finally:
+            self._asking = None
+
+    def close(self):
+        """Stops play (event loop thread):  the decision being asked, if any, raises TableClosed."""
+        self.closed = True
+        future = self._asking
+        if future is not None:
+            future.cancel()
+
+    async def decide(self, name, decision, payload, default):
+        """Sends a decision to the client and awaits the reply (the default after timeout)."""
+        connection = self.seats[name]
+        if connection.closed:
+            return default
+        loop = asyncio.get_running_loop()
+        self._ids += 1
+        id = self._ids
+        reply = loop.create_future()
+        connection.pending[id] = reply
+        message = dict(payload, type="decide", id=id, decision=decision, timeout=self.timeout)
+        connection.send(message)
+        latency = self.server.latency
+        start = clock()
+        try:
+            value = await asyncio.wait_for(reply, self.timeout)
+        except asyncio.TimeoutError:
+            latency.timeouts += 1
+            return default
+        finally:
+            connection.pending.pop(id, None)
+        latency.add(clock() - start)
+        return parse_decision(decision, value, default)
+
+    def forward(self, event):
+        """Event sink (game thread):  sends settle events to the seat's client."""
+        if event["kind"] == "settle":
+            hand = event["player"]
+            message = {"type": "event", "kind": "settle", "hand": hand.name,
+                       "outcome": event["outcome"], "bet": event["bet"], "nchips": event["nchips"]}
+            self.server.loop.call_soon_threadsafe(self.seats[hand.player.name].send, message)
+
+    def run(self):
+        """Plays the table's rounds (worker thread).  Returns the final banks by name."""
+        rng = random.Random(self.seed)
+        self.game = Game(self.names, self.ndecks, strategy=RemoteStrategy(self),
+                         verbose=False, rng=rng, rules=self.rules)
+        self.game.events.subscribe(self.forward)
+        try:
+            self.game.simulate(self.nrounds)
+        except TableClosed:
+            pass
+        return self.banks()
+
+    def banks(self):
+        """Returns the banks by name (0 for players out of the game, or for all before it starts)."""
+        banks = dict((name, 0) for name in self.names)
+        if self.game is not None:
+            banks.update((player.name, player.nchips) for player in self.game.players)
+        return banks
+
+
+def parse_decision(decision, value, default):
+    """Returns a reply value as the decision's type (the default if it's missing or malformed)."""
+    if value is None:
+        return default
+    try:
+        if decision in ("bet", "insurance"):
+            return int(value)
+        return bool(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Server(object):
+    """Hosts tables on one event loop, for clients on TCP or Unix sockets."""
+    def __init__(self, nseats=3, ndecks=4, nrounds=100, timeout=5.0, default=None, seed=None,
+                 rules=None, backlog=1024, max_tables=1024):
+        """
+        Initializes Server.  Tables are created as players join them, up to
+        max_tables at once (each is played in its own thread).  backlog is
+        the most connections waiting to be accepted (the kernel may cap it
+        at net.core.somaxconn).
+        """
+        ## Seats per table.
+        self.nseats = nseats
+        ## Number of decks per shoe.
+        self.ndecks = ndecks
+        ## Rounds per table.
+        self.nrounds = nrounds
+        ## Seconds to wait for a decision.
+        self.timeout = timeout
+        ## Strategy() answering decisions that time out (or of players who left).
+        self.default = default or SimpleStrategy()
+        ## Seed of the first table's shoe (the nth table gets seed+n;  None for random).
+        self.seed = seed
+        ## Rules() of every table (None for the usual rules).
+        self.rules = rules
+        ## Listen backlog of the sockets (room for 300 full tables of 3 connecting at once).
+        self.backlog = backlog
+        ## Most tables hosted at once (filling or playing).
+        self.max_tables = max_tables
+        ## Tables by name.
+        self.tables = {}
+        ## LatencyStats() of every decision answered.
+        self.latency = LatencyStats()
+        ## Number of tables that have finished.
+        self.finished = 0
+        ## Event loop (set by start()).
+        self.loop = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_tables)
+        self._servers = []
+
+    async def start(self, host=None, port=None, path=None):
+        """Starts listening on TCP host:port and/or the Unix socket path."""
+        self.loop = asyncio.get_running_loop()
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self.handle, host, port,
+                                                            backlog=self.backlog))
+        if path is not None:
+            self._servers.append(await asyncio.start_unix_server(self.handle, path,
+                                                                 backlog=self.backlog))
+
+    async def close(self):
+        """Stops listening, and stops the tables being played."""
+        for table in self.tables.values():
+            table.close()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        self._executor.shutdown(wait=False)
+
+    def table(self, name):
+        """Returns the table called name, creating it if needed.  Raises ValueError if the server is full."""
+        if name not in self.tables:
+            if len(self.tables) >= self.max_tables:
+                raise ValueError("server is full (%d tables)" % self.max_tables)
+            seed = None if self.seed is None else self.seed + len(self.tables)
+            self.tables[name] = Table(self, name, self.nseats, self.ndecks, self.nrounds,
+                                      self.timeout, self.default, seed, self.rules)
+        return self.tables[name]
+
+    async def handle(self, reader, writer):
+        """Serves one client connection."""
+        connection = Connection(reader, writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line.decode("utf-8"))
+                    op = message["op"]
+                except (ValueError, KeyError, TypeError):
+                    connection.send({"type": "error", "error": "malformed message"})
+                    continue
+                if op == "decision":
+                    reply = connection.pending.get(message.get("id"))
+                    if reply is not None and not reply.done():
+                        reply.set_result(message.get("value"))
+                elif op == "join":
+                    self.join(connection, message)
+                else:
+                    connection.send({"type": "error", "error": "unknown op %s" % op})
+        except ConnectionError:
+            pass
+        finally:
+            connection.close()
+            writer.close()
+
+    def join(self, connection, message):
+        """Seats the client at a table, and starts the table once it is full."""
+        try:
+            table = self.table(str(message.get("table", "default")))
+            seat = table.join(str(message["name"]), connection)
+        except (KeyError, ValueError) as error:
+            connection.send({"type": "error", "error": str(error)})
+            return
+        connection.send({"type": "joined", "table": table.name, "seat": seat, "seats": table.nseats})
+        if table.full:
+            self.loop.create_task(self.play(table))
+
+    async def play(self, table):
+        """
+        Plays a full table in a worker thread, then sends each seat its final
+        bank (after an "error" message if the game failed).
+        """
+        try:
+            banks = await self.loop.run_in_executor(self._executor, table.run)
+        except Exception as error:
+            banks = table.banks()
+            for connection in table.seats.values():
+                connection.send({"type": "error", "error": "table %s failed:  %r" % (table.name, error)})
+        finally:
+            del self.tables[table.name]
+        for name, connection in table.seats.items():
+            connection.send({"type": "end", "nchips": banks[name]})
+        self.finished += 1
+
+
+def main(argv=None):
+    """Runs a server from the command line until interrupted, then prints the decision latencies."""
+    parser = argparse.ArgumentParser(description="Blackjack table server.")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="TCP port")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket path")
+    parser.add_argument("--seats", type=int, default=3, help="seats per table (default 3)")
+    parser.add_argument("--decks", type=int, default=4, help="decks per shoe (default 4)")
+    parser.add_argument("--rounds", type=int, default=100, help="rounds per table (default 100)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds per decision (default 5)")
+    parser.add_argument("--seed", type=int, help="seed of the first table's shoe")
+    parser.add_argument("--backlog", type=int, default=1024,
+                        help="connections waiting to be accepted (default 1024)")
+    parser.add_argument("--max-tables", type=int, default=1024,
+                        help="tables hosted at once, one thread each (default 1024)")
+    args = parser.parse_args(argv)
+    if args.port is None and args.unix is None:
+        parser.error("give --port and/or --unix")
+
+    server = Server(args.seats, args.decks, args.rounds, args.timeout, seed=args.seed,
+                    backlog=args.backlog, max_tables=args.max_tables)
+    async def serve():
+        await server.start(args.host, args.port, args.unix)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(dict(server.latency.summary(), tables=server.finished), sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Shuffler Module:  NumPy random generators behind the rng interface of Shoe, with pre-generated shuffles"""
+# A Shoe shuffles with rng.shuffle() (and a CSMShoe draws with rng.random()),
+# so any object with those methods can be injected:
+#
+#   Game(names, 6, rng=BatchShuffler(seed=7))                   # PCG64
+#   Game(names, 6, rng=BatchShuffler(generator=numpy.random.Generator(numpy.random.SFC64(7))))
+#
+# BatchShuffler draws batch_size permutations of the shoe at a time into
+# one array, so a reshuffle is only a reorder of the shoe's buffer, and the
+# generator is called once per batch instead of once per card.  Random
+# floats (for a CSMShoe) are drawn in batches too.  Different shoe sizes
+# may share a shuffler (a new batch is drawn when the size changes).
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## Default number of permutations (or floats) drawn at a time.
+BATCH_SIZE = 256
+
+
+class BatchShuffler(object):
+    """shuffle() and random() from a NumPy Generator, drawn batch_size at a time."""
+    def __init__(self, seed=None, batch_size=BATCH_SIZE, generator=None):
+        """
+        Initializes BatchShuffler with generator (a numpy.random.Generator),
+        or a PCG64 generator seeded with seed.
+        """
+        if numpy is None:
+            raise RuntimeError("BatchShuffler needs numpy")
+        if generator is None:
+            generator = numpy.random.Generator(numpy.random.PCG64(seed))
+        ## numpy.random.Generator() drawing the batches.
+        self.generator = generator
+        ## Number of permutations (or floats) drawn at a time.
+        self.batch_size = batch_size
+        self._size = None
+        self._perms = []
+        self._i_perm = 0
+        self._perms_state = None
+        self._floats = []
+        self._i_float = 0
+        self._floats_state = None
+
+    def permutation(self, n):
+        """Returns the next permutation of range(n) (a list), drawing a new batch when needed."""
+        if n != self._size or self._i_perm == len(self._perms):
+            self._perms_state = self.generator.bit_generator.state
+            self._perms = self._draw_perms(n)
+            self._size = n
+            self._i_perm = 0
+        perm = self._perms[self._i_perm]
+        self._i_perm += 1
+        return perm
+
+    def _draw_perms(self, n):
+        """Draws a batch of permutations of range(n)."""
+        ordered = numpy.tile(numpy.arange(n), (self.batch_size, 1))
+        return self.generator.permuted(ordered, axis=1).tolist()
+
+    def shuffle(self, x):
+        """Shuffles the list x in place."""
+        x[:] = [x[i] for i in self.permutation(len(x))]
+
+    def random(self):
+        """Returns the next random float in [0, 1)."""
+        if self._i_float == len(self._floats):
+            self._floats_state = self.generator.bit_generator.state
+            self._floats = self.generator.random(self.batch_size).tolist()
+            self._i_float = 0
+        u = self._floats[self._i_float]
+        self._i_float += 1
+        return u
+
+    def getstate(self):
+        """
+        Returns the state of the generator and of the batches drawn (for
+        setstate()).  A batch is kept as the generator state it was drawn
+        from, so the state stays small.
+        """
+        return (self.generator.bit_generator.state, self._size,
+                self._perms_state, self._i_perm, self._floats_state, self._i_float)
+
+    def setstate(self, state):
+        """Restores a state returned by getstate(), drawing the current batches again."""
+        bit_state, size, perms_state, i_perm, floats_state, i_float = state
+        bit_generator = self.generator.bit_generator
+        self._size, self._perms_state, self._i_perm = size, perms_state, i_perm
+        self._floats_state, self._i_float = floats_state, i_float
+        self._perms = []
+        if perms_state is not None:
+            bit_generator.state = perms_state
+            self._perms = self._draw_perms(size)
+        self._floats = []
+        if floats_state is not None:
+            bit_generator.state = floats_state
+            self._floats = self.generator.random(self.batch_size).tolist()
+        bit_generator.state = bit_state
+
+    def __getstate__(self):
+        """Pickles the generator and the small state of getstate() (not the batches)."""
+        return {"generator": self.generator, "batch_size": self.batch_size, "state": self.getstate()}
+
+    def __setstate__(self, pickled):
+        """Unpickles, drawing the current batches again."""
+        self.__init__(batch_size=pickled["batch_size"], generator=pickled["generator"])
+        self.setstate(pickled["state"])
@@ -0,0 +1,291 @@
+"""Simulate Module:  Non-interactive batch simulations, streaming results to CSV or a columnar binary file"""
+# Plays headless Games in chunks (seeded as runner.run_chunk, so a seed
+# gives the same results for any number of workers) and writes one row per
+# seat and round, or per seat and shoe, as each chunk finishes.  Only the
+# engine is loaded (not main.py's prompts), so short jobs start quickly.
+#
+#   python simulate.py --players 3 --decks 6 --rounds 1000000 --seed 7 --workers 4 \
+#       --per round --format columns --output run.cols
+#
+# Columns (all integers):
+#   --per round:  round, shoe, seat, net         (net chips of the seat in the round)
+#   --per shoe:   shoe, seat, rounds, net        (rounds the seat played of the shoe, net chips)
+# Rounds and shoes are numbered from 1 across the whole run.  Every chunk
+# deals a new shoe, so the last shoe of a chunk may be short.
+#
+# The columnar file is a header (magic, version, number of columns, 16-byte
+# column names) followed by blocks, one per chunk:  the number of rows, then
+# each column's values as little-endian int64.  read_columns() reads it back.
+
+import argparse
+import array
+import random
+import struct
+import sys
+
+from cards import SHOES
+from play import Game
+from runner import chunk_seed
+from strategy import CountingStrategy, DealerStrategy, SimpleStrategy
+
+## First bytes of every columnar file.
+MAGIC = b"BJCOLS\x00\x00"
+## Version of the columnar layout.
+VERSION = 1
+## Header:  magic, version, number of columns.
+HEADER = struct.Struct("<8sII")
+## Column name, padded.
+COLUMN_NAME = struct.Struct("<16s")
+## Block header:  number of rows.
+BLOCK = struct.Struct("<I")
+
+## Columns written for each --per choice.
+COLUMNS = {"round": ("round", "shoe", "seat", "net"),
+           "shoe": ("shoe", "seat", "rounds", "net")}
+
+try:
+    ## array typecode of a 64-bit integer.
+    INT64 = array.array("q").typecode
+except ValueError:
+    INT64 = "l"
+
+
+def _table_strategy(ndecks):
+    """TableStrategy for the usual rules with ndecks decks (the strategy table is loaded only when asked for)."""
+    import strategy_table
+    return strategy_table.TableStrategy(strategy_table.load(strategy_table.settings(ndecks=ndecks)))
+
+
+## Strategy factories (taking the number of decks) by --strategy name.
+STRATEGIES = {"simple": lambda ndecks: SimpleStrategy(),
+              "dealer": lambda ndecks: DealerStrategy(),
+              "counting": lambda ndecks: CountingStrategy(),
+              "table": _table_strategy}
+
+
+def int64s(values=()):
+    """Returns an array of 64-bit integers."""
+    return array.array(INT64, values)
+
+
+class ResultSink(object):
+    """Event sink collecting the per round or per shoe rows of a Game's seats as columns."""
+    def __init__(self, names, per="round"):
+        """Initializes ResultSink for the players named names (seat numbers from 1)."""
+        ## Seat number of each player name.
+        self.seats = dict((name, i_seat + 1) for i_seat, name in enumerate(names))
+        ## "round" or "shoe".
+        self.per = per
+        ## Column arrays by name.
+        self.columns = dict((name, int64s()) for name in COLUMNS[per])
+        ## Shoes dealt from.
+        self.shoes = 0
+        self._shoe = None
+        self._start = {}
+        self._shoe_results = {}
+
+    def __call__(self, event):
+        """Records each seat's net chips at the end of a round."""
+        kind = event["kind"]
+        if kind == "round":
+            shuffles = event["shoe"].shuffles
+            if shuffles != self._shoe:
+                self.flush_shoe()
+                self._shoe = shuffles
+                self.shoes += 1
+            self._start = dict((player.name, player.nchips) for player in event["players"])
+        elif kind == "round_end":
+            columns = self.columns
+            for player in event["players"]:
+                seat = self.seats[player.name]
+                net = player.nchips - self._start[player.name]
+                if self.per == "round":
+                    columns["round"].append(event["round"])
+                    columns["shoe"].append(self.shoes)
+                    columns["seat"].append(seat)
+                    columns["net"].append(net)
+                else:
+                    rounds, total = self._shoe_results.get(seat, (0, 0))
+                    self._shoe_results[seat] = (rounds + 1, total + net)
+
+    def flush_shoe(self):
+        """Adds the rows of the current shoe (per shoe results only)."""
+        columns = self.columns
+        for seat in sorted(self._shoe_results):
+            rounds, net = self._shoe_results[seat]
+            columns["shoe"].append(self.shoes)
+            columns["seat"].append(seat)
+            columns["rounds"].append(rounds)
+            columns["net"].append(net)
+        self._shoe_results = {}
+
+
+def play_chunk(task):
+    """
+    Plays one chunk (seed, i_chunk, nrounds, nseats, ndecks, strategy, nchips,
+    rules, per, shoe) and returns (rounds played, shoes dealt, columns).  Rounds
+    and shoes are numbered from 1 within the chunk.
+    """
+    seed, i_chunk, nrounds, nseats, ndecks, strategy, nchips, rules, per, shoe = task
+    names = ["seat-%d" % (i_seat + 1) for i_seat in range(nseats)]
+    game = Game(names, ndecks, strategy=strategy, verbose=False,
+                rng=random.Random(chunk_seed(seed, i_chunk)), rules=rules, shoe=shoe)
+    for player in game.players:
+        player.nchips = nchips
+    sink = ResultSink(names, per)
+    game.events.subscribe(sink)
+    rounds = game.simulate(nrounds)
+    sink.flush_shoe()
+    return rounds, sink.shoes, sink.columns
+
+
+class CsvWriter(object):
+    """Writes blocks of rows as CSV lines, with a header line."""
+    def __init__(self, f, names):
+        """Initializes CsvWriter and writes the header."""
+        ## Open text file.
+        self.f = f
+        ## Column names.
+        self.names = names
+        self._line = ",".join(["%d"] * len(names)) + "\n"
+        f.write(",".join(names) + "\n")
+
+    def write_block(self, columns):
+        """Writes the rows of a block of columns."""
+        rows = zip(*[columns[name] for name in self.names])
+        line = self._line
+        self.f.write("".join(line % row for row in rows))
+
+
+class ColumnWriter(object):
+    """Writes blocks of int64 columns to a columnar file (layout above)."""
+    def __init__(self, f, names):
+        """Initializes ColumnWriter and writes the header."""
+        ## Open binary file.
+        self.f = f
+        ## Column names.
+        self.names = names
+        f.write(HEADER.pack(MAGIC, VERSION, len(names)))
+        for name in names:
+            f.write(COLUMN_NAME.pack(name.encode("ascii")))
+
+    def write_block(self, columns):
+        """Writes a block of columns."""
+        self.f.write(BLOCK.pack(len(columns[self.names[0]])))
+        for name in self.names:
+            values = columns[name]
+            if sys.byteorder == "big":
+                values = int64s(values)
+                values.byteswap()
+            values.tofile(self.f)
+
+
+def read_columns(path):
+    """Reads a columnar file and returns its columns, as a dictionary of int64 arrays by name."""
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+        if len(data) < HEADER.size:
+            raise ValueError("truncated column file header")
+        magic, version, ncolumns = HEADER.unpack(data)
+        if magic != MAGIC:
+            raise ValueError("not a column file")
+        if version != VERSION:
+            raise ValueError("column file version %d not supported" % version)
+        names = [COLUMN_NAME.unpack(f.read(COLUMN_NAME.size))[0].rstrip(b"\x00").decode("ascii")
+                 for i in range(ncolumns)]
+        columns = dict((name, int64s()) for name in names)
+        while True:
+            data = f.read(BLOCK.size)
+            if not data:
+                break
+            nrows, = BLOCK.unpack(data)
+            for name in names:
+                columns[name].fromfile(f, nrows)
+    if sys.byteorder == "big":
+        for values in columns.values():
+            values.byteswap()
+    return columns
+
+
+def simulate(writer, nrounds, seed=0, workers=1, nseats=1, ndecks=4, strategy=None,
+             nchips=10**9, chunk_rounds=10000, rules=None, per="round", shoe="exact"):
+    """
+    Plays nrounds rounds in chunks of chunk_rounds on a pool of workers,
+    writing each chunk's rows to writer (in chunk order) as it finishes.
+    shoe is the shoe mode of the Games (see cards.SHOES).  Returns the 
+    number of rounds played.
+    """
+    if strategy is None:
+        strategy = SimpleStrategy()
+    tasks = []
+    i_chunk = 0
+    while i_chunk * chunk_rounds < nrounds:
+        n = min(chunk_rounds, nrounds - i_chunk * chunk_rounds)
+        tasks.append((seed, i_chunk, n, nseats, ndecks, strategy, nchips, rules, per, shoe))
+        i_chunk += 1
+
+    pool = None
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+    try:
+        results = pool.imap(play_chunk, tasks) if pool else (play_chunk(task) for task in tasks)
+        round_offset = shoe_offset = 0
+        for rounds, shoes, columns in results:
+            if "round" in columns:
+                columns["round"] = int64s(r + round_offset for r in columns["round"])
+            columns["shoe"] = int64s(s + shoe_offset for s in columns["shoe"])
+            writer.write_block(columns)
+            round_offset += rounds
+            shoe_offset += shoes
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return round_offset
+
+
+def main(argv=None):
+    """Runs a batch simulation from the command line."""
+    parser = argparse.ArgumentParser(description="Batch blackjack simulation.")
+    parser.add_argument("--players", type=int, default=1, help="seats at the table (default 1)")
+    parser.add_argument("--decks", type=int, default=4, help="decks per shoe (default 4)")
+    parser.add_argument("--rounds", type=int, default=100000, help="rounds to play (default 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="run seed (default 0)")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="simple",
+                        help="strategy of every seat (default simple)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--shoe", choices=sorted(SHOES), default="exact",
+                        help="shoe mode:  exact, csm, or infinite for fast approximate play (default exact)")
+    parser.add_argument("--chips", type=int, default=10**9, help="starting bank per seat (default 10**9)")
+    parser.add_argument("--chunk-rounds", type=int, default=10000,
+                        help="rounds per chunk, the unit of work and of output buffering (default 10000)")
+    parser.add_argument("--per", choices=sorted(COLUMNS), default="round",
+                        help="one row per seat and round, or per seat and shoe (default round)")
+    parser.add_argument("--format", choices=("csv", "columns"), default="csv", help="output format (default csv)")
+    parser.add_argument("--output", default="-", help="output file (default - for standard output, csv only)")
+    args = parser.parse_args(argv)
+
+    names = COLUMNS[args.per]
+    if args.format == "csv":
+        f = sys.stdout if args.output == "-" else open(args.output, "w", 1 << 20)
+        writer = CsvWriter(f, names)
+    else:
+        if args.output == "-":
+            parser.error("--format columns needs --output")
+        f = open(args.output, "wb", 1 << 20)
+        writer = ColumnWriter(f, names)
+    try:
+        nrounds = simulate(writer, args.rounds, seed=args.seed, workers=args.workers,
+                           nseats=args.players, ndecks=args.decks,
+                           strategy=STRATEGIES[args.strategy](args.decks), nchips=args.chips,
+                           chunk_rounds=args.chunk_rounds, per=args.per, shoe=args.shoe)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    sys.stderr.write("%d rounds\n" % nrounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Stats Module:  Constant-memory streaming statistics of simulated play, mergeable across shards"""
+# A StatsSink subscribed to a Game's events feeds a SimStats:  the net
+# result of every seat each round (running mean and variance, and a fixed
+# histogram), the drawdown of each seat's bank from its peak, and tallies
+# of decisions and outcomes.  Memory does not grow with the rounds played.
+# SimStats of separate workers merge with merge():  counts, chip totals
+# and histograms add exactly, and mean and variance combine with Chan's
+# formula.  Drawdowns are measured within each shard.
+#
+#   stats = SimStats()
+#   game.events.subscribe(StatsSink(stats))
+#   game.simulate(10**6)
+#   print(stats.report())
+
+
+class RunningStats(object):
+    """Count, exact total, and Welford running mean and variance of a stream of numbers."""
+    def __init__(self):
+        """Initializes RunningStats with no samples."""
+        ## Number of samples.
+        self.n = 0
+        ## Sum of the samples (exact for integers).
+        self.total = 0
+        ## Running mean.
+        self.mean = 0.0
+        ## Sum of squared deviations from the mean.
+        self.m2 = 0.0
+
+    def add(self, x):
+        """Adds one sample."""
+        self.n += 1
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / float(self.n)
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """Adds the samples of other (Chan et al. parallel update)."""
+        if other.n:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / float(n)
+            self.m2 += other.m2 + delta * delta * self.n * other.n / float(n)
+            self.n = n
+            self.total += other.total
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (0 for fewer than two samples)."""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stderr(self):
+        """Standard error of the mean."""
+        return (self.variance / self.n) ** 0.5 if self.n else 0.0
+
+
+class Histogram(object):
+    """Counts in nbins equal bins over [lo, hi), with underflow and overflow counts."""
+    def __init__(self, lo, hi, nbins):
+        """Initializes Histogram with zero counts."""
+        ## Lower edge.
+        self.lo = lo
+        ## Upper edge.
+        self.hi = hi
+        ## Count in each bin.
+        self.counts = [0] * nbins
+        ## Count below lo.
+        self.under = 0
+        ## Count at or above hi.
+        self.over = 0
+        self._scale = nbins / float(hi - lo)
+
+    def add(self, x):
+        """Counts one sample."""
+        if x < self.lo:
+            self.under += 1
+        elif x >= self.hi:
+            self.over += 1
+        else:
+            self.counts[int((x - self.lo) * self._scale)] += 1
+
+    def merge(self, other):
+        """Adds the counts of a histogram with the same bins."""
+        if (other.lo, other.hi, len(other.counts)) != (self.lo, self.hi, len(self.counts)):
+            raise ValueError("histograms have different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.under += other.under
+        self.over += other.over
+        return self
+
+    @property
+    def n(self):
+        """Number of samples."""
+        return sum(self.counts) + self.under + self.over
+
+    def edges(self):
+        """Returns the nbins+1 bin edges."""
+        width = (self.hi - self.lo) / float(len(self.counts))
+        return [self.lo + i * width for i in range(len(self.counts) + 1)]
+
+    def quantile(self, q):
+        """Returns the midpoint of the bin holding the q quantile (lo or hi for the outer counts)."""
+        rank = q * self.n
+        seen = self.under
+        if rank <= seen:
+            return self.lo
+        edges = self.edges()
+        for i_bin, count in enumerate(self.counts):
+            seen += count
+            if rank <= seen:
+                return (edges[i_bin] + edges[i_bin + 1]) / 2.0
+        return self.hi
+
+
+class SimStats(object):
+    """Results of simulated play, per seat and round."""
+    ## Tallies kept.
+    TALLIES = ("rounds", "hands", "wins", "losses", "pushes", "surrenders", "blackjacks",
+               "busts", "splits", "doubles", "insurance_bets")
+
+    def __init__(self, net_range=(-20, 20), drawdown_max=1000, drawdown_bins=100):
+        """
+        Initializes SimStats.  Net results get one bin per chip over
+        net_range;  drawdowns drawdown_bins bins from 0 to drawdown_max.
+        """
+        lo, hi = net_range
+        ## RunningStats() of the net chips of each seat in each round.
+        self.net = RunningStats()
+        ## Histogram() of the net chips of each seat in each round.
+        self.net_hist = Histogram(lo - 0.5, hi + 0.5, hi - lo + 1)
+        ## Histogram() of each seat's drawdown (chips below its peak bank) after each round.
+        self.drawdown_hist = Histogram(0, drawdown_max, drawdown_bins)
+        ## Largest drawdown seen.
+        self.max_drawdown = 0
+        ## Counts of rounds, hands, outcomes and decisions.
+        self.tallies = dict((name, 0) for name in SimStats.TALLIES)
+
+    def add_seat_round(self, net, drawdown):
+        """Adds the net result and drawdown of one seat for one round."""
+        self.net.add(net)
+        self.net_hist.add(net)
+        self.drawdown_hist.add(drawdown)
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+
+    def merge(self, other):
+        """Adds the results of another shard."""
+        self.net.merge(other.net)
+        self.net_hist.merge(other.net_hist)
+        self.drawdown_hist.merge(other.drawdown_hist)
+        self.max_drawdown = max(self.max_drawdown, other.max_drawdown)
+        for name in SimStats.TALLIES:
+            self.tallies[name] += other.tallies[name]
+        return self
+
+    def report(self):
+        """Returns a text summary."""
+        net = self.net
+        lines = ["seat rounds %d:  net %d, mean %.5f +- %.5f (sd %.4f)"
+                 % (net.n, net.total, net.mean, net.stderr, net.variance ** 0.5),
+                 "net quantiles (5%%, 50%%, 95%%):  %g, %g, %g"
+                 % tuple(self.net_hist.quantile(q) for q in (0.05, 0.5, 0.95)),
+                 "drawdown:  max %d, 95%% quantile %g" % (self.max_drawdown, self.drawdown_hist.quantile(0.95))]
+        hands = float(self.tallies["hands"]) or 1.0
+        for name in SimStats.TALLIES:
+            lines.append("%-15s %12d  %8.4f per hand" % (name, self.tallies[name], self.tallies[name] / hands))
+        return "\n".join(lines)
+
+
+class StatsSink(object):
+    """Event sink feeding the rounds of a Game into a SimStats."""
+    def __init__(self, stats):
+        """Initializes StatsSink"""
+        ## SimStats() fed.
+        self.stats = stats
+        self._start = {}
+        self._peak = {}
+
+    def __call__(self, event):
+        """Tallies the event, and adds each seat's result at the end of a round."""
+        kind = event["kind"]
+        tallies = self.stats.tallies
+        if kind == "round":
+            tallies["rounds"] += 1
+            self._start = dict((id(player), player.nchips) for player in event["players"])
+        elif kind == "settle":
+            tallies["hands"] += 1
+            outcome = event["outcome"]
+            if outcome == "win":
+                tallies["wins"] += 1
+                if event["blackjack"]:
+                    tallies["blackjacks"] += 1
+            elif outcome == "lose":
+                tallies["losses"] += 1
+            elif outcome == "push":
+                tallies["pushes"] += 1
+            else:
+                tallies["surrenders"] += 1
+        elif kind == "bust":
+            tallies["busts"] += 1
+        elif kind == "split":
+            tallies["splits"] += 1
+        elif kind == "double":
+            tallies["doubles"] += 1
+        elif kind == "insurance":
+            tallies["insurance_bets"] += 1
+        elif kind == "round_end":
+            for player in event["players"]:
+                key = id(player)
+                start = self._start[key]
+                peak = max(self._peak.get(key, start), start, player.nchips)
+                self._peak[key] = peak
+                self.stats.add_seat_round(player.nchips - start, peak - player.nchips)
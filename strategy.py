@@ -0,0 +1,159 @@
+"""Strategy Module:  Decision makers for Players (bets, insurance, splits, double downs, hits)"""
+# A Game asks the strategy of each Player for every decision, so the same
+# game rules can be driven from the console or run headless for simulations.
+
+from cards import Card
+
+
+class Strategy(object):
+    """
+    Base class for a player's decisions.  bet() receives the Player (the seat
+    and its bank);  the other methods receive the PlayerHand being played 
+    (hand.player is the seat) and the Dealer.  No method may do console I/O.
+    """
+    def bet(self, player, shoe):
+        """Returns the amount to bet at the start of a round (shoe is the Game's Shoe, for counts)."""
+        return 1
+
+    def insurance(self, player, dealer, max_ins):
+        """Returns the insurance bet (0-max_ins) when the Dealer shows an Ace."""
+        return 0
+
+    def split(self, player, dealer):
+        """Returns True to split a splittable hand."""
+        return False
+
+    def double_down(self, player, dealer):
+        """Returns True to double down (only offered on the totals the rules allow, 9-11 by default)."""
+        return False
+
+    def surrender(self, player, dealer):
+        """Returns True to surrender the first two cards for half the bet (only offered if the rules allow)."""
+        return False
+
+    def hit(self, player, dealer):
+        """Returns True to take another card."""
+        return False
+
+
+class DealerStrategy(Strategy):
+    """Flat bets, no insurance, and mimics the Dealer (hits below a fixed total)."""
+    def __init__(self, flat_bet=1, stand_on=17):
+        """Initializes DealerStrategy"""
+        ## Amount bet every round.
+        self.flat_bet=flat_bet
+        ## Total to stand on.
+        self.stand_on=stand_on
+
+    def bet(self, player, shoe):
+        """Bets the flat amount."""
+        return self.flat_bet
+
+    def hit(self, player, dealer):
+        """Hits until reaching stand_on."""
+        return player.total < self.stand_on
+
+
+class SimpleStrategy(DealerStrategy):
+    """
+    Flat bets with a short form of basic strategy:  always splits Aces and 8s,
+    always doubles 10 and 11 (and 9 against a weak upcard), and stands on 12-16
+    against a Dealer 2-6.  Where surrender is allowed, surrenders hard 16
+    against 9-A and hard 15 against 10.
+    """
+    def split(self, player, dealer):
+        """Splits Aces and 8s."""
+        return player.cards[0].rank in ("A", "8")
+
+    def double_down(self, player, dealer):
+        """Doubles 10 and 11, and 9 against 3-6."""
+        t = player.total
+        if t in (10, 11):
+            return True
+        up = dealer.cards[1].value
+        return t == 9 and up is not None and 3 <= up <= 6
+
+    def surrender(self, player, dealer):
+        """Surrenders hard 16 against 9, 10 or Ace, and hard 15 against 10 (not a bet of 1, which gets nothing back)."""
+        if player.is_soft or player.bet < 2:
+            return False
+        t = player.total
+        up = dealer.cards[1].value
+        return (t == 16 and (up == 1 or up >= 9)) or (t == 15 and up == 10)
+
+    def hit(self, player, dealer):
+        """Hits below 12, stands on 17 and up, otherwise hits only against 7-A."""
+        t = player.total
+        if t < 12:
+            return True
+        if t >= 17:
+            return False
+        up = dealer.cards[1].value
+        return up == 1 or up >= 7
+
+
+class CountingStrategy(SimpleStrategy):
+    """
+    SimpleStrategy play with a Hi-Lo bet spread:  bets flat_bet times 
+    (true count - 1) units, from 1 up to max_units.
+    """
+    def __init__(self, flat_bet=1, max_units=8):
+        """Initializes CountingStrategy"""
+        SimpleStrategy.__init__(self, flat_bet=flat_bet)
+        ## Largest bet, in units of flat_bet.
+        self.max_units=max_units
+
+    def bet(self, player, shoe):
+        """Bets more as the true count of the shoe rises."""
+        units = int(shoe.true_count) - 1
+        return self.flat_bet * max(1, min(units, self.max_units))
+
+
+class ParametricStrategy(CountingStrategy):
+    """
+    CountingStrategy with its decisions as parameters, for searching over
+    variants (see optimize.py):  doubles on the totals and upcards of
+    double_vs (total: upcard values, Ace is 1), splits pairs of
+    split_ranks (by value, as Hand.is_splittable:  "10" or "K" splits
+    any pair of 10s and facecards), and takes full insurance when the true count is at least 
+    insurance_count (None for never).  max_units=1 bets flat.  Doubling 
+    outside 9-11 needs rules that offer it (Rules(double_totals=None)).
+    """
+    ## Every upcard value.
+    ANY = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+
+    def __init__(self, flat_bet=1, max_units=1, double_vs=None, split_ranks=("A", "8"),
+                 insurance_count=None):
+        """Initializes ParametricStrategy (the defaults play as SimpleStrategy)."""
+        CountingStrategy.__init__(self, flat_bet=flat_bet, max_units=max_units)
+        if double_vs is None:
+            double_vs = {9: (3, 4, 5, 6), 10: self.ANY, 11: self.ANY}
+        ## Upcard values doubled against, by hand total.
+        self.double_vs = dict((total, frozenset(ups)) for total, ups in double_vs.items())
+        ## Ranks of the pairs split.
+        self.split_ranks = tuple(split_ranks)
+        ## Card values of the pairs split.
+        self.split_values = frozenset(Card.RANK_VALUES[rank] for rank in self.split_ranks)
+        ## Lowest true count to take insurance at (None for never).
+        self.insurance_count = insurance_count
+        self._shoe = None
+
+    def bet(self, player, shoe):
+        """Bets as CountingStrategy (and keeps the shoe, for the insurance count)."""
+        self._shoe = shoe
+        return CountingStrategy.bet(self, player, shoe)
+
+    def insurance(self, player, dealer, max_ins):
+        """Insures fully at a true count of insurance_count or more."""
+        if self.insurance_count is None or self._shoe is None:
+            return 0
+        return max_ins if self._shoe.true_count >= self.insurance_count else 0
+
+    def split(self, player, dealer):
+        """Splits pairs of split_ranks (by value)."""
+        return player.cards[0].value in self.split_values
+
+    def double_down(self, player, dealer):
+        """Doubles on the totals and upcards of double_vs."""
+        ups = self.double_vs.get(player.total)
+        return ups is not None and dealer.cards[1].value in ups
@@ -0,0 +1,481 @@
+"""Strategy Table Module:  Generates hit, stand, double and split EVs for every hand against every upcard"""
+# EVs are per unit of the original bet, under the table settings of a
+# rules.Rules (settings()):
+#   - the dealer stands on all 17s (or hits soft 17 with hit_soft_17) and
+#     only checks for blackjack with an Ace showing, so against a 10 the
+#     dealer's blackjack is just a 21 (a player 21 pushes it), and against
+#     an Ace decisions assume no dealer blackjack
+#   - blackjack (any two card 21, split hands included) pays blackjack_payout
+#     (the nominal ratio, before rounding to chips) and breaks a tie of 21
+#   - double downs on the totals in double_totals (any two cards if None),
+#     one card then stand;  after a split only with double_after_split
+#   - one split (more splits are played as one)
+#   - insurance pays 1:1 (Player.payInsuranceBet returns twice the bet)
+# Each entry is composition dependent:  the player's two cards and the upcard
+# are taken out of the ndecks shoe, and player draws and the dealer's exact
+# distribution (probability.dealer_distribution) use what is left.
+#
+# load() keeps generated tables in a cache directory as fixed-layout binary
+# files (write_binary()) and memory-maps them (MappedStrategyTable):  every
+# entry is looked up in place at a fixed offset, so nothing is parsed or
+# computed at startup, and the worker processes of a host share the one
+# page-cached copy.  Layout (little-endian, after a header and the rules
+# as JSON, padded to 8 bytes):
+#   EVs         float64 [card 1][card 2][upcard][action]  (NaN:  not offered)
+#   dealer      float64 [upcard][outcome]  (probability.OUTCOMES, full shoe)
+#   best action uint8   [card 1][card 2][upcard]  (index of ACTIONS, BLACKJACK or NO_HAND)
+#   totals      uint8   [soft][total][upcard]  (1:  hit, 0:  stand)
+# Card values and upcards index from 1 (Ace) to 10, totals from 0 to 21.
+
+import errno
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import probability
+from cards import Card
+from rules import Rules
+from strategy import Strategy
+
+## Table settings of the usual rules (settings(Rules(), 4)).
+RULES = {"ndecks": 4, "hit_soft_17": False, "blackjack_payout": 2.0, "double_totals": [9, 10, 11],
+         "double_after_split": True, "split": True}
+
+## Actions of a table entry.
+ACTIONS = ("stand", "hit", "double", "split")
+
+## First bytes of a binary table.
+MAGIC = b"BJSTRAT\x00"
+## Version of the binary layout.
+VERSION = 1
+## Header:  magic, version, size of the rules JSON, insurance EV.
+HEADER = struct.Struct("<8sIId")
+## EVs of a two card hand, in ACTIONS order.
+EVS = struct.Struct("<4d")
+## Dealer distribution of an upcard.
+DEALER = struct.Struct("<%dd" % len(probability.OUTCOMES))
+## Best action code of a natural.
+BLACKJACK = 4
+## Best action code of a hand the shoe can't deal.
+NO_HAND = 255
+## Number of two card hand entries ([card 1][card 2][upcard]).
+NHANDS = 10 * 10 * 10
+## Number of total entries ([soft][total][upcard]).
+NTOTALS = 2 * 22 * 10
+
+
+def settings(rules=None, ndecks=4):
+    """Returns the table settings of rules (a Rules(), default:  the usual rules) with ndecks decks."""
+    rules = rules or Rules()
+    numerator, denominator = rules.blackjack_payout
+    return {"ndecks": ndecks,
+            "hit_soft_17": rules.hit_soft_17,
+            "blackjack_payout": float(numerator) / denominator,
+            "double_totals": None if rules.double_totals is None else list(rules.double_totals),
+            "double_after_split": rules.double_after_split,
+            "split": rules.max_splits > 0}
+
+
+def rules_key(rules):
+    """Returns a short hash identifying a rule set."""
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode("ascii")).hexdigest()[:16]
+
+
+def _total(hard, aces):
+    """Hand total, counting an Ace as 11 when it doesn't bust (Hand.total)."""
+    if aces and hard <= 11:
+        return hard + 10
+    return hard
+
+
+class _HandEV(object):
+    """EVs of one player position against one upcard, for a fixed composition."""
+    def __init__(self, upcard, counts, rules):
+        """Initializes _HandEV with the dealer distribution for upcard and counts."""
+        n = float(sum(counts))
+        self.rules = rules
+        self.probs = [count / n for count in counts]
+        dist = list(probability.dealer_distribution(upcard, counts, rules["hit_soft_17"]))
+        bj = dist.pop(probability.BLACKJACK)
+        if upcard == Card.ACE_VALUE:
+            # decisions are only made when the dealer has no blackjack
+            dist = [p / (1.0 - bj) for p in dist]
+        else:
+            # without a check, a dealer blackjack is a 21 at the showdown
+            dist[4] += bj
+        ## Dealer distribution:  17-21, then bust.
+        self.dealer = dist
+        self._stand = {}
+        self._hit = {}
+
+    def stand(self, total):
+        """EV of standing on total."""
+        ev = self._stand.get(total)
+        if ev is None:
+            if total > 21:
+                ev = -1.0
+            else:
+                ev = self.dealer[probability.BUST]
+                for i_total in range(5):
+                    dealer_total = 17 + i_total
+                    if total > dealer_total:
+                        ev += self.dealer[i_total]
+                    elif total < dealer_total:
+                        ev -= self.dealer[i_total]
+            self._stand[total] = ev
+        return ev
+
+    def hit(self, hard, aces):
+        """EV of hitting (then playing on the best of hit and stand)."""
+        key = (hard, aces > 0)
+        ev = self._hit.get(key)
+        if ev is None:
+            ev = 0.0
+            for i_value, p in enumerate(self.probs):
+                if p:
+                    value = i_value + 1
+                    ev += p * self.best(hard + value, aces + (value == Card.ACE_VALUE))
+            self._hit[key] = ev
+        return ev
+
+    def best(self, hard, aces):
+        """EV of the best of hit and stand (stand on 21, -1 when busted)."""
+        total = _total(hard, aces)
+        if total > 21:
+            return -1.0
+        if total == 21:
+            return self.stand(21)
+        return max(self.stand(total), self.hit(hard, aces))
+
+    def double(self, hard, aces):
+        """EV of a double down (one card, twice the bet)."""
+        ev = 0.0
+        for i_value, p in enumerate(self.probs):
+            if p:
+                value = i_value + 1
+                ev += p * self.stand(_total(hard + value, aces + (value == Card.ACE_VALUE)))
+        return 2.0 * ev
+
+    def two_cards(self, card_1, card_2, split=True, double=True):
+        """EVs (dict by action) of a two card hand (card values), without a double down if not double."""
+        hard = card_1 + card_2
+        aces = (card_1 == Card.ACE_VALUE) + (card_2 == Card.ACE_VALUE)
+        total = _total(hard, aces)
+        evs = {"stand": self.stand(total)}
+        if total < 21:
+            evs["hit"] = self.hit(hard, aces)
+        double_totals = self.rules["double_totals"]
+        if double and (double_totals is None or total in double_totals):
+            evs["double"] = self.double(hard, aces)
+        if split and self.rules["split"] and card_1 == card_2:
+            evs["split"] = 2.0 * self.split_hand(card_1)
+        return evs
+
+    def split_hand(self, card):
+        """EV of one hand after a split (dealt one card, no further split)."""
+        ev = 0.0
+        for i_value, p in enumerate(self.probs):
+            if p:
+                value = i_value + 1
+                if _total(card + value, (card == Card.ACE_VALUE) + (value == Card.ACE_VALUE)) == 21:
+                    hand_ev = float(self.rules["blackjack_payout"])
+                else:
+                    hand_ev = max(self.two_cards(card, value, split=False,
+                                                 double=self.rules["double_after_split"]).values())
+                ev += p * hand_ev
+        return ev
+
+
+class StrategyTable(object):
+    """Best actions and their EVs for every two card hand and every hard/soft total, by upcard."""
+    def __init__(self, rules, hands, totals, insurance):
+        """Initializes StrategyTable."""
+        ## Rule set the table was generated for.
+        self.rules = rules
+        ## EVs (dict by action) by (card value, card value, upcard), card values sorted.
+        self.hands = hands
+        ## Best of "hit"/"stand" by (soft, total, upcard), for hands of 3 or more cards.
+        self.totals = totals
+        ## Insurance EV per unit insured (Ace showing).
+        self.insurance = insurance
+
+    def evs(self, card_1, card_2, upcard):
+        """Returns the EVs (dict by action) of a two card hand."""
+        return self.hands[(min(card_1, card_2), max(card_1, card_2), upcard)]
+
+    def action(self, card_1, card_2, upcard):
+        """Returns the best action of a two card hand ("blackjack" for a natural)."""
+        evs = self.evs(card_1, card_2, upcard)
+        if "hit" not in evs and card_1 + card_2 == 11:
+            return "blackjack"
+        return max(evs, key=evs.get)
+
+    def hits(self, soft, total, upcard):
+        """Returns True if a hand of 3 or more cards should hit."""
+        return self.totals[(soft, total, upcard)] == "hit"
+
+    def to_json(self):
+        """Returns the table as JSON text."""
+        return json.dumps({
+            "rules": self.rules,
+            "hands": [[key[0], key[1], key[2], evs] for key, evs in sorted(self.hands.items())],
+            "totals": [[key[0], key[1], key[2], action] for key, action in sorted(self.totals.items())],
+            "insurance": self.insurance,
+        }, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text):
+        """Returns the table stored in JSON text."""
+        data = json.loads(text)
+        hands = dict(((c1, c2, up), evs) for c1, c2, up, evs in data["hands"])
+        totals = dict(((soft, total, up), action) for soft, total, up, action in data["totals"])
+        return cls(data["rules"], hands, totals, data["insurance"])
+
+
+def generate(rules=None):
+    """Computes the StrategyTable of table settings (settings();  missing ones as in RULES)."""
+    rules = dict(RULES, **(rules or {}))
+    shoe = probability.shoe_counts(rules["ndecks"])
+    hands = {}
+    totals = {}
+    for upcard in range(1, 11):
+        counts = probability.remove(shoe, upcard)
+        for card_1 in range(1, 11):
+            for card_2 in range(card_1, 11):
+                hand_counts = probability.remove(probability.remove(counts, card_1), card_2)
+                if min(hand_counts) < 0:
+                    continue
+                evs = _HandEV(upcard, hand_counts, rules).two_cards(card_1, card_2)
+                if card_1 + card_2 == 11 and (card_1 == Card.ACE_VALUE):
+                    # natural:  no decision, paid blackjack_payout
+                    evs = {"stand": float(rules["blackjack_payout"])}
+                hands[(card_1, card_2, upcard)] = evs
+
+        # hands of 3 or more cards:  hit or stand by total
+        hand_ev = _HandEV(upcard, counts, rules)
+        for total in range(4, 22):
+            totals[(False, total, upcard)] = (
+                "hit" if total < 21 and hand_ev.hit(total, 0) > hand_ev.stand(total) else "stand")
+        for total in range(12, 22):
+            hard = total - 10
+            totals[(True, total, upcard)] = (
+                "hit" if total < 21 and hand_ev.hit(hard, 1) > hand_ev.stand(total) else "stand")
+
+    ace_counts = probability.remove(shoe, Card.ACE_VALUE)
+    p_bj = ace_counts[9] / float(sum(ace_counts))
+    insurance = 2.0 * p_bj - 1.0
+    return StrategyTable(rules, hands, totals, insurance)
+
+
+def _hand_index(card_1, card_2, upcard):
+    """Index of a two card hand entry."""
+    return ((card_1 - 1) * 10 + card_2 - 1) * 10 + upcard - 1
+
+
+def _total_index(soft, total, upcard):
+    """Index of a total entry."""
+    return (bool(soft) * 22 + total) * 10 + upcard - 1
+
+
+def _offsets(rules_size):
+    """Returns the file offsets of the EVs, dealer, best action and totals sections."""
+    evs = HEADER.size + (rules_size + 7) // 8 * 8
+    dealer = evs + NHANDS * EVS.size
+    actions = dealer + 10 * DEALER.size
+    totals = actions + NHANDS
+    return evs, dealer, actions, totals
+
+
+def write_binary(table, path):
+    """Writes table (and the full shoe dealer distributions of its rules) to path as a binary table."""
+    nan = float("nan")
+    rules = json.dumps(table.rules, sort_keys=True).encode("ascii")
+    evs_offset, dealer_offset, actions_offset, totals_offset = _offsets(len(rules))
+    data = bytearray(totals_offset + NTOTALS)
+    HEADER.pack_into(data, 0, MAGIC, VERSION, len(rules), table.insurance)
+    data[HEADER.size:HEADER.size + len(rules)] = rules
+
+    actions = bytearray([NO_HAND] * NHANDS)
+    for i_hand in range(NHANDS):
+        EVS.pack_into(data, evs_offset + i_hand * EVS.size, nan, nan, nan, nan)
+    for (card_1, card_2, upcard), evs in table.hands.items():
+        action = table.action(card_1, card_2, upcard)
+        for i_hand in set([_hand_index(card_1, card_2, upcard), _hand_index(card_2, card_1, upcard)]):
+            EVS.pack_into(data, evs_offset + i_hand * EVS.size, *[evs.get(name, nan) for name in ACTIONS])
+            actions[i_hand] = BLACKJACK if action == "blackjack" else ACTIONS.index(action)
+    data[actions_offset:totals_offset] = actions
+
+    table_rules = dict(RULES, **table.rules)
+    shoe = probability.shoe_counts(table_rules["ndecks"])
+    for upcard in range(1, 11):
+        dist = probability.dealer_distribution(upcard, probability.remove(shoe, upcard),
+                                               table_rules["hit_soft_17"])
+        DEALER.pack_into(data, dealer_offset + (upcard - 1) * DEALER.size, *dist)
+    for (soft, total, upcard), action in table.totals.items():
+        data[totals_offset + _total_index(soft, total, upcard)] = action == "hit"
+
+    # a temporary file of its own, renamed into place:  processes writing
+    # the same table at once never see each other's partial files
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        getattr(os, "replace", os.rename)(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class MappedStrategyTable(object):
+    """
+    A binary table (write_binary()) mapped read-only, with the lookups of
+    StrategyTable.  Pages are read from the file (or the page cache) when
+    first used.
+    """
+    def __init__(self, path):
+        """Initializes MappedStrategyTable, mapping path.  Raises ValueError if path isn't a binary table."""
+        ## Absolute path of the binary table.
+        self.path = os.path.abspath(path)
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError("truncated strategy table")
+        magic, version, rules_size, insurance = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("not a strategy table")
+        if version != VERSION:
+            raise ValueError("strategy table version %d not supported" % version)
+        offsets = _offsets(rules_size)
+        if len(self._map) != offsets[-1] + NTOTALS:
+            raise ValueError("strategy table has the wrong size")
+        ## Rule set the table was generated for.
+        self.rules = json.loads(self._map[HEADER.size:HEADER.size + rules_size].decode("ascii"))
+        ## Insurance EV per unit insured (Ace showing).
+        self.insurance = insurance
+        self._evs, self._dealer, self._actions, self._totals = offsets
+
+    def evs(self, card_1, card_2, upcard):
+        """Returns the EVs (dict by action) of a two card hand."""
+        values = EVS.unpack_from(self._map, self._evs + _hand_index(card_1, card_2, upcard) * EVS.size)
+        return dict((name, ev) for name, ev in zip(ACTIONS, values) if ev == ev)
+
+    def action(self, card_1, card_2, upcard):
+        """Returns the best action of a two card hand ("blackjack" for a natural)."""
+        i_hand = self._actions + _hand_index(card_1, card_2, upcard)
+        code = ord(self._map[i_hand:i_hand + 1])
+        if code == BLACKJACK:
+            return "blackjack"
+        if code == NO_HAND:
+            raise KeyError((card_1, card_2, upcard))
+        return ACTIONS[code]
+
+    def hits(self, soft, total, upcard):
+        """Returns True if a hand of 3 or more cards should hit."""
+        i_total = self._totals + _total_index(soft, total, upcard)
+        return self._map[i_total:i_total + 1] == b"\x01"
+
+    def dealer_distribution(self, upcard):
+        """Returns the dealer distribution (indexed as probability.OUTCOMES) for upcard from a full shoe."""
+        return DEALER.unpack_from(self._map, self._dealer + (upcard - 1) * DEALER.size)
+
+    def close(self):
+        """Unmaps the file."""
+        self._map.close()
+
+    def __getstate__(self):
+        """Pickles the path only (worker processes map the file again)."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """Unpickles, mapping the file again."""
+        self.__init__(state["path"])
+
+
+def load(rules=None, cache_dir=".strategy_cache"):
+    """
+    Returns the table of table settings (settings(), or a dictionary of
+    changes to RULES), as a MappedStrategyTable of its binary file in
+    cache_dir, generating and writing the file first if needed.
+    """
+    rules = dict(RULES, **(rules or {}))
+    path = os.path.join(cache_dir, "strategy-%s.tbl" % rules_key(rules))
+    if not os.path.exists(path):
+        table = generate(rules)
+        try:
+            os.makedirs(cache_dir)
+        except OSError as e:
+            # another process may have made it first
+            if e.errno != errno.EEXIST:
+                raise
+        write_binary(table, path)
+    return MappedStrategyTable(path)
+
+
+class TableStrategy(Strategy):
+    """
+    Flat bets and plays every decision from a StrategyTable.  Raises
+    ValueError when betting at a table whose rules or number of decks
+    aren't those the table was generated for.
+    """
+    def __init__(self, table, flat_bet=1):
+        """Initializes TableStrategy"""
+        ## StrategyTable() or MappedStrategyTable() used for decisions.
+        self.table = table
+        ## Amount bet every round.
+        self.flat_bet = flat_bet
+        self._checked = (None, None)
+
+    def check(self, rules, ndecks):
+        """Raises ValueError if the table wasn't generated for rules (a Rules()) with ndecks decks."""
+        expected = settings(rules, ndecks)
+        generated = dict(RULES, **self.table.rules)
+        if generated != expected:
+            differences = ", ".join("%s %r (table:  %r)" % (name, expected[name], generated.get(name))
+                                    for name in sorted(expected) if expected[name] != generated.get(name))
+            raise ValueError("strategy table doesn't match the rules of the game:  " + differences)
+
+    def bet(self, player, shoe):
+        """Bets the flat amount (checking the table against the game's rules first)."""
+        rules, checked_shoe = self._checked
+        if player.rules is not rules or shoe is not checked_shoe:
+            self.check(player.rules, sum(shoe.full_counts) // 52)
+            self._checked = (player.rules, shoe)
+        return self.flat_bet
+
+    def insurance(self, player, dealer, max_ins):
+        """Insures fully only if insurance has a positive EV."""
+        if self.table.insurance > 0:
+            return max_ins
+        return 0
+
+    def _action(self, player, dealer):
+        """Best table action for the player's first two cards."""
+        return self.table.action(player.cards[0].value, player.cards[1].value,
+                                 dealer.cards[1].value)
+
+    def split(self, player, dealer):
+        """Splits if the table says so."""
+        return self._action(player, dealer) == "split"
+
+    def double_down(self, player, dealer):
+        """Doubles down if the table says so (or if doubling beats hitting after a split)."""
+        if len(player.cards) != 2:
+            return False
+        evs = self.table.evs(player.cards[0].value, player.cards[1].value,
+                             dealer.cards[1].value)
+        if "double" not in evs:
+            return False
+        return evs["double"] >= max(ev for action, ev in evs.items() if action != "split")
+
+    def hit(self, player, dealer):
+        """Hits by the table (two card hands by EV, longer hands by total)."""
+        upcard = dealer.cards[1].value
+        if len(player.cards) == 2:
+            evs = self.table.evs(player.cards[0].value, player.cards[1].value, upcard)
+            return evs.get("hit", -2.0) > evs["stand"]
+        return self.table.hits(player.is_soft, player.total, upcard)
@@ -0,0 +1,36 @@
+"""Tests of the benchmark harness (bench.py)."""
+import pytest
+
+import bench
+
+pytestmark = pytest.mark.skipif(bench.tracemalloc is None or not hasattr(bench.tracemalloc, "reset_peak"),
+                                reason="needs tracemalloc with reset_peak (Python 3.9+)")
+
+
+def _churn(size):
+    """Setup of a run that allocates and frees a list of size items each op."""
+    def run(nops):
+        for i in range(nops):
+            [i] * size
+    return run
+
+
+def test_allocations_count_memory_freed_within_an_op():
+    small = bench.allocations(lambda: _churn(100), 1000)
+    large = bench.allocations(lambda: _churn(10000), 1000)
+    assert small > 0.7                  # 100 pointers, freed again
+    assert 70 < large < 100             # 10000 pointers
+
+
+def test_rounds_allocate_every_round():
+    result = bench.run_all(["rounds_1seat"], scale=0.05, repeat=1)["rounds_1seat"]
+    assert set(result) == set(["ops_per_sec", "kib_per_op"])
+    assert result["kib_per_op"] > 0.1
+
+
+def test_compare_reports_allocation_regressions():
+    baseline = {"rounds": {"ops_per_sec": 1000.0, "kib_per_op": 1.0}}
+    assert bench.compare({"rounds": {"ops_per_sec": 1000.0, "kib_per_op": 1.05}}, baseline, 0.1) == []
+    assert bench.compare({"rounds": {"ops_per_sec": 1000.0, "kib_per_op": 1.5}}, baseline, 0.1) == \
+        ["rounds (allocations)"]
+    assert bench.compare({"rounds": {"ops_per_sec": 800.0, "kib_per_op": 1.5}}, baseline, 0.1, 1.0) == ["rounds"]
@@ -0,0 +1,49 @@
+"""Tests of saving a Game between rounds and resuming it (checkpoint.py)."""
+import random
+
+import pytest
+
+import checkpoint
+from play import Game
+from shuffler import BatchShuffler, numpy
+from strategy import SimpleStrategy
+
+NAMES = ["a", "b", "c"]
+
+
+def new_game(shoe, batch):
+    """Returns a headless Game seeded alike for every call."""
+    rng = BatchShuffler(seed=11) if batch else random.Random(11)
+    game = Game(NAMES, 2, strategy=SimpleStrategy(), verbose=False, rng=rng, shoe=shoe)
+    for player in game.players:
+        player.nchips = 10**6
+    return game
+
+
+def outcome(game):
+    """Returns what a run leaves behind:  rounds, banks, shoe and generator state."""
+    return (game.rounds, [(player.name, player.nchips) for player in game.players],
+            game.deck.get_state(), game.deck.rng.getstate())
+
+
+def same(a, b):
+    """True if two outcomes are equal (numpy generator states compared by their repr)."""
+    return repr(a) == repr(b)
+
+
+@pytest.mark.parametrize("shoe", ["exact", "csm", "infinite"])
+@pytest.mark.parametrize("batch", [False, True])
+def test_resume_is_identical_to_an_uninterrupted_run(tmp_path, shoe, batch):
+    if batch and numpy is None:
+        pytest.skip("BatchShuffler needs numpy")
+    uninterrupted = new_game(shoe, batch)
+    uninterrupted.simulate(500)
+
+    path = str(tmp_path / "run.ckpt")
+    game = new_game(shoe, batch)
+    checkpoint.Checkpointer(game, path).run(173)
+    del game
+    resumed = checkpoint.load(path)
+    assert resumed.rounds == 173
+    assert checkpoint.Checkpointer(resumed, path).run(500) == 327
+    assert same(outcome(resumed), outcome(uninterrupted))
@@ -0,0 +1,25 @@
+"""Tests of paired strategy comparison on common shoes (compare.py)."""
+from compare import compare
+from rules import Rules
+from strategy import ParametricStrategy, SimpleStrategy
+
+
+def test_identical_strategies_differ_by_exactly_zero():
+    result = compare([("a", SimpleStrategy()), ("b", SimpleStrategy())], nshoes=300, seed=3,
+                     nseats=2, chunk_shoes=100)
+    assert result.shoes == 300
+    assert result.rounds[0] == result.rounds[1]
+    assert result.nets[0].total == result.nets[1].total
+    assert result.diffs[1].n == 300
+    assert result.difference(1) == (0.0, 0.0, 0.0)
+    assert result.diffs[1].variance == 0.0
+
+
+def test_different_strategies_pair_the_same_shoes():
+    candidates = [("9-11", ParametricStrategy()), ("never", ParametricStrategy(double_vs={}))]
+    serial = compare(candidates, nshoes=200, seed=3, chunk_shoes=50, rules=Rules(double_totals=None))
+    parallel = compare(candidates, nshoes=200, seed=3, chunk_shoes=50, rules=Rules(double_totals=None),
+                       workers=2)
+    assert serial.diffs[1].total == parallel.diffs[1].total
+    assert serial.diffs[1].total != 0
+    assert serial.variance_reduction(1) > 1.0
@@ -0,0 +1,47 @@
+"""Tests of recording sessions and replaying them against their hand logs."""
+import random
+
+import pytest
+
+from play import Game
+from replay import Recorder, Replay, ReplayError
+from shuffler import BatchShuffler, numpy
+from strategy import SimpleStrategy
+
+NAMES = ["a", "b"]
+
+
+def record(tmp_path, rng, shoe, nrounds=400):
+    """Records nrounds of a Game and returns the paths of its log and decisions."""
+    log_path, decisions_path = str(tmp_path / "s.hlog"), str(tmp_path / "s.dec")
+    game = Game(NAMES, 2, strategy=SimpleStrategy(), verbose=False, rng=rng, shoe=shoe)
+    for player in game.players:
+        player.nchips = 10**6
+    recorder = Recorder(game, log_path, decisions_path, seed=7)
+    game.simulate(nrounds)
+    recorder.close()
+    return log_path, decisions_path
+
+
+@pytest.mark.parametrize("shoe", ["exact", "csm", "infinite"])
+@pytest.mark.parametrize("batch", [False, True])
+def test_replay_rebuilds_shoe_and_rng(tmp_path, shoe, batch):
+    if batch and numpy is None:
+        pytest.skip("BatchShuffler needs numpy")
+    rng = BatchShuffler(seed=7) if batch else random.Random(7)
+    log_path, decisions_path = record(tmp_path, rng, shoe)
+    replay = Replay(log_path, decisions_path, NAMES, nchips=10**6, checkpoint_every=100)
+    assert (replay.log.shoe, replay.log.rng) == (shoe, "batch" if batch else "random")
+    assert replay.run() == 400
+    replay.seek(250)
+    assert replay.run() == 151
+    replay.close()
+
+
+def test_recorder_rejects_unreplayable_generators(tmp_path):
+    with pytest.raises(ReplayError):
+        record(tmp_path, None, "exact")
+    if numpy is not None:
+        generator = numpy.random.Generator(numpy.random.SFC64(7))
+        with pytest.raises(ReplayError):
+            record(tmp_path, BatchShuffler(generator=generator), "exact")
@@ -0,0 +1,137 @@
+"""Tests of the table rules (rules.Rules) as played by play.Game."""
+import random
+
+import handlog
+from cards import Card, Hand, Shoe
+from play import Game
+from rules import Rules
+from strategy import ParametricStrategy, Strategy
+
+
+class ScriptedStrategy(Strategy):
+    """Bets 2, and splits, doubles and hits as told."""
+    def __init__(self, split=False, double=False, hit=False):
+        """Initializes ScriptedStrategy"""
+        self._split = split
+        self._double = double
+        self._hit = hit
+        ## Hands the strategy was offered a double down for.
+        self.doubles_offered = []
+
+    def bet(self, player, shoe):
+        """Bets 2."""
+        return 2
+
+    def split(self, player, dealer):
+        """Splits if told to."""
+        return self._split
+
+    def double_down(self, player, dealer):
+        """Doubles if told to (and records the offer)."""
+        self.doubles_offered.append((player.name, player.split))
+        return self._double
+
+    def hit(self, player, dealer):
+        """Hits if told to."""
+        return self._hit
+
+    def insurance(self, player, dealer, max_ins):
+        """Never insures."""
+        return 0
+
+
+def stacked_game(ranks, strategy, rules, nseats=1):
+    """
+    Returns a headless Game whose shoe deals ranks first (in deal order:
+    one card to each seat, the dealer, then a second round), then an
+    ordered deck.
+    """
+    game = Game(["seat-%d" % (i + 1) for i in range(nseats)], 1, strategy=strategy, verbose=False,
+                rng=random.Random(0), rules=rules)
+    shoe = Shoe(1, rng=random.Random(0))
+    shoe.clear()
+    for i_card, rank in enumerate(ranks):
+        shoe.add(Card(rank, Card.SUITS[i_card % 4]))
+    for card in Card.DECK:
+        shoe.add(card)
+    game.deck = shoe
+    return game
+
+
+def test_double_bust_is_settled_and_logged(tmp_path):
+    # player 10-5 doubles against a 7 and draws a King:  25
+    rules = Rules(double_totals=None)
+    game = stacked_game(["10", "10", "5", "7", "K"], ScriptedStrategy(double=True), rules)
+    events = []
+    game.events.subscribe(events.append)
+    path = str(tmp_path / "bust.hlog")
+    writer = handlog.HandLogWriter(path, append=False)
+    game.events.subscribe(handlog.HandLogSink(writer))
+    game.play_round()
+    writer.close()
+
+    kinds = [event["kind"] for event in events]
+    assert "bust" in kinds
+    settles = [event for event in events if event["kind"] == "settle"]
+    assert [(event["outcome"], event["bet"]) for event in settles] == [("lose", 4)]
+    assert game.players[0].nchips == rules.nchips - 4
+
+    log = handlog.HandLog(path)
+    record = list(log.iter_records())[0]
+    log.close()
+    assert record["outcome"] == handlog.LOSE
+    assert record["flags"] & handlog.BUST and record["flags"] & handlog.DOUBLE
+
+
+def test_no_double_after_split_applies_to_both_hands():
+    # 8-8 against a 6, split, each hand draws a 3:  two 11s
+    ranks = ["8", "10", "8", "6", "3", "3"]
+    strategy = ScriptedStrategy(split=True, double=True)
+    game = stacked_game(ranks, strategy, Rules(double_after_split=False))
+    game.play_round()
+    assert strategy.doubles_offered == []
+
+    strategy = ScriptedStrategy(split=True, double=True)
+    game = stacked_game(ranks, strategy, Rules(double_after_split=True))
+    game.play_round()
+    assert strategy.doubles_offered == [("seat-1", True), ("seat-1-2", True)]
+    # the flags are cleared for the next round
+    assert [hand.split for hand in game.players[0].hands] == [False]
+
+
+def test_parametric_split_ranks_match_by_value():
+    strategy = ParametricStrategy(split_ranks=("A", "10"))
+    for ranks, split in ((["K", "Q"], True), (["10", "J"], True), (["A", "A"], True), (["9", "9"], False)):
+        hand = Hand()
+        for rank in ranks:
+            hand.add(Card(rank, "s"))
+        assert strategy.split(hand, None) == split
+
+
+class SurrenderingStrategy(ScriptedStrategy):
+    """Surrenders every hand it is asked about (and counts the offers)."""
+    def __init__(self):
+        """Initializes SurrenderingStrategy"""
+        ScriptedStrategy.__init__(self)
+        ## Number of surrender offers.
+        self.offers = 0
+
+    def surrender(self, player, dealer):
+        """Surrenders."""
+        self.offers += 1
+        return True
+
+
+def test_surrender_is_offered_only_under_its_rule():
+    ranks = ["10", "10", "6", "7"]
+    strategy = SurrenderingStrategy()
+    game = stacked_game(ranks, strategy, Rules())
+    game.play_round()
+    assert strategy.offers == 0
+
+    strategy = SurrenderingStrategy()
+    rules = Rules(surrender=True)
+    game = stacked_game(ranks, strategy, rules)
+    game.play_round()
+    assert strategy.offers == 1
+    assert game.players[0].nchips == rules.nchips - 1          # half the bet of 2 back
@@ -0,0 +1,104 @@
+"""Tests of the table server and its bot clients (Python 3 only)."""
+import sys
+
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip("server.py needs Python 3.7+", allow_module_level=True)
+
+import asyncio
+import time
+
+from bot import Bot, run_bots
+from server import Server
+
+
+def test_many_unix_clients_connect_at_once(tmp_path):
+    # 150 tables of 3:  more connections at once than the default backlog of 100
+    path = str(tmp_path / "bj.sock")
+
+    server = Server(nseats=3, nrounds=2, timeout=5.0, seed=1)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(server.start(path=path))
+        try:
+            bots, seconds = loop.run_until_complete(run_bots(150, 3, path=path))
+        finally:
+            loop.run_until_complete(server.close())
+    finally:
+        loop.close()
+    assert len(bots) == 450
+    assert server.finished == 150
+
+
+def _serving(server, path):
+    """Returns a fresh event loop (the current one) with server listening on path."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start(path=path))
+    return loop
+
+
+def _close(server, loop):
+    """Closes server and its loop (after the tasks still running, e.g. open connections, finish)."""
+    try:
+        loop.run_until_complete(server.close())
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_failed_table_ends_its_clients(tmp_path, monkeypatch):
+    def fail(game, nrounds):
+        raise RuntimeError("engine failure")
+    monkeypatch.setattr("play.Game.simulate", fail)
+    server = Server(nseats=2, nrounds=2, seed=1)
+    path = str(tmp_path / "bj.sock")
+    loop = _serving(server, path)
+    try:
+        bots = [Bot("a", "t"), Bot("b", "t")]
+        results = loop.run_until_complete(asyncio.wait_for(
+            asyncio.gather(*[bot.play(path=path) for bot in bots], return_exceptions=True), 10))
+    finally:
+        _close(server, loop)
+    assert all(isinstance(result, RuntimeError) and "engine failure" in str(result) for result in results)
+    assert server.tables == {}
+
+
+def test_full_server_turns_players_away(tmp_path):
+    server = Server(nseats=2, nrounds=1, seed=1, max_tables=1)
+    path = str(tmp_path / "bj.sock")
+    loop = _serving(server, path)
+    try:
+        waiting = loop.create_task(Bot("a", "t1").play(path=path))
+        loop.run_until_complete(asyncio.sleep(0.1))
+        with pytest.raises(RuntimeError) as error:
+            loop.run_until_complete(asyncio.wait_for(Bot("c", "t2").play(path=path), 10))
+        waiting.cancel()
+    finally:
+        _close(server, loop)
+    assert str(error.value) == "server is full (1 tables)"
+
+
+def test_close_stops_tables_waiting_for_a_decision(tmp_path):
+    server = Server(nseats=1, nrounds=100, timeout=60.0, seed=1)
+    path = str(tmp_path / "bj.sock")
+    loop = _serving(server, path)
+    try:
+        reader, writer = loop.run_until_complete(asyncio.open_unix_connection(path))
+        writer.write(b'{"op": "join", "table": "t", "name": "a"}\n')
+        loop.run_until_complete(reader.readline())      # joined
+        loop.run_until_complete(reader.readline())      # the first bet, never answered
+        table = server.tables["t"]
+    finally:
+        _close(server, loop)
+    assert table.closed
+    for i in range(50):
+        if table._asking is None:
+            break
+        time.sleep(0.01)
+    assert table._asking is None                        # the game thread stopped asking
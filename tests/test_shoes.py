@@ -0,0 +1,45 @@
+"""Tests of the shoe modes (cards.SHOES) as played by play.Game."""
+import random
+
+import pytest
+
+from cards import SHOES, Card, Hand
+from play import Game
+from strategy import SimpleStrategy
+
+
+def cards_in_play(counts):
+    """Event sink adding the cards held at the end of each round (every card dealt) to counts[0]."""
+    def sink(event):
+        if event["kind"] == "round_end":
+            counts[0] += sum(len(hand.cards) for player in event["players"] for hand in player.hands)
+            counts[0] += len(event["dealer"].cards)
+    return sink
+
+
+@pytest.mark.parametrize("shoe", ["exact", "csm", "infinite"])
+def test_profiler_counts_cards_dealt(shoe):
+    game = Game(["a", "b"], 4, strategy=SimpleStrategy(), verbose=False, rng=random.Random(2), shoe=shoe)
+    for player in game.players:
+        player.nchips = 10**6
+    counts = [0]
+    game.events.subscribe(cards_in_play(counts))
+    profiler = game.instrument()
+    game.simulate(300)
+    assert counts[0] > 300 * 6
+    assert profiler.counters["cards_dealt"] == counts[0]
+
+
+@pytest.mark.parametrize("shoe", sorted(SHOES))
+def test_shoes_are_not_hands(shoe):
+    deck = SHOES[shoe](1, rng=random.Random(0))
+    assert "52 cards" in str(deck)
+    for name in ("total", "is_soft"):
+        with pytest.raises(TypeError):
+            getattr(deck, name)
+    for call in (deck.is_busted, deck.is_blackjack, deck.is_splittable,
+                 lambda: deck.give(Card.DECK[0], Hand()), lambda: deck.flip_card(0)):
+        with pytest.raises(TypeError):
+            call()
+    with pytest.raises(AttributeError):
+        deck.cards.append(Card.DECK[0])
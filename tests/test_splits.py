@@ -0,0 +1,56 @@
+"""Tests of split hands (play.Player.hands):  resplits and the accounting of a seat's hands."""
+from events import ConsoleSink
+from rules import Rules
+from test_rules import ScriptedStrategy, stacked_game
+
+## 8-8 against a 6, and only 8s to split to.
+EIGHTS = ["8", "10", "8", "6"] + ["8"] * 16
+
+
+def play_splits(max_splits, nchips=100):
+    """Plays a round of EIGHTS, always splitting.  Returns (game, events)."""
+    game = stacked_game(EIGHTS, ScriptedStrategy(split=True), Rules(max_splits=max_splits))
+    game.players[0].nchips = nchips
+    events = []
+    game.events.subscribe(events.append)
+    game.play_round()
+    return game, events
+
+
+def net(settles):
+    """Net chips won by the settled hands (the bets were taken before)."""
+    returns = {"win": 2, "push": 1, "lose": 0}
+    return sum(returns[event["outcome"]] * event["bet"] for event in settles)
+
+
+def test_resplits_up_to_max_splits():
+    for max_splits, nhands in ((0, 1), (1, 2), (2, 3), (3, 4), (5, 6)):
+        game, events = play_splits(max_splits)
+        splits = [event for event in events if event["kind"] == "split"]
+        settles = [event for event in events if event["kind"] == "settle"]
+        assert len(splits) == nhands - 1
+        assert len(settles) == nhands
+        assert len(set(event["player"].name for event in settles)) == nhands
+        assert all(event["bet"] == 2 for event in settles)
+        # one bank:  every hand's bet came from it, every payout went back
+        assert game.players[0].nchips == 100 - 2 * nhands + net(settles)
+        # back to one hand for the next round
+        assert [hand.name for hand in game.players[0].hands] == ["seat-1"]
+
+
+def test_splits_stop_when_the_bank_runs_out():
+    # 5 chips:  the bet (2) and one split (2), not a second one
+    game, events = play_splits(3, nchips=5)
+    settles = [event for event in events if event["kind"] == "settle"]
+    assert len(settles) == 2
+    assert game.players[0].nchips == 5 - 4 + net(settles)
+
+
+def test_console_shows_the_splits_left(capsys):
+    game = stacked_game(EIGHTS, ScriptedStrategy(split=True), Rules(max_splits=2))
+    game.events.subscribe(ConsoleSink())
+    game.play_round()
+    out = capsys.readouterr().out
+    assert "this can be split (2 splits left)" in out
+    assert "this can be split (1 split left)" in out
+    assert "only once" not in out
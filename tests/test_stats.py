@@ -0,0 +1,55 @@
+"""Tests of the streaming statistics of simulated play (stats.py)."""
+import random
+
+import pytest
+
+from play import Game
+from stats import RunningStats, SimStats, StatsSink
+from strategy import SimpleStrategy
+
+
+def play_shard(seed, stats):
+    """Plays 300 rounds of a seeded Game into stats."""
+    game = Game(["a", "b"], 2, strategy=SimpleStrategy(), verbose=False, rng=random.Random(seed))
+    for player in game.players:
+        player.nchips = 10**6
+    game.events.subscribe(StatsSink(stats))
+    game.simulate(300)
+
+
+def test_merged_shards_equal_a_single_pass():
+    single = SimStats()
+    shards = []
+    for seed in range(4):
+        play_shard(seed, single)
+        shard = SimStats()
+        play_shard(seed, shard)
+        shards.append(shard)
+    merged = SimStats()
+    for shard in shards:
+        merged.merge(shard)
+
+    assert merged.tallies == single.tallies
+    assert (merged.net.n, merged.net.total) == (single.net.n, single.net.total)
+    assert merged.net.mean == pytest.approx(single.net.mean, abs=1e-12)
+    assert merged.net.variance == pytest.approx(single.net.variance, rel=1e-12)
+    assert (merged.net_hist.counts, merged.net_hist.under, merged.net_hist.over) == \
+        (single.net_hist.counts, single.net_hist.under, single.net_hist.over)
+    assert merged.drawdown_hist.counts == single.drawdown_hist.counts
+    assert merged.max_drawdown == single.max_drawdown
+    assert merged.report() == single.report()
+
+
+def test_running_stats_merge_matches_two_pass_formulas():
+    rng = random.Random(3)
+    values = [rng.gauss(0, 5) for i in range(10)] + list(range(-7, 20))
+    left, right = RunningStats(), RunningStats()
+    for x in values[:13]:
+        left.add(x)
+    for x in values[13:]:
+        right.add(x)
+    left.merge(right)
+    mean = sum(values) / float(len(values))
+    assert left.n == len(values)
+    assert left.mean == pytest.approx(mean)
+    assert left.variance == pytest.approx(sum((x - mean) ** 2 for x in values) / (len(values) - 1))
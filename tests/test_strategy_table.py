@@ -0,0 +1,68 @@
+"""Tests of the binary strategy table cache (strategy_table.load())."""
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+import probability
+import runner
+import strategy_table
+from rules import Rules
+
+
+def test_mapped_table_pickles_and_runs_on_workers(tmp_path):
+    table = strategy_table.load({"ndecks": 1}, cache_dir=str(tmp_path))
+    copy = pickle.loads(pickle.dumps(table, 2))
+    assert copy.path == table.path
+    assert copy.evs(10, 6, 10) == table.evs(10, 6, 10)
+    assert copy.action(8, 8, 6) == table.action(8, 8, 6)
+
+    strategy = strategy_table.TableStrategy(table)
+    serial = runner.run(2000, seed=1, workers=1, ndecks=1, strategy=strategy, chunk_rounds=500)
+    parallel = runner.run(2000, seed=1, workers=2, ndecks=1, strategy=strategy, chunk_rounds=500)
+    assert parallel.net == serial.net
+
+
+def _cold_load(cache_dir):
+    """Loads the 1 deck table from cache_dir and returns a few of its lookups."""
+    table = strategy_table.load({"ndecks": 1}, cache_dir=cache_dir)
+    return table.action(8, 8, 6), table.evs(10, 6, 10), table.insurance
+
+
+def test_concurrent_cold_loads(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    pool = multiprocessing.Pool(6)
+    try:
+        results = pool.map(_cold_load, [cache_dir] * 6)
+    finally:
+        pool.close()
+        pool.join()
+    assert all(result == results[0] for result in results)
+    assert [name for name in os.listdir(cache_dir) if name.endswith(".tmp")] == []
+
+
+def test_dealer_hits_soft_17():
+    counts = probability.shoe_counts(1)
+    stands = probability.dealer_distribution(6, counts)
+    hits = probability.dealer_distribution(6, counts, hit_soft_17=True)
+    assert abs(sum(hits) - 1.0) < 1e-9
+    assert hits[0] < stands[0]          # fewer 17s
+    assert hits[probability.BUST] > stands[probability.BUST]
+
+
+def test_generate_any_two_card_doubles():
+    table = strategy_table.generate(strategy_table.settings(Rules(double_totals=None), 1))
+    assert "double" in table.evs(2, 3, 6)
+
+
+def test_table_strategy_checks_the_game_rules(tmp_path):
+    rules = Rules(hit_soft_17=True, blackjack_payout=(3, 2))
+    table = strategy_table.load(strategy_table.settings(rules, 1), cache_dir=str(tmp_path))
+    strategy = strategy_table.TableStrategy(table)
+    assert runner.run(200, seed=1, ndecks=1, strategy=strategy, rules=rules).rounds == 200
+    with pytest.raises(ValueError) as error:
+        runner.run(200, seed=1, ndecks=1, strategy=strategy)
+    assert "hit_soft_17" in str(error.value)
+    with pytest.raises(ValueError):
+        runner.run(200, seed=1, ndecks=4, strategy=strategy, rules=rules)